@@ -1,23 +1,38 @@
+import time
+# Page render time, measured from here to the end of the script (see the Performance view)
+script_started_at = time.perf_counter()
 import streamlit as st
 import os
-import git
-import subprocess
 import re
-from streamlit_mermaid import st_mermaid
 import shutil
-import signal
-import queue
-import threading
-import time
 import random
-import streamlit_shadcn_ui as ui
 import logging
+from collections import deque
+from ra.jobs import JobScheduler, SUCCEEDED, CANCELLED
+from ra import config, report_cache, docs, gateway, fsutil, telemetry, storage, depgraph, lazy, prewarm
+from ra import analysis as ra_analysis
+from ra.clone import CloneManager
+from ra.workspace import WorkspaceIndex
+from ra.commands import CommandRegistry
+from ra.pipeline import PipelineRunner
+from ra.reports import ReportRenderer, MERMAID
+from ra.search import SearchIndex
+from ra.storage import StorageManager
+from ra.prewarm import Prewarmer
+from ra import pipeline as ra_pipeline
+from ra import commands as ra_commands
+from ra import clone as ra_clone
+
+# Imported on first use: the shadcn components pull in pandas, and Mermaid is only rendered in the
+# browser when no pre-rendered SVG exists. Views that do not need them skip the import.
+ui = lazy.module("streamlit_shadcn_ui")
+streamlit_mermaid = lazy.module("streamlit_mermaid")
 
 
 
 st.set_page_config(
     page_title="DORA",  # This is the browser tab title
-    page_icon="",                # Optional: emoji or URL to favicon
+    page_icon=None,              # Optional: emoji or URL to favicon ("" made Streamlit try it as an image file)
     layout="centered"                  # Optional: 'centered' or 'wide'
 )
 
@@ -27,18 +42,16 @@ logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(
 
 
 # --- Session State Initialization ---
-if 'repo_ports' not in st.session_state:
-    st.session_state.repo_ports = {}
-if 'running_servers' not in st.session_state:
-    st.session_state.running_servers = {} # port -> process
-if 'next_port' not in st.session_state:
-    st.session_state.next_port = 8005
 if 'selected_repo_index' not in st.session_state:
     st.session_state.selected_repo_index = 0
 if 'selected_repo' not in st.session_state:
     st.session_state.selected_repo = None
-if 'current_process' not in st.session_state:
-    st.session_state.current_process = None
+if 'watched_job_id' not in st.session_state:
+    st.session_state.watched_job_id = None
+if 'watched_clone_id' not in st.session_state:
+    st.session_state.watched_clone_id = None
+if 'watched_pipeline_id' not in st.session_state:
+    st.session_state.watched_pipeline_id = None
 if 'last_analysis_status' not in st.session_state:
     st.session_state.last_analysis_status = None
 
@@ -50,167 +63,462 @@ if 'selected_use_case' not in st.session_state:
 
 
 
-def run_command_in_thread(process, q):
-    try:
-        for line in iter(process.stdout.readline, ''):
-            # Log the output to the console
-            line_without_newline = line.strip()
-            if line_without_newline:
-                logging.info(line_without_newline)
-            q.put(line)
-        process.stdout.close()
-        return_code = process.wait()
-        q.put(f"---RC:{return_code}---")
-    except Exception as e:
-        logging.error(f"Error in command thread: {e}")
-        q.put(str(e))
-        q.put("---RC:1---")
-
-
-def start_docs_server(repo_path, port):
-    # Kill any existing server on this specific port
-    if port in st.session_state.running_servers:
-        proc = st.session_state.running_servers[port]
-        if proc.poll() is None:
-            st.warning(f"Stopping previous documentation server (PID: {proc.pid}) on port {port}...")
-            try:
-                os.killpg(os.getpgid(proc.pid), signal.SIGKILL)
-                proc.wait()
-            except ProcessLookupError:
-                pass  # Process already dead
-            finally:
-                if port in st.session_state.running_servers:
-                    del st.session_state.running_servers[port]
-    
-    # Give the OS a moment to release the port
-    time.sleep(2)
+# --- Process-wide Services ---
+def on_job_finished(job):
+    report_cache.on_job_finished(job)
+    get_workspace_index().invalidate(job.target)
+    # Start pipeline stages that were waiting for this job's report
+    get_pipeline_runner().on_job_finished(job)
+    get_prewarmer().on_job_finished(job)
+    get_search_index().update(job.target)
+    storage.touch(job.target)
+    # Parse markdown reports and pre-render their diagrams before anyone opens them
+    output = report_cache.normalize_output(job.output_file)
+    if job.status == SUCCEEDED and output and output.endswith(".md"):
+        report_path = os.path.join(job.target_path, output)
+        if os.path.exists(report_path):
+            get_report_renderer().load(report_path)
+
+
+@st.cache_resource
+def get_scheduler():
+    # One scheduler per server process, shared by every browser session.
+    # Successful jobs feed the report cache; jobs left running by a previous process are re-attached.
+    return JobScheduler(on_finish=on_job_finished)
+
+
+@st.cache_resource
+def get_docs_gateway():
+    # One static HTTP server for every repo's built docs, instead of a `mkdocs serve` per repo
+    return gateway.start_gateway()
+
+
+@st.cache_resource
+def get_workspace_index():
+    # Shared by all sessions; re-scans only entries whose mtimes changed
+    return WorkspaceIndex()
+
+
+@st.cache_resource
+def get_clone_manager():
+    # Clones and updates run in the background and are visible to every session
+    return CloneManager()
+
+
+@st.cache_resource
+def get_command_registry():
+    # commands.md is parsed once and re-parsed only when the file changes
+    return CommandRegistry()
+
+
+@st.cache_resource
+def get_pipeline_runner():
+    # "Run full assessment" pipelines, advanced by the scheduler's completion hook
+    return PipelineRunner(get_scheduler(), get_command_registry())
+
+
+@st.cache_resource
+def get_report_renderer():
+    # Parsed reports and pre-rendered Mermaid SVGs, shared by every session
+    return ReportRenderer()
+
+
+@st.cache_resource
+def get_page_timings():
+    # Render times of this server process's page reruns, per view
+    return telemetry.Timings()
+
+
+@st.cache_resource
+def get_search_index():
+    # Full-text index of every report, updated per target when its jobs finish
+    return SearchIndex()
+
+
+def workspace_busy(name):
+    # Never evict a repository that has queued or running work in this process
+    return (any(job.target == name for job in get_scheduler().active_jobs())
+            or get_pipeline_runner().active_for(name) is not None
+            or get_prewarmer().pipelines.active_for(name) is not None
+            or get_clone_manager().active_task_for(os.path.join(config.WORKSPACE_DIR, name)) is not None)
+
+
+@st.cache_resource
+def get_storage_manager():
+    # Keeps the workspace under DORA_WORKSPACE_BUDGET_GB by evicting cold sites and checkouts in the background
+    manager = StorageManager(is_busy=workspace_busy, registry=get_command_registry())
+    manager.start()
+    return manager
 
+
+@st.cache_resource
+def get_prewarmer():
+    # With DORA_PREWARM=1, refreshes the reports of repositories that moved upstream during off-peak windows
+    return Prewarmer(get_scheduler(), get_command_registry(), get_clone_manager(), get_workspace_index(),
+                     is_busy=workspace_busy)
+
+
+workspace_index = get_workspace_index()
+command_registry = get_command_registry()
+scheduler = get_scheduler()
+pipelines = get_pipeline_runner()
+clones = get_clone_manager()
+get_docs_gateway()
+get_storage_manager()
+get_prewarmer().start()
+
+
+def repo_names():
+    # Repos still being cloned are not selectable yet
+    cloning = {task.repo_name for task in clones.tasks() if task.is_active and task.action == ra_clone.CLONE}
+    return [entry.name for entry in workspace_index.repos() if entry.name not in cloning]
+
+
+def use_case_names():
+    return [entry.name for entry in workspace_index.use_cases()]
+
+
+def watched_job():
+    job_id = st.session_state.get('watched_job_id')
+    return scheduler.get(job_id) if job_id else None
+
+
+def watch_job(job_id):
+    # The job id is mirrored into the URL (?job=...) so a reloaded tab re-attaches to the same job
+    st.session_state.watched_job_id = job_id
+    if job_id:
+        st.query_params["job"] = job_id
+    elif "job" in st.query_params:
+        del st.query_params["job"]
+
+
+if st.session_state.watched_job_id is None and st.query_params.get("job"):
+    attached = scheduler.get(st.query_params["job"])
+    if attached is not None and attached.is_active:
+        st.session_state.watched_job_id = attached.id
+
+
+def show_docs_link(repo_path):
+    # Centered button to view docs
+    _, col, _ = st.columns([1, 2, 1])
+    with col:
+        st.link_button("View Documentation", url=gateway.docs_url(os.path.basename(os.path.normpath(repo_path))), use_container_width=True)
+
+
+def publish_docs(repo_path):
     ra_path = os.path.join(repo_path, '_ra')
     if not os.path.isdir(ra_path):
-        st.error(f"Directory not found: {ra_path}. Cannot start documentation server.")
+        st.error(f"Directory not found: {ra_path}. Cannot publish documentation.")
         return
 
     try:
-        # Step 1: Install documentation dependencies
-        with st.spinner("Installing documentation dependencies..."):
-            install_process = subprocess.run(
-                [
-                    "pip", "install",
-                    "mkdocs>=1.5.0",
-                    "mkdocs-material>=9.0.0",
-                    "mkdocs-mermaid2-plugin>=1.0.0",
-                    "pymdown-extensions>=10.0.0",
-                    "mkdocs-awesome-pages-plugin>=2.8.0",
-                    "mkdocs-minify-plugin>=0.7.0",
-                    "mkdocs-git-revision-date-localized-plugin>=1.2.0"
-                ],
-                cwd=ra_path,
-                capture_output=True,
-                text=True,
-                check=False
-            )
-            if install_process.returncode != 0:
+        # Step 1: Check documentation dependencies (pip only runs once per process, for missing packages)
+        with st.spinner("Checking documentation dependencies..."):
+            install_error = docs.ensure_toolchain()
+            if install_error:
                 st.error("Failed to install dependencies:")
-                st.code(install_process.stderr)
+                st.code(install_error)
                 return
 
-        # Step 2: Build docs
+        # Step 2: Build docs, skipping the build when the _ra/ sources are unchanged.
+        # The shared docs gateway serves _ra/site directly, so no server needs to be started.
         with st.spinner("Building documentation..."):
-            build_process = subprocess.run(
-                ["mkdocs", "build", "--clean"],
-                cwd=ra_path,
-                capture_output=True,
-                text=True,
-                check=False
-            )
-            if build_process.returncode != 0:
+            build_mode, build_error = docs.build_site(ra_path)
+            if build_error:
                 st.error("Failed to build documentation:")
-                st.code(build_process.stderr)
+                st.code(build_error)
                 return
-        
-        # Step 3: Serve docs
-        with st.spinner(f"Starting documentation server on port {port}..."):
-            proc = subprocess.Popen(
-                ["mkdocs", "serve", f"--dev-addr=127.0.0.1:{port}"],
-                cwd=ra_path,
-                preexec_fn=os.setsid
-            )
-            st.session_state.running_servers[port] = proc
-            st.success("Documentation server started.")
-            
-            # Centered button to view docs
-            _, col, _ = st.columns([1, 2, 1])
-            with col:
-                st.link_button("View Documentation", url=f"http://localhost:{port}", use_container_width=True)
+
+        st.success(f"Documentation is published (build: {build_mode}).")
+        show_docs_link(repo_path)
 
     except Exception as e:
-        st.error(f"An error occurred while setting up the documentation server: {e}")
+        st.error(f"An error occurred while publishing the documentation: {e}")
 
 @st.fragment
-def show_analysis_progress():
-    # Determine what entity is being analyzed (repo or use case)
-    target_entity = st.session_state.get('target_entity_running')
-    if not target_entity:
-        # Fallback: infer from repo_path_running
-        inferred = None
-        try:
-            running_path = st.session_state.get('repo_path_running')
-            if running_path:
-                base = os.path.basename(os.path.normpath(running_path))
-                if os.path.isfile(os.path.join(running_path, 'usecase.md')):
-                    inferred = f"use case: {base}"
-                else:
-                    inferred = f"repo: {base}"
-        except Exception:
-            inferred = None
-        target_entity = inferred or st.session_state.get('selected_use_case') or st.session_state.get('selected_repo') or "(unknown)"
+def show_analysis_progress(job_id):
+    job = scheduler.get(job_id)
+    if job is None:
+        watch_job(None)
+        return
 
-    with st.status(f"Running analysis: `{st.session_state.selected_command_name_running}` on `{target_entity}`...", expanded=True) as status:
+    target_entity = f"{'use case' if job.kind == 'usecase' else 'repo'}: {job.target}"
+    # Woken by the scheduler when the job prints or changes status, instead of polling the log
+    events = scheduler.subscribe(job.id)
+    with events, st.status(f"Running analysis: `{job.name}` on `{target_entity}`...", expanded=True) as status:
         log_placeholder = st.empty()
+        # Only the most recent lines are rendered; older output is paged in by show_log_history
+        visible_lines = deque(maxlen=config.LOG_VIEW_LINES)
+        cursor = 0
+        rendered = False
 
         # Loop to update the log
-        while st.session_state.get('command_is_running'):
-            while not st.session_state.command_q.empty():
-                line = st.session_state.command_q.get_nowait()
-                if line.startswith("---RC:"):
-                    st.session_state.command_return_code = int(line.replace("---RC:", "").replace("---", ""))
-                    st.session_state.command_is_running = False
-                    st.session_state.current_process = None
-                    break
-                st.session_state.command_log += line
-            
-            log_placeholder.code(st.session_state.command_log)
-            
-            if not st.session_state.get('command_is_running'):
-                # Command has just finished
-                if st.session_state.command_return_code == 0:
-                    # Post-run actions: if it was a doc generation, start the server.
-                    if "documentation" in st.session_state.selected_command_name_running.lower():
-                        status.update(label="Documentation generated!", state="complete", expanded=False)
-                        logging.info("Documentation generation successful.")
-                        st.success("Documentation generation complete. Starting server...")
-                        running_repo_path = st.session_state.repo_path_running
-                        if running_repo_path not in st.session_state.repo_ports:
-                            st.session_state.repo_ports[running_repo_path] = st.session_state.next_port
-                            st.session_state.next_port += 1
-                        port_to_start = st.session_state.repo_ports[running_repo_path]
-                        start_docs_server(running_repo_path, port_to_start)
-                    else:
-                        status.update(label="Analysis complete!", state="complete", expanded=False)
-                        logging.info(f"Analysis successful: {st.session_state.selected_command_name_running}")
-                        st.session_state.last_analysis_status = {"status": "success", "message": "Analysis complete!"}
-
+        while True:
+            new_lines, cursor, _ = job.log.since(cursor)
+            if new_lines or not rendered:
+                visible_lines.extend(new_lines)
+                hidden = cursor - len(visible_lines)
+                header = "$ Go get a coffee while the sentient toasters work their magic\n"
+                if hidden:
+                    header += f"... {hidden} earlier line(s), see the full log ...\n"
+                log_placeholder.code(header + "".join(visible_lines))
+                rendered = True
+
+            if job.is_active:
+                events.wait(timeout=config.VIEW_REFRESH_TIMEOUT, linger=0.1)  # The fragment will re-run itself, not the whole app
+                continue
+
+            # Command has just finished
+            if job.status == SUCCEEDED:
+                # Post-run actions: if it was a doc generation, start the server.
+                if job.output_file and report_cache.artifact_root(job.output_file) == "_ra":
+                    status.update(label="Documentation generated!", state="complete", expanded=False)
+                    logging.info("Documentation generation successful.")
+                    st.success("Documentation generation complete. Building site...")
+                    publish_docs(job.target_path)
                 else:
-                    status.update(label="Analysis failed!", state="error")
-                    logging.error(f"Analysis failed: {st.session_state.selected_command_name_running} with exit code {st.session_state.command_return_code}")
-                    st.session_state.last_analysis_status = {"status": "error", "message": f"Analysis failed with exit code: {st.session_state.command_return_code}"}
-                
-                # Rerun one last time to clear the spinner
-                st.session_state.current_process = None
-                st.session_state.target_entity_running = None
-                
+                    status.update(label="Analysis complete!", state="complete", expanded=False)
+                    logging.info(f"Analysis successful: {job.name}")
+                    st.session_state.last_analysis_status = {"status": "success", "message": "Analysis complete!"}
+            elif job.status == CANCELLED:
+                status.update(label="Analysis cancelled.", state="error")
+                st.session_state.last_analysis_status = {"status": "error", "message": "Analysis was cancelled."}
+            else:
+                status.update(label="Analysis failed!", state="error")
+                logging.error(f"Analysis failed: {job.name} with exit code {job.return_code}")
+                st.session_state.last_analysis_status = {"status": "error", "message": f"Analysis failed with exit code: {job.return_code}"}
+
+            watch_job(None)
+            break
+
+
+@st.fragment
+def show_clone_progress(task_id):
+    task = clones.get(task_id)
+    if task is None:
+        st.session_state.watched_clone_id = None
+        return
+
+    verb = "Cloning" if task.action == ra_clone.CLONE else "Updating"
+    st.caption(f"{verb} `{task.repo_name}`" + (f" from {task.display_url}" if task.display_url else ""))
+    progress_bar = st.progress(0.0)
+    while task.is_active:
+        progress_bar.progress(task.progress, text=f"{task.stage} {task.message}".strip())
+        time.sleep(0.5)
+
+    st.session_state.watched_clone_id = None
+    if task.status != ra_clone.SUCCEEDED:
+        progress_bar.empty()
+        st.error(f"An error occurred during {task.action}: {task.error}")
+        return
+
+    progress_bar.progress(1.0, text=task.message or "Done")
+    if task.action == ra_clone.CLONE:
+        st.success(f"Repository cloned successfully into {task.dest}")
+        # --- Auto-select the cloned repo ---
+        workspace_index.invalidate(task.repo_name)
+        cloned_repos_list = repo_names()
+        if task.repo_name in cloned_repos_list:
+            st.session_state.selected_repo_index = cloned_repos_list.index(task.repo_name)
+        st.rerun()
+    elif task.action == ra_clone.RESTORE:
+        workspace_index.invalidate(task.repo_name)
+        st.success(f"Checkout of `{task.repo_name}` restored. {task.message}")
+    else:
+        workspace_index.invalidate(task.repo_name)
+        st.success(f"Repository `{task.repo_name}` updated. {task.message}")
+
+
+@st.fragment
+def show_pipeline_progress(pipeline_id):
+    pipeline = pipelines.get(pipeline_id)
+    if pipeline is None:
+        st.session_state.watched_pipeline_id = None
+        return
+
+    # Stages advance when jobs finish; any job event wakes the view
+    events = scheduler.subscribe()
+    with events, st.status(f"Running full assessment on `{pipeline.target}`...", expanded=True) as status:
+        stages_placeholder = st.empty()
+        while True:
+            rows = []
+            for stage in pipeline.stages.values():
+                state = stage.current_status
+                needs = f" (after {', '.join(stage.needs)})" if stage.needs else ""
+                job = f" · job `{stage.job.id}`" if stage.job else ""
+                error = f" · {stage.error}" if stage.error else ""
+                rows.append(f"`{state}` **{stage.name}**{needs}{job}{error}")
+            stages_placeholder.markdown("\n\n".join(rows))
+
+            if pipeline.is_active:
+                events.wait(timeout=config.VIEW_REFRESH_TIMEOUT, linger=0.1)  # The fragment will re-run itself, not the whole app
+                continue
+
+            if pipeline.succeeded:
+                status.update(label="Full assessment complete!", state="complete", expanded=False)
+                st.session_state.last_analysis_status = {"status": "success", "message": "Full assessment complete!"}
+            else:
+                status.update(label="Full assessment finished with failures.", state="error")
+                st.session_state.last_analysis_status = {"status": "error", "message": "Some stages of the full assessment failed."}
+            if gateway.has_site(pipeline.target_path):
+                show_docs_link(pipeline.target_path)
+            st.session_state.watched_pipeline_id = None
+            break
+
+
+def show_log_history(job):
+    # Page through the complete log spilled to disk, for output older than the live view
+    total = job.log.total_lines
+    if total <= config.LOG_VIEW_LINES:
+        return
+    with st.expander(f"Full log ({total} lines)"):
+        page_size = config.LOG_VIEW_LINES
+        page_count = (total + page_size - 1) // page_size
+        page = st.number_input("Page", min_value=1, max_value=page_count, value=1, key=f"log_page_{job.id}")
+        st.code("".join(job.log.read_page((page - 1) * page_size, page_size)))
+
+
+def show_job_queue():
+    # Server-wide view: every session sees, and can watch or cancel, the same jobs
+    jobs = scheduler.jobs()
+    if not jobs:
+        return
+
+    st.subheader("Job Queue")
+    st.caption(f"{len(scheduler.active_jobs())} active job(s), up to {scheduler.max_workers} running at once.")
+    # Per-class governor state: the adaptive limit drops after rate-limit errors and recovers on clean runs
+    for limiter in scheduler.class_stats():
+        note = f" · rate limited, pausing new jobs for {limiter['paused_for']:.0f}s" if limiter['paused_for'] else ""
+        st.caption(f"`{limiter['class']}`: {limiter['running']} running, {limiter['waiting']} waiting, "
+                   f"limit {limiter['limit']:g} of {limiter['max']}{note}")
+    for job in jobs[:20]:
+        col_info, col_watch, col_cancel = st.columns([6, 1, 1])
+        with col_info:
+            st.markdown(f"`{job.status}` **{job.name}** on `{job.target}` · job `{job.id}`")
+        with col_watch:
+            if job.is_active and st.button("Watch", key=f"watch_{job.id}"):
+                watch_job(job.id)
+                st.rerun()
+        with col_cancel:
+            if job.is_active and st.button("Cancel", key=f"cancel_{job.id}"):
+                scheduler.cancel(job.id)
+                st.rerun()
+
+
+def show_report(md_path, key):
+    """Render one page of a report; parsing and diagram rendering are cached across reruns."""
+    renderer = get_report_renderer()
+    try:
+        report = renderer.load(md_path)
+    except Exception as e:
+        st.error(f"Error reading markdown file: {e}")
+        return
+    page = report.pages[0]
+    if len(report.pages) > 1:
+        labels = [f"{i + 1}. {p.title}" if p.title else f"Page {i + 1}" for i, p in enumerate(report.pages)]
+        index = st.selectbox("Section", range(len(labels)), format_func=labels.__getitem__, key=key)
+        page = report.pages[min(index, len(report.pages) - 1)]
+    for part in page.parts:
+        if part.kind == MERMAID:
+            image = renderer.mermaid.image_uri(part)
+            if image:
+                st.markdown(f'<img src="{image}" style="max-width: 100%">', unsafe_allow_html=True)
             else:
-                time.sleep(1) # The fragment will re-run itself, not the whole app
+                streamlit_mermaid.st_mermaid(part.text)
+        else:
+            st.markdown(part.text, unsafe_allow_html=True)
+
+
+def show_search():
+    index = get_search_index()
+    # Picks up reports written outside the scheduler (restored from cache, batch runs, manual edits)
+    index.refresh()
+    query = st.text_input("Search all reports", placeholder='e.g. log4j, "spring boot" NOT test, struts*')
+    scopes = ["All repositories and use cases"] + [e.name for e in workspace_index.entries()]
+    scope = st.selectbox("In", scopes)
+    if not query.strip():
+        stats = index.stats()
+        st.caption(f"{stats['documents']} reports and docs pages of {stats['targets']} repositories and use cases indexed.")
+        return
+    started = time.perf_counter()
+    results = index.search(query, target=None if scope == scopes[0] else scope)
+    st.caption(f"{len(results)} result(s) in {(time.perf_counter() - started) * 1000:.0f} ms")
+    if not results:
+        st.info("No report matches this search.")
+    for result in results:
+        path = os.path.relpath(result.path, result.target)
+        st.markdown(f"**{result.target}** · `{path}` — {result.title}")
+        st.caption(f"… {result.snippet} …")
+
+
+def show_performance():
+    # Timings recorded by every process sharing the workspace (UI, batch CLI), see ra/telemetry.py
+    periods = {"Last 24 hours": 86400, "Last 7 days": 7 * 86400, "Last 30 days": 30 * 86400, "All time": None}
+    period = st.selectbox("Period", list(periods))
+    events = telemetry.load_events(since=time.time() - periods[period] if periods[period] else None)
+    reruns = get_page_timings().summary()
+    if reruns:
+        with st.expander("Page render times of this server process"):
+            st.dataframe([{"view": r.pop("key"), **r} for r in reruns], hide_index=True)
+    usage = get_storage_manager().last_usage
+    if usage:
+        st.caption(f"Workspace uses {usage['total'] / 2 ** 30:.1f} GiB of its {usage['budget'] / 2 ** 30:.1f} GiB budget "
+                   f"(measured {time.strftime('%H:%M', time.localtime(usage['measured_at']))}).")
+    check = get_prewarmer().last_check
+    if check:
+        st.caption(f"Prewarm check at {time.strftime('%H:%M', time.localtime(check['checked_at']))}: "
+                   f"{len(check['stale'])} repositories changed upstream, {len(check['refreshed'])} refreshed"
+                   f"{'' if check['in_window'] else ' (outside the off-peak windows)'}.")
+    if not events:
+        st.info("No telemetry recorded yet. Run an analysis, clone a repository or build docs first.")
+        return
+
+    jobs = [e for e in events if e["phase"] == telemetry.ANALYSIS]
+    col_runs, col_wall, col_cpu, col_wait = st.columns(4)
+    col_runs.metric("Analysis runs", len(jobs))
+    col_wall.metric("Analysis time", f"{sum(e['duration'] for e in jobs) / 3600:.1f} h")
+    col_cpu.metric("Analysis CPU", f"{sum(e.get('cpu_seconds', 0) for e in jobs) / 3600:.2f} h")
+    waits = [e["queue_wait"] for e in jobs if "queue_wait" in e]
+    col_wait.metric("Mean queue wait", f"{sum(waits) / len(waits):.0f} s" if waits else "-")
+
+    st.subheader("By phase")
+    st.dataframe(telemetry.summarize(events, "phase"), hide_index=True)
+    st.subheader("Analyses by command")
+    st.dataframe(telemetry.summarize(jobs, "command"), hide_index=True)
+    st.subheader("Costliest repositories and use cases")
+    st.dataframe(telemetry.summarize(events, "target")[:20], hide_index=True)
+    with st.expander("Recent events"):
+        st.dataframe(events[::-1][:200], hide_index=True)
+    st.caption(f"Prometheus metrics: {config.DOCS_BASE_URL}{gateway.METRICS_PATH}")
+
+
+def submit_analysis(analysis, target, target_path):
+    # Reuse a report generated for the same revision, command and prompt version if there is one;
+    # otherwise queue the command. Returns the queued (or joined) job, or None if the report is already in place.
+    entity = "use case" if analysis.target == ra_commands.USE_CASE else "repository"
+    output_file = analysis.output_file
+    plan = ra_analysis.plan_analysis(analysis, target_path, scheduler=scheduler)
+
+    if plan.outcome == ra_analysis.IN_FLIGHT:
+        # Someone already started the same analysis on the same commit: follow that job instead of paying twice
+        st.info(f"'{analysis.name}' is already running for this {entity} (job `{plan.job.id}`). Following it.")
+        return plan.job
+    elif plan.outcome == ra_analysis.EXISTS:
+        st.info(f"Report '{output_file}' already exists for this {entity}. Analysis not required.")
+    elif plan.outcome == ra_analysis.FRESH:
+        st.info(f"Report '{output_file}' is up to date for this {entity}. Analysis not required.")
+    elif plan.outcome == ra_analysis.RESTORED:
+        st.success(f"Report '{output_file}' served from cache (generated earlier for the same revision).")
+    elif plan.outcome == ra_analysis.UNCHANGED:
+        st.info(f"No files changed since '{output_file}' was generated. Analysis not required.")
+    else:
+        if plan.resume_from is not None:
+            st.info(f"Continuing from the partial output of an earlier failed run of '{analysis.name}'.")
+        elif plan.delta is not None:
+            st.info(f"Incremental analysis: {len(plan.delta.files)} file(s) changed since commit `{plan.delta.base_rev[:8]}`.")
+        return ra_analysis.submit(scheduler, plan, target)
+    return None
+
 
 st.title("DORA")
 st.caption("Documentation, Obsolescence, Risk and Architecture Assistant")
@@ -218,8 +526,9 @@ st.caption("Documentation, Obsolescence, Risk and Architecture Assistant")
 
 analysis_type = st.radio(
     "Choose analysis type:",
-    ("Repo Analysis", "Product Use Case Analysis")
+    ("Repo Analysis", "Product Use Case Analysis", "Search", "Performance")
 )
+page_view = analysis_type
 
 if analysis_type == "Repo Analysis":
     st.header("Repo Analysis")
@@ -227,18 +536,20 @@ if analysis_type == "Repo Analysis":
     # Mirror Product Use Case Analysis: show selected entity caption before tabs
     if st.session_state.get('selected_repo'):
         st.caption(f"Selected Repository: `{st.session_state.get('selected_repo')}`")
+        # Keeps the repository at the recent end of the disk budget's eviction order
+        storage.touch(st.session_state.get('selected_repo'))
 
     tab_options = ["Repository"]
     if st.session_state.get('selected_repo'):
         tab_options.extend(["Analysis", "Results"])
     # Determine default tab
-    if st.session_state.get('command_is_running'):
-        # Command is running, default to Analysis tab
+    if watched_job() is not None:
+        # A watched command is running, default to Analysis tab
         default_tab = "Analysis"
     else:
         # Default to Repository
         default_tab = "Repository"
-else:
+elif analysis_type == "Product Use Case Analysis":
     st.header("Product Use Case Analysis")
 
     # Mirror Repo Analysis: show selected entity caption before tabs
@@ -250,6 +561,7 @@ else:
     # Default to Use Case tab
     uc_default_tab = "Use Case"
     selected_uc_tab = ui.tabs(options=uc_tab_options, default_value=uc_default_tab)
+    page_view = f"{analysis_type} / {selected_uc_tab}"
 
     if selected_uc_tab == "Use Case":
         with st.expander("Create a new Use Case"):
@@ -273,41 +585,34 @@ else:
                     st.warning("Please provide both a use case name and description.")
                 else:
                     slug = _slugify(use_case_name)
-                    uc_dir = os.path.join("../workspace", slug)
+                    uc_dir = os.path.join(config.WORKSPACE_DIR, slug)
                     os.makedirs(uc_dir, exist_ok=True)
                     md_path = os.path.join(uc_dir, "usecase.md")
-                    with open(md_path, 'w', encoding='utf-8') as f:
-                        f.write(f"# {use_case_name}\n\n{use_case_desc}\n")
+                    # Written atomically: a running analysis may be reading the previous version
+                    fsutil.atomic_write_text(md_path, f"# {use_case_name}\n\n{use_case_desc}\n")
 
                     # Mirror clone flow for use cases: set as selected and index
                     st.session_state.selected_use_case = slug
-                    try:
-                        entries = [d for d in os.listdir("../workspace") if os.path.isfile(os.path.join("../workspace", d, "usecase.md"))]
-                        if slug in entries:
-                            st.session_state.selected_use_case_index = entries.index(slug)
-                    except Exception:
-                        pass
+                    workspace_index.invalidate(slug)
+                    entries = use_case_names()
+                    if slug in entries:
+                        st.session_state.selected_use_case_index = entries.index(slug)
 
                     st.success(f"Saved use case in: {uc_dir}")
                     st.rerun()
 
         # --- List Saved Use Cases and Select (always visible) ---
         st.header("Select the Use Case")
-        workspace_path = "../workspace"
-        if os.path.exists(workspace_path) and os.path.isdir(workspace_path):
+        if workspace_index.exists():
             # A use case is any folder containing a usecase.md file
-            entries = [d for d in os.listdir(workspace_path) if os.path.isdir(os.path.join(workspace_path, d))]
-            saved_use_cases = []
-            for d in entries:
-                if os.path.isfile(os.path.join(workspace_path, d, "usecase.md")):
-                    saved_use_cases.append(d)
+            saved_use_cases = use_case_names()
 
             if not saved_use_cases:
                 st.info("No saved use cases found in the workspace directory.")
             else:
                 def on_uc_change():
                     st.session_state.selected_use_case = st.session_state.use_case_selector
-                    all_uc = [d for d in os.listdir("../workspace") if os.path.isfile(os.path.join("../workspace", d, "usecase.md"))]
+                    all_uc = use_case_names()
                     if st.session_state.use_case_selector in all_uc:
                         st.session_state.selected_use_case_index = all_uc.index(st.session_state.use_case_selector)
 
@@ -336,101 +641,54 @@ else:
             st.session_state.last_analysis_status = None
 
         if selected_use_case:
-            uc_path = os.path.join("../workspace", selected_use_case)
+            uc_path = os.path.join(config.WORKSPACE_DIR, selected_use_case)
 
             st.header("Run Analysis")
 
-            # Load $USE_CASE commands from commands.md
-            command_map = {}
-            try:
-                with open("commands.md", 'r', encoding='utf-8') as f:
-                    for line in f:
-                        if line.strip():
-                            parts = [p.strip() for p in line.strip().split(',', 2)]
-                            if len(parts) >= 2:
-                                name = parts[0]
-                                command_template = parts[1]
-                                output_file = parts[2] if len(parts) > 2 else None
-                                if "$USE_CASE" in command_template:
-                                    command = command_template.replace("$USE_CASE", f"'$(cat usecase.md)'")
-                                    # We will run in uc_path so relative outputs go there
-                                    command_map[name] = (command, output_file)
-            except FileNotFoundError:
-                command_map["Error"] = ("echo 'commands.md not found'", None)
-
-            if not command_map:
+            # $USE_CASE commands from commands.md
+            command_map = {c.name: c for c in command_registry.commands(ra_commands.USE_CASE)}
+
+            if command_registry.error:
+                st.error(command_registry.error)
+            elif not command_map:
                 st.warning("No Product Use Case commands found in commands.md (missing $USE_CASE).")
             else:
-                if not st.session_state.get('command_is_running'):
-                    selected_command_name = st.selectbox("Select an analysis to run", list(command_map.keys()))
-                    run_button = st.button("Run Analysis")
-
-                    if run_button and selected_command_name:
-                        command_to_run, output_file = command_map[selected_command_name]
-
-                        should_run_command = True
-                        if output_file:
-                            report_file_path = os.path.join(uc_path, output_file)
-                            if os.path.exists(report_file_path):
-                                st.info(f"Report '{output_file}' already exists for this use case. Analysis not required.")
-                                should_run_command = False
-
-                        if should_run_command:
-                            logging.info(f"Starting use-case analysis: {selected_command_name} on use case: {selected_use_case}")
-
-                            st.session_state.command_is_running = True
-                            st.session_state.command_log = f"$ Go get a coffee while the sentient toasters work their magic\n"
-                            st.session_state.command_q = queue.Queue()
-                            st.session_state.command_return_code = None
-                            st.session_state.selected_command_name_running = selected_command_name
-                            st.session_state.repo_path_running = uc_path
-                            st.session_state.target_entity_running = st.session_state.get('selected_use_case')
-
-                            process = subprocess.Popen(
-                                command_to_run, shell=True, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
-                                text=True, cwd=uc_path, bufsize=1, universal_newlines=True, preexec_fn=os.setsid
-                            )
-                            st.session_state.current_process = process
-                            thread = threading.Thread(target=run_command_in_thread, args=(process, st.session_state.command_q))
-                            thread.daemon = True
-                            thread.start()
-                            st.session_state.command_thread = thread
-
-            if st.session_state.get('command_is_running'):
-                show_analysis_progress()
+                selected_command_name = st.selectbox("Select an analysis to run", list(command_map.keys()))
+                run_button = st.button("Run Analysis")
+
+                if run_button and selected_command_name:
+                    logging.info(f"Starting use-case analysis: {selected_command_name} on use case: {selected_use_case}")
+                    # Use case commands run in uc_path so relative outputs go there
+                    job = submit_analysis(command_map[selected_command_name], target=selected_use_case, target_path=uc_path)
+                    if job is not None:
+                        watch_job(job.id)
+
+            if watched_job() is not None:
+                show_log_history(watched_job())
+                show_analysis_progress(st.session_state.watched_job_id)
+            show_job_queue()
         else:
             st.info("Please select a use case first (Use Case tab).")
 
     elif selected_uc_tab == "Results":
         selected_use_case = st.session_state.get('selected_use_case')
         if selected_use_case:
-            uc_path = os.path.join("../workspace", selected_use_case)
+            uc_path = os.path.join(config.WORKSPACE_DIR, selected_use_case)
             st.header("View Use Case Reports")
 
             if not os.path.isdir(uc_path):
                 st.warning("Selected use case directory not found.")
             else:
                 # Show any .md except the source usecase.md
-                md_files = [f for f in os.listdir(uc_path) if f.endswith('.md') and f != 'usecase.md']
+                uc_entry = workspace_index.get(selected_use_case)
+                md_files = uc_entry.reports if uc_entry else []
                 if not md_files:
                     st.info("No generated markdown reports found in this use case folder.")
                 else:
                     selected_md = st.selectbox("Select a report to view", md_files)
                     if selected_md:
                         md_path = os.path.join(uc_path, selected_md)
-                        try:
-                            with open(md_path, 'r', encoding='utf-8') as f:
-                                md_content = f.read()
-
-                            parts = re.split(r"(```mermaid\n.*?\n```)", md_content, flags=re.DOTALL)
-                            for part in parts:
-                                if part.strip().startswith("```mermaid"):
-                                    mermaid_code = part.strip().replace("```mermaid", "").replace("```", "")
-                                    st_mermaid(mermaid_code)
-                                else:
-                                    st.markdown(part, unsafe_allow_html=True)
-                        except Exception as e:
-                            st.error(f"Error reading markdown file: {e}")
+                        show_report(md_path, key=f"uc_report_page_{selected_use_case}_{selected_md}")
         else:
             st.info("Please select a use case first (Use Case tab).")
 
@@ -439,6 +697,7 @@ else:
 # --- Tabs (Repo Analysis only) ---
 if analysis_type == "Repo Analysis":
     selected_tab = ui.tabs(options=tab_options, default_value=default_tab)
+    page_view = f"{analysis_type} / {selected_tab}"
 
     if selected_tab == "Repository":
         with st.expander("Clone a new Repository"):
@@ -467,34 +726,25 @@ if analysis_type == "Repo Analysis":
                         repo_name = repo_url
                         clone_url = f"https://dev.azure.com/{organization_name}/{project_name}/_git/{repo_name}"
                     else:
-                        repo_name = repo_url.split("/")[-1].replace(".git", "")
+                        repo_name = ra_clone.repo_name_from_url(repo_url)
                         clone_url = repo_url
 
-                    clone_path = os.path.join("../workspace", repo_name)
+                    clone_path = os.path.join(config.WORKSPACE_DIR, repo_name)
                     
                     if pat_token and "dev.azure.com" in clone_url:
                         clone_url = clone_url.replace("https://", f"https://{pat_token}@")
                         st.info("Using Personal Access Token for Azure DevOps.")
 
-                    if os.path.isdir(clone_path):
-                        st.warning(f"Directory {clone_path} already exists. Skipping clone.")
+                    if clones.active_task_for(clone_path) is not None:
+                        st.warning(f"{clone_path} is already being cloned or updated.")
+                    elif os.path.isdir(clone_path):
+                        st.warning(f"Directory {clone_path} already exists. Fetching updates instead.")
+                        st.session_state.watched_clone_id = clones.update(clone_path).id
                     else:
                         if proxy_url:
-                            os.system(f"git config --global http.proxy {proxy_url}")
-                            os.system(f"git config --global https.proxy {proxy_url}")
                             st.info(f"Using proxy: {proxy_url}")
-                        with st.spinner(f"Cloning repository from {clone_url}..."):
-                            kwargs = {}
-                            if branch_name:
-                                kwargs['branch'] = branch_name
-                            git.Repo.clone_from(clone_url, clone_path, **kwargs)
-                        st.success(f"Repository cloned successfully into {clone_path}")
-                        
-                        # --- Auto-select the cloned repo ---
-                        cloned_repos_list = [d for d in os.listdir("../workspace") if os.path.isdir(os.path.join("../workspace", d))]
-                        if repo_name in cloned_repos_list:
-                            st.session_state.selected_repo_index = cloned_repos_list.index(repo_name)
-                        st.rerun()
+                        task = clones.clone(clone_url, clone_path, branch=branch_name or None, proxy_url=proxy_url or None)
+                        st.session_state.watched_clone_id = task.id
 
                 except Exception as e:
                     st.error(f"An error occurred during cloning: {e}")
@@ -502,16 +752,15 @@ if analysis_type == "Repo Analysis":
         # --- 2. List Cloned Repositories and Run Commands ---
         st.header("Select the Repository")
 
-        workspace_path = "../workspace"
-        if os.path.exists(workspace_path) and os.path.isdir(workspace_path):
-            cloned_repos = [d for d in os.listdir(workspace_path) if os.path.isdir(os.path.join(workspace_path, d)) and not os.path.isfile(os.path.join(workspace_path, d, "usecase.md"))]
+        if workspace_index.exists():
+            cloned_repos = repo_names()
             
             if not cloned_repos:
                 st.info("No cloned repositories found in the workspace directory.")
             else:
                 def on_repo_change():
                     st.session_state.selected_repo = st.session_state.repo_selector
-                    cloned_repos = [d for d in os.listdir("../workspace") if os.path.isdir(os.path.join("../workspace", d)) and not os.path.isfile(os.path.join("../workspace", d, "usecase.md"))]
+                    cloned_repos = repo_names()
                     if st.session_state.repo_selector in cloned_repos:
                         st.session_state.selected_repo_index = cloned_repos.index(st.session_state.repo_selector)
 
@@ -528,9 +777,31 @@ if analysis_type == "Repo Analysis":
                 if 'repo_selector' in st.session_state:
                     st.session_state.selected_repo = st.session_state.repo_selector
 
+                selected_entry = workspace_index.get(st.session_state.get('selected_repo'))
+                if selected_entry is not None:
+                    details = [f"HEAD `{selected_entry.head[:8]}`" if selected_entry.head
+                               else "checkout evicted to save disk space" if selected_entry.evicted else "no git HEAD",
+                               f"{len(selected_entry.reports)} report(s)"]
+                    if selected_entry.last_analysis:
+                        details.append(f"last analysis {time.strftime('%Y-%m-%d %H:%M', time.localtime(selected_entry.last_analysis))}")
+                    st.caption(" · ".join(details))
+
+                if selected_entry is not None and selected_entry.evicted:
+                    if st.button("Restore checkout"):
+                        restore_path = os.path.join(config.WORKSPACE_DIR, st.session_state.selected_repo)
+                        if clones.active_task_for(restore_path) is None:
+                            st.session_state.watched_clone_id = clones.restore(restore_path).id
+                elif st.session_state.get('selected_repo') and st.button("Fetch updates from remote"):
+                    update_path = os.path.join(config.WORKSPACE_DIR, st.session_state.selected_repo)
+                    if clones.active_task_for(update_path) is None:
+                        st.session_state.watched_clone_id = clones.update(update_path).id
+
         else:
             st.warning("The 'workspace' directory does not exist.")
 
+        if st.session_state.get('watched_clone_id'):
+            show_clone_progress(st.session_state.watched_clone_id)
+
     elif selected_tab == "Analysis":
         selected_repo = st.session_state.get('selected_repo')
 
@@ -543,106 +814,74 @@ if analysis_type == "Repo Analysis":
             st.session_state.last_analysis_status = None # Clear after displaying
 
         if selected_repo:
-            repo_path = os.path.join("../workspace", selected_repo)
+            repo_path = os.path.join(config.WORKSPACE_DIR, selected_repo)
 
             # --- New: Command Execution Section ---
             st.header("Run Analysis")
             
-            # Load commands from commands.md and replace $REPOSITORY
-            command_map = {}
-            try:
-                with open("commands.md", 'r', encoding='utf-8') as f:
-                    relative_repo_path = os.path.join("workspace", selected_repo) + os.sep
-                    for line in f:
-                        if line.strip():
-                            parts = [p.strip() for p in line.strip().split(',', 2)]
-                            if len(parts) >= 2:
-                                name = parts[0]
-                                command_template = parts[1]
-                                output_file = parts[2] if len(parts) > 2 else None
-                                command = command_template.replace("$REPOSITORY", relative_repo_path)
-                                command_map[name] = (command, output_file)
-
-            except FileNotFoundError:
-                command_map["Error"] = ("echo 'commands.md not found'", None)
-            
-            if not command_map:
+            # $REPOSITORY commands from commands.md
+            command_map = {c.name: c for c in command_registry.commands(ra_commands.REPO)}
+            selected_entry = workspace_index.get(selected_repo)
+
+            if selected_entry is not None and selected_entry.evicted:
+                # Reports are still in the Results tab; commands need the source code back
+                st.info("This repository's checkout was evicted to save disk space. Restore it to run analyses.")
+                if st.button("Restore checkout") and clones.active_task_for(repo_path) is None:
+                    st.session_state.watched_clone_id = clones.restore(repo_path).id
+                if st.session_state.get('watched_clone_id'):
+                    show_clone_progress(st.session_state.watched_clone_id)
+            elif command_registry.error:
+                st.error(command_registry.error)
+            elif not command_map:
                 st.warning("No valid commands found in commands.md.")
             else:
-                # Hide controls when a command is running
-                if not st.session_state.get('command_is_running'):
-                    selected_command_name = st.selectbox("Select an analysis to run", list(command_map.keys()))
+                selected_command_name = st.selectbox("Select an analysis to run", list(command_map.keys()))
+                col_run, col_full = st.columns(2)
+                with col_run:
                     run_button = st.button("Run Analysis")
+                with col_full:
+                    # Runs every command as a DAG: independent stages in parallel, dependents once their inputs exist
+                    full_button = st.button("Run full assessment")
+
+                # Built docs are browsable through the shared gateway without any server per repo
+                if gateway.has_site(repo_path):
+                    st.success("Documentation is available.")
+                    show_docs_link(repo_path)
+
+                if run_button and selected_command_name:
+                    selected_command = command_map[selected_command_name]
+
+                    logging.info(f"Starting analysis: {selected_command_name} on repo: {selected_repo}")
+                    job = submit_analysis(selected_command, target=selected_repo, target_path=repo_path)
+                    if job is not None:
+                        if selected_command.is_docs:
+                            # Run the command to generate the docs first
+                            st.info("Documentation not generated yet. Running generation command...")
+                        watch_job(job.id)
+                    elif selected_command.is_docs:
+                        # Docs are up to date (or were served from cache): just (re)build the site if needed
+                        publish_docs(repo_path)
+
+                if full_button:
+                    running = pipelines.active_for(selected_repo)
+                    if running is not None:
+                        st.info("A full assessment of this repository is already running.")
+                        st.session_state.watched_pipeline_id = running.id
+                    else:
+                        try:
+                            logging.info(f"Starting full assessment on repo: {selected_repo}")
+                            st.session_state.watched_pipeline_id = pipelines.start(list(command_map.values()), selected_repo, repo_path).id
+                        except ValueError as e:
+                            st.error(str(e))
 
-                    # Check if docs server is already running for this repo
-                    repo_port = st.session_state.repo_ports.get(repo_path)
-                    if repo_port and repo_port in st.session_state.running_servers and st.session_state.running_servers[repo_port].poll() is None:
-                        st.success("Documentation server is running.")
-                        _, col, _ = st.columns([1, 2, 1])
-                        with col:
-                            st.link_button("View Documentation", url=f"http://localhost:{repo_port}", use_container_width=True)
-
-                    if run_button and selected_command_name:
-                        command_to_run, output_file = command_map[selected_command_name]
-
-                        should_run_command = True
-                        if output_file:
-                            report_file_path = os.path.join(repo_path, output_file)
-                            if os.path.exists(report_file_path):
-                                st.info(f"Report '{output_file}' already exists for this repository. Analysis not required.")
-                                should_run_command = False
-                        
-                        if should_run_command:
-                            logging.info(f"Starting analysis: {selected_command_name} on repo: {selected_repo}")
-
-                            # --- Start command execution state ---
-                            st.session_state.command_is_running = True
-                            st.session_state.command_log = f"$ Go get a coffee while the sentient toasters work their magic\n"
-                            st.session_state.command_q = queue.Queue()
-                            st.session_state.command_return_code = None
-                            st.session_state.selected_command_name_running = selected_command_name
-                            st.session_state.repo_path_running = repo_path
-                            st.session_state.target_entity_running = st.session_state.get('selected_repo')
-
-                            # This logic handles "re-running" the docs server.
-                            # It also handles the case where the command *generates* the docs for the first time.
-                            if "documentation" in selected_command_name.lower():
-                                ra_path = os.path.join(repo_path, '_ra')
-                                if os.path.isdir(ra_path):
-                                    st.info("Starting/Restarting documentation server...")
-                                    # Assign a port to the repo if it doesn't have one
-                                    if repo_path not in st.session_state.repo_ports:
-                                        st.session_state.repo_ports[repo_path] = st.session_state.next_port
-                                        st.session_state.next_port += 1
-                                    repo_port = st.session_state.repo_ports[repo_path]
-                                    start_docs_server(repo_path, repo_port)
-                                    st.session_state.command_is_running = False # It's not a long-running fg task
-                                else:
-                                    # Run the command to generate the docs first
-                                    st.info("Documentation not generated yet. Running generation command...")
-                                    process = subprocess.Popen(
-                                        command_to_run, shell=True, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
-                                        text=True, cwd='../', bufsize=1, universal_newlines=True, preexec_fn=os.setsid
-                                    )
-                                    st.session_state.current_process = process
-                                    thread = threading.Thread(target=run_command_in_thread, args=(process, st.session_state.command_q))
-                                    thread.daemon = True
-                                    thread.start()
-                                    st.session_state.command_thread = thread
-                            else:
-                                process = subprocess.Popen(
-                                    command_to_run, shell=True, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
-                                    text=True, cwd='../', bufsize=1, universal_newlines=True, preexec_fn=os.setsid
-                                )
-                                st.session_state.current_process = process
-                                thread = threading.Thread(target=run_command_in_thread, args=(process, st.session_state.command_q))
-                                thread.daemon = True
-                                thread.start()
-                                st.session_state.command_thread = thread
+            if st.session_state.get('watched_pipeline_id'):
+                show_pipeline_progress(st.session_state.watched_pipeline_id)
 
             # This block will now handle rendering the logs for a running command
-            if st.session_state.get('command_is_running'):
-                show_analysis_progress()
+            if watched_job() is not None:
+                show_log_history(watched_job())
+                show_analysis_progress(st.session_state.watched_job_id)
+            show_job_queue()
 
         else:
             st.info("Please select a repository first.")
@@ -650,46 +889,63 @@ if analysis_type == "Repo Analysis":
     elif selected_tab == "Results":
         selected_repo = st.session_state.get('selected_repo')
         if selected_repo:
-            repo_path = os.path.join("../workspace", selected_repo)
+            repo_path = os.path.join(config.WORKSPACE_DIR, selected_repo)
             
             # --- View Markdown Files ---
             st.header("View Generated Reports")
             
-            allowed_md_files = ["ra-overview.md", "ra-obsolescence.md", "ra-security.md", "ra-migrate.md","ra-risk.md"]
-            
-            report_names = ["Architecture Overview", "Obsolescence Risk Assessment", "Security Assessment","Cross-Language Migration","Risk Graph"]
-            
+            # Reports are the markdown outputs declared in commands.md, titled by their `report=` field
+            report_commands = command_registry.reports(ra_commands.REPO)
+
             # Create mapping between report names and filenames
-            file_to_report_map = dict(zip(allowed_md_files, report_names))
-            report_to_file_map = dict(zip(report_names, allowed_md_files))
-            
-            md_files = [f for f in os.listdir(repo_path) if f in allowed_md_files]
+            file_to_report_map = {c.output_file: c.title for c in report_commands}
+            report_to_file_map = {c.title: c.output_file for c in report_commands}
+
+            repo_entry = workspace_index.get(selected_repo)
+            md_files = [f for f in file_to_report_map if repo_entry and f in repo_entry.reports]
             
             if not md_files:
-                st.info("No designated markdown files found in the root of this repository.")
-            else:
-                # Get available report names for files that actually exist
-                available_report_names = [file_to_report_map[f] for f in md_files]
-                
-                selected_report_name = st.selectbox("Select a report to view", available_report_names)
-                if selected_report_name:
-                    # Map the selected report name back to the actual filename
-                    selected_md_file = report_to_file_map[selected_report_name]
-                    md_path = os.path.join(repo_path, selected_md_file)
-                    try:
-                        with open(md_path, 'r', encoding='utf-8') as f:
-                            md_content = f.read()
-                        
-                        # Split markdown by mermaid blocks and render accordingly
-                        parts = re.split(r"(```mermaid\n.*?\n```)", md_content, flags=re.DOTALL)
-                        for part in parts:
-                            if part.strip().startswith("```mermaid"):
-                                mermaid_code = part.strip().replace("```mermaid", "").replace("```", "")
-                                st_mermaid(mermaid_code)
-                            else:
-                                st.markdown(part, unsafe_allow_html=True)
-
-                    except Exception as e:
-                        st.error(f"Error reading markdown file: {e}")
+                st.caption("No analysis reports yet: run an analysis in the Analysis tab.")
+
+            # The static dependency graph needs no analysis run, so it is always available. It is listed last
+            # and never preselected: building it parses the whole checkout
+            static_graph_name = "Dependency graph (static)"
+            # Get available report names for files that actually exist
+            available_report_names = [file_to_report_map[f] for f in md_files] + [static_graph_name]
+
+            selected_report_name = st.selectbox("Select a report to view", available_report_names,
+                                                index=0 if md_files else None, placeholder="Choose a report")
+            if selected_report_name == static_graph_name:
+                # Only files changed since the last build are parsed again
+                with st.spinner("Reading imports and dependency manifests..."):
+                    graph_path = depgraph.build(repo_path, max_age=config.DEPGRAPH_MIN_INTERVAL)
+                if graph_path:
+                    show_report(graph_path, key=f"repo_report_page_{selected_repo}_depgraph")
+                else:
+                    st.info("The dependency graph is built from the checkout: restore it in the Repository tab.")
+            elif selected_report_name:
+                # Most viewed repositories are refreshed first when they change upstream
+                prewarm.record_view(selected_repo)
+                # Map the selected report name back to the actual filename
+                selected_md_file = report_to_file_map[selected_report_name]
+                md_path = os.path.join(repo_path, selected_md_file)
+                show_report(md_path, key=f"repo_report_page_{selected_repo}_{selected_md_file}")
         else:
             st.info("Please select a repository first.")
+
+elif analysis_type == "Search":
+    st.header("Search")
+    show_search()
+
+elif analysis_type == "Performance":
+    st.header("Performance")
+    show_performance()
+
+
+# --- Page timing ---
+page_timings = get_page_timings()
+render_seconds = time.perf_counter() - script_started_at
+if page_timings.count == 0:
+    # The first render of a server process includes importing every module the page needs
+    telemetry.record(telemetry.STARTUP, render_seconds, view=page_view)
+page_timings.add(page_view, render_seconds)
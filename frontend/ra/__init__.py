@@ -0,0 +1,5 @@
+"""Orchestration layer behind the DORA Streamlit frontend.
+
+Everything in here is process-wide and free of Streamlit imports so it can be
+shared across browser sessions and reused by headless tooling.
+"""
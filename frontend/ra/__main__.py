@@ -0,0 +1,49 @@
+"""Command line entry point: ``python -m ra <command>`` (run from the ``frontend`` directory)."""
+import argparse
+import logging
+import sys
+
+from . import batch
+from . import bench
+from . import depgraph
+from . import prewarm
+from . import search
+from . import storage
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m ra", description="DORA headless tools")
+    subcommands = parser.add_subparsers(dest="subcommand", required=True)
+
+    batch_parser = subcommands.add_parser("batch", help="Clone and analyse many repositories without the UI")
+    batch.add_arguments(batch_parser)
+    batch_parser.set_defaults(handler=batch.main)
+
+    bench_parser = subcommands.add_parser("bench", help="Benchmark the orchestrator offline on a synthetic workspace")
+    bench.add_arguments(bench_parser)
+    bench_parser.set_defaults(handler=bench.main)
+
+    search_parser = subcommands.add_parser("search", help="Full-text search across the reports of the workspace")
+    search.add_arguments(search_parser)
+    search_parser.set_defaults(handler=search.main)
+
+    graph_parser = subcommands.add_parser("depgraph", help="Print the static dependency graph of a repository as Mermaid")
+    depgraph.add_arguments(graph_parser)
+    graph_parser.set_defaults(handler=depgraph.main)
+
+    prewarm_parser = subcommands.add_parser("prewarm", help="Refresh the reports of repositories that changed upstream")
+    prewarm.add_arguments(prewarm_parser)
+    prewarm_parser.set_defaults(handler=prewarm.main)
+
+    evict_parser = subcommands.add_parser("evict", help="Evict cold checkouts and built sites to fit the disk budget")
+    storage.add_arguments(evict_parser)
+    evict_parser.set_defaults(handler=storage.main)
+
+    args = parser.parse_args(argv)
+    # Logs go to stderr so stdout carries only the machine-readable summary
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s', stream=sys.stderr)
+    return args.handler(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
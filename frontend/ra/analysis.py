@@ -0,0 +1,131 @@
+"""Decide how to produce a report: reuse it, serve it from cache or run a command.
+
+This is the Streamlit-free core of "Run Analysis", shared by the UI and the
+headless batch CLI (``python -m ra batch``).
+"""
+import hashlib
+import os
+
+from . import checkpoint
+from . import commands
+from . import context
+from . import incremental
+from . import report_cache
+from .jobs import INTERACTIVE
+
+
+# Outcomes of plan_analysis()
+EXISTS = "exists"        # No revision to key on, but the report is present
+FRESH = "fresh"          # The report in place was generated for the current key
+RESTORED = "restored"    # Served from the report cache
+UNCHANGED = "unchanged"  # Generated for an older commit, but no files changed since
+IN_FLIGHT = "in_flight"  # The same command is already running on the same revision; join that job
+RUN = "run"              # The command has to run (fully, or as a delta)
+
+
+class AnalysisPlan:
+    """What plan_analysis() decided for one command on one target."""
+
+    def __init__(self, analysis, target_path, outcome, command=None, key=None, rev=None, delta=None, job=None,
+                 resume_from=None, context_pack=None):
+        self.analysis = analysis
+        self.target_path = target_path
+        self.outcome = outcome
+        self.command = command
+        self.key = key
+        self.rev = rev
+        self.delta = delta
+        # The in-flight job an IN_FLIGHT plan joins
+        self.job = job
+        # Checkpointed partial output of a failed run that this run continues
+        self.resume_from = resume_from
+        # The context pack the command's prompt points at; the job's runner builds it before the command starts
+        self.context_pack = context_pack
+
+    @property
+    def needs_run(self):
+        return self.outcome == RUN
+
+
+def flight_key(target_path, key, command_template):
+    """Identity of a unit of work for single-flight deduplication: (repo path, commit, command)."""
+    material = "\0".join([os.path.realpath(target_path), key or report_cache.template_hash(command_template)])
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+def plan_analysis(analysis, target_path, scheduler=None):
+    """Reuse a report generated for the same revision, command and prompt version if there is one.
+
+    If `scheduler` already runs the same command on the same revision, the plan
+    joins that job. Cache hits are restored into `target_path` as a side
+    effect. Otherwise the plan carries the command to run, narrowed to a delta
+    when possible.
+    """
+    output_file = analysis.output_file
+    rev = report_cache.revision(target_path)
+    key = report_cache.report_key(rev, analysis.template)
+    command = analysis.render(target_path)
+
+    context_pack = None
+
+    def plan(outcome, **kwargs):
+        return AnalysisPlan(analysis, target_path, outcome, command=command, key=key, rev=rev,
+                            context_pack=context_pack, **kwargs)
+
+    # Checked first: while the job runs, its report is half-written and must not be reused or diffed against
+    running = scheduler.inflight(flight_key(target_path, key, analysis.template)) if scheduler else None
+    if running is not None:
+        return plan(IN_FLIGHT, job=running)
+
+    def with_context(command):
+        # Only commands that actually run get (and pay for the first build of) the context pack
+        nonlocal context_pack
+        if analysis.target != commands.REPO:
+            return command
+        command, context_pack = context.extend_command(command, target_path, rev)
+        return command
+
+    if not output_file:
+        command = with_context(command)
+        return plan(RUN)
+    if key is None:
+        # Without a revision the report cannot be keyed, so fall back to an existence check
+        if os.path.exists(os.path.join(target_path, output_file)):
+            return plan(EXISTS)
+    elif report_cache.is_fresh(target_path, output_file, key):
+        return plan(FRESH)
+    elif report_cache.restore(key, rev, analysis.template, target_path, output_file):
+        return plan(RESTORED)
+
+    # A failed run of the same work left a partial report: continue it rather than start over
+    partial = checkpoint.latest(flight_key(target_path, key, analysis.template))
+    if partial is not None:
+        command = checkpoint.resume_command(with_context(command), output_file, partial)
+        return plan(RUN, resume_from=partial)
+
+    # The report is stale: if it was built from an older commit, only re-examine what changed since
+    delta = incremental.plan_delta(target_path, output_file, analysis.template, rev)
+    if delta is not None and not delta.files:
+        report_cache.store(key, rev, analysis.template, target_path, output_file)
+        return plan(UNCHANGED, delta=delta)
+    command = with_context(command)
+    if delta is not None:
+        command = incremental.delta_command(command, target_path, delta)
+        return plan(RUN, delta=delta)
+    return plan(RUN)
+
+
+def submit(scheduler, plan, target, priority=INTERACTIVE):
+    """Queue the command of a RUN plan on `scheduler` (or join an identical job already in flight)."""
+    if plan.job is not None:
+        return plan.job
+    analysis = plan.analysis
+    return scheduler.submit(
+        analysis.name, plan.command, cwd=analysis.cwd(plan.target_path), target=target,
+        target_path=plan.target_path, kind=analysis.target, output_file=analysis.output_file,
+        timeout=analysis.timeout, idle_timeout=analysis.idle_timeout,
+        concurrency_class=analysis.concurrency_class, priority=priority,
+        flight_key=flight_key(plan.target_path, plan.key, analysis.template),
+        meta={"cache_key": plan.key, "revision": plan.rev, "command_template": analysis.template,
+              "context_pack": plan.context_pack}
+    )
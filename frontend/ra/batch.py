@@ -0,0 +1,196 @@
+"""Headless fleet-wide analysis: ``python -m ra batch``.
+
+Clones (or updates) the given repositories, runs the selected commands from
+``commands.md`` (plus the commands they need) against every target as a
+dependency-aware pipeline with a concurrency limit, and prints a JSON
+summary. It goes through the same clone manager, command registry,
+report cache and job scheduler as the UI, so reports land in the same places
+and cached or up-to-date reports are not regenerated.
+"""
+import json
+import logging
+import os
+import time
+
+from . import analysis as ra_analysis
+from . import clone as ra_clone
+from . import commands as ra_commands
+from . import config
+from . import pipeline as ra_pipeline
+from . import report_cache
+from . import storage
+from .clone import CloneManager
+from .commands import CommandRegistry
+from .jobs import JobScheduler, BATCH
+from .pipeline import PipelineRunner
+from .search import SearchIndex
+from .workspace import EVICTED_FILE
+
+POLL_INTERVAL = 1.0
+
+
+def is_url(target):
+    return "://" in target or target.startswith("git@") or target.endswith(".git")
+
+
+def read_targets(targets, targets_file=None):
+    """Targets from the command line and/or a file (one per line, `#` comments allowed)."""
+    targets = list(targets)
+    if targets_file:
+        with open(targets_file, "r", encoding="utf-8") as f:
+            targets.extend(line.split("#", 1)[0].strip() for line in f)
+    return [t for t in dict.fromkeys(targets) if t]
+
+
+def select_commands(registry, names=None):
+    commands = registry.commands()
+    if not names:
+        return commands
+    selected = []
+    for name in names:
+        # Match either the full name ("1. Architecture Overview") or the report title ("Architecture Overview")
+        match = next((c for c in commands if name in (c.name, c.title)), None)
+        if match is None:
+            raise SystemExit(f"Unknown command {name!r}; known: {', '.join(c.name for c in commands)}")
+        selected.append(match)
+    return selected
+
+
+class BatchTarget:
+    """One repository or use case in a batch run, with the outcome of each command."""
+
+    def __init__(self, target):
+        self.source = target
+        self.url = target if is_url(target) else None
+        self.name = ra_clone.repo_name_from_url(target) if self.url else target
+        self.path = os.path.join(config.WORKSPACE_DIR, self.name)
+        self.kind = ra_commands.USE_CASE if os.path.isfile(os.path.join(self.path, "usecase.md")) else ra_commands.REPO
+        self.clone_task = None
+        self.error = None
+        self.analyses = []
+
+    def summary(self):
+        result = {"target": self.name, "kind": self.kind, "path": self.path, "analyses": self.analyses}
+        if self.url:
+            result["url"] = ra_clone.redact_url(self.url)
+        if self.clone_task is not None:
+            result["clone"] = {"action": self.clone_task.action, "status": self.clone_task.status,
+                               "error": self.clone_task.error}
+        if self.error:
+            result["error"] = self.error
+        return result
+
+
+def _fetch(targets, clones, branch=None, proxy_url=None, update=False):
+    for target in targets:
+        if clones.active_task_for(target.path) is not None:
+            continue
+        if target.url and not os.path.isdir(target.path):
+            target.clone_task = clones.clone(target.url, target.path, branch=branch, proxy_url=proxy_url)
+        elif os.path.isfile(os.path.join(target.path, EVICTED_FILE)):
+            # Evicted under the disk budget: the checkout must be back before commands run against it
+            target.clone_task = clones.restore(target.path)
+        elif update and target.kind == ra_commands.REPO and os.path.isdir(os.path.join(target.path, ".git")):
+            target.clone_task = clones.update(target.path)
+    for target in targets:
+        if target.clone_task is not None:
+            target.clone_task.wait()
+            if target.clone_task.status != ra_clone.SUCCEEDED and target.clone_task.action != ra_clone.UPDATE:
+                target.error = f"{target.clone_task.action} failed: {target.clone_task.error}"
+        if not target.error and not os.path.isdir(target.path):
+            target.error = f"not found in workspace: {target.path}"
+
+
+def run_batch(targets, command_names=None, jobs=None, clone_jobs=None, branch=None, proxy_url=None,
+              update=False, build_docs=True):
+    """Clone/update, analyse and summarise `targets`. Returns the summary dict."""
+    started_at = time.time()
+    registry = CommandRegistry()
+    if not registry.commands() and registry.error:
+        raise SystemExit(registry.error)
+    commands = select_commands(registry, command_names)
+
+    batch = [BatchTarget(t) for t in targets]
+    _fetch(batch, CloneManager(max_workers=clone_jobs), branch=branch, proxy_url=proxy_url, update=update)
+
+    search_index = SearchIndex()
+
+    def on_job_finished(job):
+        report_cache.on_job_finished(job)
+        pipelines.on_job_finished(job)
+        search_index.update(job.target)
+        storage.touch(job.target)
+
+    # Each target runs as a pipeline, so dependent commands wait for their inputs while the rest run in parallel
+    scheduler = JobScheduler(max_workers=jobs, on_finish=on_job_finished, recover=False)
+    # Batch priority: the governor admits interactive jobs ahead of these
+    pipelines = PipelineRunner(scheduler, registry, build_docs=build_docs, priority=BATCH)
+    started = []
+    for target in batch:
+        target_commands = [c for c in commands if c.target == target.kind]
+        if target.error or not target_commands:
+            continue
+        try:
+            started.append((target, pipelines.start(target_commands, target.name, target.path)))
+        except ValueError as e:
+            target.error = str(e)
+
+    logging.info(f"Batch: {len(started)} pipeline(s) for {len(batch)} target(s), {scheduler.max_workers} job(s) at a time")
+    while any(pipeline.is_active for _, pipeline in started):
+        time.sleep(POLL_INTERVAL)
+
+    for target, pipeline in started:
+        for stage in pipeline.stages.values():
+            record = stage.summary()
+            if stage.status in ra_pipeline.DONE_STATES and stage.command.is_markdown_report:
+                record["report"] = os.path.join(target.path, stage.command.output_file)
+            target.analyses.append(record)
+
+    records = [r for t in batch for r in t.analyses]
+    return {
+        "started_at": started_at,
+        "finished_at": time.time(),
+        "targets": [t.summary() for t in batch],
+        "totals": {
+            "targets": len(batch),
+            "target_errors": sum(1 for t in batch if t.error),
+            "analyses": len(records),
+            "ran": sum(1 for r in records if r["outcome"] == ra_analysis.RUN),
+            "reused": sum(1 for r in records if r["status"] == ra_pipeline.REUSED),
+            "failed": sum(1 for r in records if r["status"] not in ra_pipeline.DONE_STATES),
+        },
+    }
+
+
+def main(args):
+    targets = read_targets(args.targets, args.file)
+    if not targets:
+        raise SystemExit("No targets given (pass repo URLs / workspace names, or --file).")
+    summary = run_batch(
+        targets, command_names=args.command, jobs=args.jobs, clone_jobs=args.clone_jobs,
+        branch=args.branch, proxy_url=args.proxy, update=args.update, build_docs=not args.no_docs,
+    )
+    text = json.dumps(summary, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+    totals = summary["totals"]
+    return 1 if totals["failed"] or totals["target_errors"] else 0
+
+
+def add_arguments(parser):
+    parser.add_argument("targets", nargs="*", help="Repository URLs and/or workspace folder names")
+    parser.add_argument("-f", "--file", help="Read additional targets from a file, one per line")
+    parser.add_argument("-c", "--command", action="append",
+                        help="Command name or report title from commands.md (repeatable; default: all)")
+    parser.add_argument("-j", "--jobs", type=int, default=None,
+                        help=f"Analysis jobs running at once (default: DORA_MAX_WORKERS={config.MAX_WORKERS})")
+    parser.add_argument("--clone-jobs", type=int, default=None,
+                        help=f"Clones running at once (default: DORA_CLONE_WORKERS={config.CLONE_WORKERS})")
+    parser.add_argument("--branch", help="Branch to clone for new repositories")
+    parser.add_argument("--proxy", help="Proxy URL used for cloning")
+    parser.add_argument("--update", action="store_true", help="Fetch updates for repositories already in the workspace")
+    parser.add_argument("--no-docs", action="store_true", help="Don't build the documentation site after docs commands")
+    parser.add_argument("-o", "--output", help="Write the JSON summary to a file instead of stdout")
@@ -0,0 +1,509 @@
+"""Offline benchmark of the orchestrator's own overhead: ``python -m ra bench``.
+
+Generates a synthetic workspace - git repositories with deterministic trees
+and commits, use cases and built docs sites - and a ``commands.md`` whose
+commands run a deterministic stub ``claude`` placed first on ``PATH``. The
+stub prints timestamped lines at a controlled rate and writes the report its
+command declares, so no network or LLM is involved and LLM latency is out of
+the picture.
+
+Every scenario runs in a fresh ``python -m ra.bench`` process pointed at the
+synthetic workspace through ``DORA_*`` variables, and drives the same modules
+as ``main.py``:
+
+* ``scan``    - WorkspaceIndex cold scan, unchanged refresh and single-entry invalidation
+* ``jobs``    - plan_analysis/submit of every command on every target, as "Run Analysis" does:
+  runner spawn and settle overhead, output line delivery latency, throughput
+* ``rerun``   - the same analyses again, all answered from up-to-date reports
+* ``logs``    - one job with a huge log through the runner and LogStream, and history paging
+* ``gateway`` - docs gateway start-up, first response, throughput and revalidation
+
+The result (medians over ``--repeat`` runs) is printed as JSON or written to
+``--output``; ``--history`` appends it as one line to a JSONL file so runs can
+be compared over time.
+"""
+import http.client
+import json
+import logging
+import os
+import platform
+import random
+import resource
+import shutil
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from . import config
+
+
+SCENARIOS = ("scan", "jobs", "rerun", "logs", "gateway")
+
+# Written into every synthetic workspace; scenarios wipe .dora and reports, so they refuse to run without it
+BENCH_MARKER = ".dora-bench"
+
+# Follower poll interval; bounds the resolution of the measured line latency
+FOLLOW_INTERVAL = 0.01
+
+# Fixed identity and dates, so synthetic commits (and the report cache keys derived from them) are reproducible
+GIT_ENV = {
+    "GIT_AUTHOR_NAME": "DORA bench", "GIT_AUTHOR_EMAIL": "bench@example.invalid",
+    "GIT_COMMITTER_NAME": "DORA bench", "GIT_COMMITTER_EMAIL": "bench@example.invalid",
+    "GIT_AUTHOR_DATE": "2024-01-01T00:00:00+00:00", "GIT_COMMITTER_DATE": "2024-01-01T00:00:00+00:00",
+    "GIT_CONFIG_GLOBAL": os.devnull, "GIT_CONFIG_NOSYSTEM": "1",
+}
+
+STUB_CLAUDE = '''#!{python}
+"""Deterministic stand-in for `claude -p "/<skill> <target> ..."`, written by `python -m ra bench`."""
+import hashlib
+import os
+import sys
+import time
+
+prompt = sys.argv[sys.argv.index("-p") + 1] if "-p" in sys.argv else ""
+words = prompt.split()
+skill = words[0].lstrip("/") if words else "report"
+# Repository commands name the repo path; use case commands run inside the use case folder
+target = words[1] if len(words) > 1 and os.path.isdir(words[1]) else "."
+lines = int(os.environ.get("DORA_BENCH_LINES", "100"))
+line_bytes = int(os.environ.get("DORA_BENCH_LINE_BYTES", "120"))
+rate = float(os.environ.get("DORA_BENCH_RATE", "0"))
+
+print(f"BENCH start {{time.time():.6f}}", flush=True)
+filler = hashlib.sha256(f"{{skill}} {{target}}".encode()).hexdigest() * (line_bytes // 64 + 1)
+started = time.monotonic()
+for i in range(lines):
+    if rate:
+        # Paced against the start time, so write latency does not slow the rate down
+        delay = started + i / rate - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+    print(f"BENCH line {{time.time():.6f}} {{i}} {{filler[:line_bytes]}}", flush=True)
+with open(os.path.join(target, skill + ".md"), "w") as f:
+    f.write(f"# {{skill}}\\n\\nSynthetic report for {{os.path.basename(os.path.abspath(target))}}.\\n")
+print(f"BENCH end {{time.time():.6f}}", flush=True)
+'''
+
+
+# --- Synthetic workspace ---
+def _write(path, text):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(text)
+
+
+def _source_file(rng, index):
+    functions = [f"def f_{index}_{i}(x):\n    return x * {rng.randrange(1, 1000)} + {rng.random():.6f}\n"
+                 for i in range(rng.randrange(5, 60))]
+    return f'"""Synthetic module {index}."""\n\n' + "\n\n".join(functions)
+
+
+def _write_site(repo_path, rng, pages):
+    site = os.path.join(repo_path, "_ra", "site")
+    nav = "".join(f'<li><a href="page-{i}/">Page {i}</a></li>' for i in range(pages))
+    _write(os.path.join(site, "index.html"), f"<!doctype html><title>Docs</title><ul>{nav}</ul>" + "<p>lorem</p>" * 500)
+    for i in range(pages):
+        body = "".join(f"<p>Paragraph {j}: {rng.random():.12f}</p>" for j in range(rng.randrange(50, 400)))
+        _write(os.path.join(site, f"page-{i}", "index.html"), f"<!doctype html><title>Page {i}</title>{body}")
+    _write(os.path.join(site, "assets", "app.css"), ".c{color:#123}\n" * 2000)
+    _write(os.path.join(site, "assets", "app.js"), "function f(){return 1}\n" * 3000)
+
+
+def generate_workspace(base, repos, files, use_cases, commands, site_pages, seed):
+    """Create ``<base>/workspace``, ``<base>/commands.md`` and the stub ``<base>/bin/claude``."""
+    rng = random.Random(seed)
+    workspace = os.path.join(base, "workspace")
+    git_env = dict(os.environ, **GIT_ENV)
+    for r in range(repos):
+        path = os.path.join(workspace, f"repo-{r:03d}")
+        for f in range(files):
+            package = os.path.join(*(f"pkg{rng.randrange(8)}" for _ in range(rng.randrange(1, 4))))
+            _write(os.path.join(path, package, f"module_{f}.py"), _source_file(rng, f))
+        for args in (["init", "-q", "-b", "main"], ["add", "-A"], ["commit", "-q", "-m", "Synthetic tree"]):
+            subprocess.run(["git", *args], cwd=path, env=git_env, check=True)
+        _write_site(path, rng, site_pages)
+    for u in range(use_cases):
+        _write(os.path.join(workspace, f"usecase-{u:02d}", "usecase.md"),
+               f"Synthetic use case {u}: " + " ".join(f"feature-{rng.randrange(1000)}" for _ in range(40)) + "\n")
+
+    lines = [f'{i}. Bench {i},claude -p "/ra-bench-{i} $REPOSITORY" --dangerously-skip-permissions,'
+             f'ra-bench-{i}.md,timeout=600,class=llm' for i in range(1, commands + 1)]
+    lines.append(f'{commands + 1}. Use Case Bench,claude -p "/uc-bench $USE_CASE" --dangerously-skip-permissions,'
+                 f'uc-bench.md,timeout=600,class=llm')
+    _write(os.path.join(base, "commands.md"), "\n".join(lines) + "\n")
+    _write(os.path.join(workspace, BENCH_MARKER), f"Synthetic workspace of `python -m ra bench` (seed {seed})\n")
+
+    stub = os.path.join(base, "bin", "claude")
+    _write(stub, STUB_CLAUDE.format(python=sys.executable))
+    os.chmod(stub, 0o755)
+    return workspace
+
+
+# --- Measurement helpers ---
+def _ms(values):
+    """p50/p95/max/mean of durations in seconds, in milliseconds."""
+    if not values:
+        return None
+    values = sorted(values)
+    return {
+        "p50": round(values[len(values) // 2] * 1000, 2),
+        "p95": round(values[min(len(values) - 1, int(len(values) * 0.95))] * 1000, 2),
+        "max": round(values[-1] * 1000, 2),
+        "mean": round(statistics.fmean(values) * 1000, 2),
+    }
+
+
+def _timed(fn, *args):
+    started = time.perf_counter()
+    result = fn(*args)
+    return time.perf_counter() - started, result
+
+
+def _stub_marks(job):
+    # (stub start, stub end) wall-clock timestamps printed by the stub claude
+    marks = {}
+    with open(job.log.path, "r", encoding="utf-8", errors="replace") as f:
+        for line in f:
+            if line.startswith(("BENCH start ", "BENCH end ")):
+                kind, ts = line.split()[1:3]
+                marks[kind] = float(ts)
+    return marks.get("start"), marks.get("end")
+
+
+class _LineFollower(threading.Thread):
+    """Reads job output the way the UI does (LogStream.since) and measures emit-to-read latency per line."""
+
+    def __init__(self):
+        super().__init__(name="ra-bench-follower", daemon=True)
+        self.latencies = []
+        self._cursors = {}
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+
+    def add(self, job):
+        with self._lock:
+            self._cursors.setdefault(job, 0)
+
+    def stop(self):
+        self._stopped.set()
+        self.join()
+
+    def run(self):
+        while not self._stopped.wait(FOLLOW_INTERVAL):
+            with self._lock:
+                jobs = list(self._cursors)
+            for job in jobs:
+                lines, self._cursors[job], _ = job.log.since(self._cursors[job])
+                now = time.time()
+                self.latencies += [now - float(line.split()[2]) for line in lines if line.startswith("BENCH line ")]
+
+
+# --- Scenarios (run inside the child process) ---
+def _analyses(index, registry):
+    return [(entry, command) for entry in index.entries() for command in registry.commands(entry.kind)]
+
+
+def _reset_reports(index, registry):
+    # Every repetition of the `jobs` scenario starts from a workspace without reports or cached results
+    from . import report_cache
+    for entry, command in _analyses(index, registry):
+        for name in (command.output_file, report_cache.PROVENANCE_FILE):
+            if os.path.exists(os.path.join(entry.path, name)):
+                os.remove(os.path.join(entry.path, name))
+    shutil.rmtree(os.path.join(config.WORKSPACE_DIR, ".dora"), ignore_errors=True)
+    index.invalidate()
+
+
+def _run_analyses(params, index, registry):
+    from . import analysis
+    from . import report_cache
+    from .jobs import JobScheduler
+
+    def on_finish(job):
+        report_cache.on_job_finished(job)
+        index.invalidate(job.target)
+
+    scheduler = JobScheduler(max_workers=params["jobs"], on_finish=on_finish, recover=False)
+    follower = _LineFollower()
+    follower.start()
+    plan_times, jobs, outcomes = [], [], {}
+    started = time.perf_counter()
+    for entry, command in _analyses(index, registry):
+        elapsed, plan = _timed(analysis.plan_analysis, command, entry.path, scheduler)
+        plan_times.append(elapsed)
+        outcomes[plan.outcome] = outcomes.get(plan.outcome, 0) + 1
+        if plan.needs_run:
+            job = analysis.submit(scheduler, plan, entry.name)
+            jobs.append(job)
+            follower.add(job)
+    while any(job.is_active for job in jobs):
+        time.sleep(FOLLOW_INTERVAL)
+    wall = time.perf_counter() - started
+    follower.stop()
+    return wall, plan_times, jobs, outcomes, follower.latencies
+
+
+def scenario_scan(params):
+    from .workspace import WorkspaceIndex
+    index = WorkspaceIndex(min_interval=0)
+    cold, entries = _timed(index.entries)
+    unchanged = [_timed(index.refresh, True)[0] for _ in range(params["iterations"])]
+    invalidated = []
+    for entry in entries[:params["iterations"]]:
+        index.invalidate(entry.name)
+        invalidated.append(_timed(index.refresh)[0])
+    full = []
+    for _ in range(min(params["iterations"], 10)):
+        index.invalidate()
+        full.append(_timed(index.refresh)[0])
+    return {"entries": len(entries), "cold_ms": round(cold * 1000, 2), "unchanged_refresh": _ms(unchanged),
+            "invalidate_one": _ms(invalidated), "invalidate_all": _ms(full)}
+
+
+def scenario_jobs(params):
+    from .commands import CommandRegistry
+    from .jobs import SUCCEEDED
+    from .workspace import WorkspaceIndex
+    index, registry = WorkspaceIndex(min_interval=0), CommandRegistry()
+    _reset_reports(index, registry)
+    wall, plan_times, jobs, _, latencies = _run_analyses(params, index, registry)
+
+    spawn, settle, stub_time = [], [], 0.0
+    for job in jobs:
+        stub_start, stub_end = _stub_marks(job)
+        if stub_start and stub_end:
+            # Scheduler decided to run -> stub started, and stub done -> job settled (hooks included)
+            spawn.append(stub_start - job.started_at)
+            settle.append(job.finished_at - stub_end)
+            stub_time += stub_end - stub_start
+    return {
+        "analyses": len(jobs),
+        "failed": sum(1 for job in jobs if job.status != SUCCEEDED),
+        "wall_s": round(wall, 3),
+        "jobs_per_s": round(len(jobs) / wall, 2) if wall else None,
+        # Share of worker time not spent inside the stub claude
+        "overhead_ratio": round(1 - stub_time / sum(job.finished_at - job.started_at for job in jobs), 3) if jobs else None,
+        "plan": _ms(plan_times),
+        "spawn": _ms(spawn),
+        "settle": _ms(settle),
+        "line_latency": _ms(latencies),
+    }
+
+
+def scenario_rerun(params):
+    from .commands import CommandRegistry
+    from .workspace import WorkspaceIndex
+    index, registry = WorkspaceIndex(min_interval=0), CommandRegistry()
+    # Warm-up: produce whatever reports are missing (e.g. when `jobs` was not selected); not measured
+    _, _, warmup_jobs, _, _ = _run_analyses(params, index, registry)
+    wall, plan_times, jobs, outcomes, _ = _run_analyses(params, index, registry)
+    return {"analyses": len(plan_times), "warmup_runs": len(warmup_jobs), "reran": len(jobs), "outcomes": outcomes,
+            "wall_ms": round(wall * 1000, 2), "plan": _ms(plan_times)}
+
+
+def scenario_logs(params):
+    from .jobs import JobScheduler, SUCCEEDED
+    os.environ.update(DORA_BENCH_LINES=str(params["huge_log_lines"]), DORA_BENCH_RATE="0")
+    target = os.path.join(os.path.dirname(config.WORKSPACE_DIR), "logs-target")
+    os.makedirs(target, exist_ok=True)
+    scheduler = JobScheduler(max_workers=1, recover=False)
+    follower = _LineFollower()
+    follower.start()
+    started = time.perf_counter()
+    job = scheduler.submit("bench-log", 'claude -p "/bench-log ."', cwd=target, target="bench-log", target_path=target)
+    follower.add(job)
+    while job.is_active:
+        time.sleep(FOLLOW_INTERVAL)
+    wall = time.perf_counter() - started
+    follower.stop()
+
+    total = job.log.total_lines
+    page = config.LOG_VIEW_LINES
+    paging = [_timed(job.log.read_page, start, page)[0] for start in (0, total // 2, max(0, total - page))]
+    return {
+        "succeeded": job.status == SUCCEEDED,
+        "lines": total,
+        "bytes": job.log.size,
+        "wall_s": round(wall, 3),
+        "lines_per_s": round(total / wall),
+        "mb_per_s": round(job.log.size / wall / 2 ** 20, 2),
+        "line_latency": _ms(follower.latencies),
+        "history_page": _ms(paging),
+        # Bounded by the LogStream ring buffer, not by the size of the log
+        "scheduler_max_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+    }
+
+
+def _get(port, path, headers=None):
+    connection = http.client.HTTPConnection("127.0.0.1", port, timeout=10)
+    try:
+        connection.request("GET", path, headers=headers or {})
+        response = connection.getresponse()
+        body = response.read()
+        return response.status, response.getheader("ETag"), len(body)
+    finally:
+        connection.close()
+
+
+def scenario_gateway(params):
+    from . import gateway
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+    startup, server = _timed(gateway.start_gateway, "127.0.0.1", port)
+    repos = sorted(d for d in os.listdir(config.WORKSPACE_DIR)
+                   if gateway.has_site(os.path.join(config.WORKSPACE_DIR, d)))
+    paths = [f"/docs/{repo}/{page}" for repo in repos
+             for page in ["", "assets/app.css", "assets/app.js"] + [f"page-{i}/" for i in range(params["site_pages"])]]
+    try:
+        first, _ = _timed(_get, port, paths[0])
+        gzip = {"Accept-Encoding": "gzip"}
+        sequential = [_timed(_get, port, path, gzip)[0] for path in paths]
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            concurrent_wall, results = _timed(lambda: list(pool.map(lambda p: _get(port, p, gzip), paths * 4)))
+        etag = _get(port, paths[0])[1]
+        revalidate = [_timed(_get, port, paths[0], {"If-None-Match": etag})[0] for _ in range(50)]
+        metrics, _ = _timed(_get, port, gateway.METRICS_PATH)
+    finally:
+        server.shutdown()
+        server.server_close()
+    return {
+        "startup_ms": round(startup * 1000, 2),
+        "first_response_ms": round(first * 1000, 2),
+        "requests": len(sequential),
+        "sequential": _ms(sequential),
+        "concurrent_requests_per_s": round(len(results) / concurrent_wall),
+        "errors": sum(1 for status, _, _ in results if status != 200),
+        "revalidate_304": _ms(revalidate),
+        "metrics_ms": round(metrics * 1000, 2),
+    }
+
+
+def run_scenario(name, params):
+    if not os.environ.get("DORA_WORKSPACE") or not os.path.isfile(os.path.join(config.WORKSPACE_DIR, BENCH_MARKER)):
+        raise SystemExit(f"Refusing to run bench scenario {name!r}: {config.WORKSPACE_DIR} is not a workspace "
+                         f"generated by `python -m ra bench` (DORA_WORKSPACE must point at one)")
+    return globals()[f"scenario_{name}"](params)
+
+
+# --- Driver ---
+def _median(runs):
+    """Median over repetitions, leaf by leaf."""
+    first = runs[0]
+    if isinstance(first, dict):
+        return {key: _median([run[key] for run in runs if isinstance(run, dict) and key in run]) for key in first}
+    if isinstance(first, (int, float)) and not isinstance(first, bool):
+        return round(statistics.median(runs), 3)
+    return first
+
+
+def _run_child(name, params, env):
+    process = subprocess.run(
+        [sys.executable, "-m", "ra.bench", name, json.dumps(params)],
+        cwd=config.FRONTEND_DIR, env=env, stdout=subprocess.PIPE, text=True, check=False,
+    )
+    lines = process.stdout.strip().splitlines()
+    if process.returncode != 0 or not lines:
+        return {"error": f"scenario {name} exited with code {process.returncode}"}
+    return json.loads(lines[-1])
+
+
+def _source_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], cwd=config.ROOT_DIR, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_bench(scenarios=None, base=None, repos=10, files=200, use_cases=2, commands=3, site_pages=20,
+              log_lines=200, line_bytes=120, rate=1000.0, huge_log_lines=200000, jobs=4, iterations=50,
+              repeat=3, seed=1):
+    """Build the synthetic workspace under `base` (a temporary directory if None) and run `scenarios`."""
+    scenarios = [s for s in SCENARIOS if s in (scenarios or SCENARIOS)]
+    params = {"repos": repos, "files": files, "use_cases": use_cases, "commands": commands, "site_pages": site_pages,
+              "log_lines": log_lines, "line_bytes": line_bytes, "rate": rate, "huge_log_lines": huge_log_lines,
+              "jobs": jobs, "iterations": iterations, "repeat": repeat, "seed": seed}
+    started_at = time.time()
+    temporary = base is None
+    base = base or tempfile.mkdtemp(prefix="dora-bench-")
+    try:
+        if os.path.exists(os.path.join(base, "workspace")):
+            raise SystemExit(f"{base} already contains a workspace; pass an empty or new --dir")
+        setup, workspace = _timed(generate_workspace, base, repos, files, use_cases, commands, site_pages, seed)
+        env = dict(
+            os.environ,
+            PATH=os.path.join(base, "bin") + os.pathsep + os.environ.get("PATH", ""),
+            PYTHONPATH=os.pathsep.join(filter(None, [config.FRONTEND_DIR, os.environ.get("PYTHONPATH")])),
+            DORA_WORKSPACE=workspace, DORA_COMMANDS_FILE=os.path.join(base, "commands.md"),
+            DORA_MAX_WORKERS=str(jobs), DORA_CLASS_LIMITS="", DORA_CLASS_RPM="",
+            DORA_BENCH_LINES=str(log_lines), DORA_BENCH_LINE_BYTES=str(line_bytes), DORA_BENCH_RATE=str(rate),
+        )
+        results = {}
+        for name in scenarios:
+            logging.info(f"Bench: running {name} x{repeat}")
+            runs = [_run_child(name, params, env) for _ in range(repeat)]
+            failed = next((run for run in runs if "error" in run), None)
+            results[name] = failed or _median(runs)
+        return {
+            "started_at": started_at,
+            "revision": _source_revision(),
+            "environment": {"python": platform.python_version(), "platform": platform.platform(),
+                            "cpus": os.cpu_count()},
+            "params": params,
+            "setup_s": round(setup, 2),
+            "scenarios": results,
+        }
+    finally:
+        if temporary:
+            shutil.rmtree(base, ignore_errors=True)
+
+
+def main(args):
+    summary = run_bench(
+        scenarios=args.scenario, base=args.dir, repos=args.repos, files=args.files, use_cases=args.use_cases,
+        commands=args.commands, site_pages=args.site_pages, log_lines=args.log_lines, line_bytes=args.line_bytes,
+        rate=args.rate, huge_log_lines=args.huge_log_lines, jobs=args.jobs, iterations=args.iterations,
+        repeat=args.repeat, seed=args.seed,
+    )
+    text = json.dumps(summary, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+    if args.history:
+        with open(args.history, "a", encoding="utf-8") as f:
+            f.write(json.dumps(summary) + "\n")
+    return 1 if any("error" in result for result in summary["scenarios"].values()) else 0
+
+
+def add_arguments(parser):
+    parser.add_argument("-s", "--scenario", action="append", choices=SCENARIOS,
+                        help="Scenario to run (repeatable; default: all)")
+    parser.add_argument("--repos", type=int, default=10, help="Synthetic repositories in the workspace")
+    parser.add_argument("--files", type=int, default=200, help="Source files per repository")
+    parser.add_argument("--use-cases", type=int, default=2, help="Synthetic use cases in the workspace")
+    parser.add_argument("--commands", type=int, default=3, help="Repository commands in the synthetic commands.md")
+    parser.add_argument("--site-pages", type=int, default=20, help="Pages of each repository's built docs site")
+    parser.add_argument("--log-lines", type=int, default=200, help="Output lines the stub claude prints per analysis")
+    parser.add_argument("--line-bytes", type=int, default=120, help="Length of each stub output line")
+    parser.add_argument("--rate", type=float, default=1000.0, help="Stub output lines per second (0 = unthrottled)")
+    parser.add_argument("--huge-log-lines", type=int, default=200000, help="Lines of the single job in `logs`")
+    parser.add_argument("-j", "--jobs", type=int, default=4, help="Analysis jobs running at once")
+    parser.add_argument("--iterations", type=int, default=50, help="Iterations of the micro-measurements in `scan`")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per scenario; medians are reported")
+    parser.add_argument("--seed", type=int, default=1, help="Seed of the synthetic workspace")
+    parser.add_argument("--dir", help="Build the workspace here and keep it (default: a temporary directory)")
+    parser.add_argument("-o", "--output", help="Write the JSON result to a file instead of stdout")
+    parser.add_argument("--history", help="Also append the result as one line to this JSONL file")
+
+
+if __name__ == "__main__":
+    # Child process of run_bench(): one scenario against the workspace in DORA_WORKSPACE
+    print(json.dumps(run_scenario(sys.argv[1], json.loads(sys.argv[2]))))
@@ -0,0 +1,89 @@
+"""Partial results of failed jobs, kept so the next attempt can continue them.
+
+When an attempt is interrupted (timeout, transient error, crash) whatever
+part of its report it already wrote is copied to
+``.dora/jobs/<job_id>/checkpoint/``. The retry - automatic or a later manual
+run of the same command on the same commit - gets resume instructions
+pointing at that copy instead of starting the analysis from scratch.
+
+Attempts that failed for any other reason (a non-zero exit, a cancellation)
+leave no checkpoint: their partial report may be wrong and would be fed into
+every later run. Once a run of the same work succeeds, its checkpoints are
+dropped.
+"""
+import os
+import shutil
+
+from . import fsutil
+from . import incremental
+from . import jobstore
+from . import report_cache
+
+
+CHECKPOINT_DIR = "checkpoint"
+
+# Failed jobs searched for a checkpoint to resume from
+SEARCH_LIMIT = 100
+
+# Failure reasons (``failure_reason`` in the job status) whose partial output is worth continuing
+RESUMABLE = ("idle timeout", "wall-clock timeout", "rate limited", "transient error", "runner died")
+
+
+def checkpoint_path(job_id, output_file):
+    """Where the partial `output_file` of a job is kept."""
+    return os.path.join(jobstore.job_dir(job_id), CHECKPOINT_DIR, report_cache.normalize_output(output_file))
+
+
+def save(job):
+    """Copy the partial output of a failed attempt. Returns the checkpointed output file, or None."""
+    if not job.output_file:
+        return None
+    produced = os.path.join(job.target_path, report_cache.normalize_output(job.output_file))
+    if not os.path.exists(produced) or (os.path.isfile(produced) and os.path.getsize(produced) == 0):
+        return None
+    if job.started_at and os.path.getmtime(produced) < job.started_at:
+        return None  # Left over from an earlier run, not written by this attempt
+    root = report_cache.artifact_root(job.output_file)
+    fsutil.atomic_copy(os.path.join(job.target_path, root), os.path.join(jobstore.job_dir(job.id), CHECKPOINT_DIR, root))
+    path = checkpoint_path(job.id, job.output_file)
+    jobstore.update_status(job.id, checkpoint=path)
+    return path
+
+
+def latest(flight_key):
+    """The newest checkpoint left by an interrupted job doing the same work (same target, commit and command)."""
+    if not flight_key:
+        return None
+    for job_id in jobstore.list_job_ids(limit=SEARCH_LIMIT):
+        status = jobstore.read_status(job_id)
+        path = status.get("checkpoint")
+        if (status.get("status") != "failed" or status.get("failure_reason") not in RESUMABLE
+                or not path or not os.path.exists(path)):
+            continue
+        if (jobstore.read_spec(job_id) or {}).get("flight_key") == flight_key:
+            return path
+    return None
+
+
+def discard(flight_key, job_id=None):
+    """Drop the checkpoints of `job_id` and of every job doing the same work: a run of it succeeded."""
+    for other in jobstore.list_job_ids(limit=SEARCH_LIMIT):
+        status = jobstore.read_status(other)
+        if not status.get("checkpoint"):
+            continue
+        if other != job_id and (not flight_key or (jobstore.read_spec(other) or {}).get("flight_key") != flight_key):
+            continue
+        shutil.rmtree(os.path.join(jobstore.job_dir(other), CHECKPOINT_DIR), ignore_errors=True)
+        jobstore.update_status(other, checkpoint=None)
+
+
+def resume_command(command, output_file, path):
+    """Extend the prompt so the model continues the partial report at `path` instead of starting over."""
+    output_file = report_cache.normalize_output(output_file)
+    instructions = (
+        f" RESUME MODE: a previous attempt at this analysis was interrupted before it finished."
+        f" Its partial {output_file} is saved at {os.path.abspath(path)}."
+        f" Continue from that partial result: keep the parts that are complete, finish what is missing,"
+        f" and write the completed {output_file} as usual instead of starting over."
+    )
+    return incremental.extend_prompt(command, instructions, purpose="resume")
@@ -0,0 +1,339 @@
+"""Background clone and update pipeline for workspace repositories.
+
+Clones are blob-filtered (``--filter=blob:none``) by default: commits and
+trees arrive up front, file contents are fetched lazily on checkout. With
+the mirror cache enabled, every remote gets one full bare mirror under
+``workspace/.dora/mirrors``. Workspace checkouts are cloned from that mirror
+and keep it as their promisor remote (``mirror``), so lazily fetched blobs,
+re-clones and updates only download from upstream what the mirror does not
+have yet; ``origin`` still points at the real remote. Without the mirror,
+clones are shallow as well.
+Checkouts evicted to stay under the disk budget (see :mod:`ra.storage`) are
+restored the same way, with their reports put back in place.
+
+All work runs on a small thread pool. Each :class:`CloneTask` exposes its
+progress so any session can display it.
+"""
+import hashlib
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit, urlunsplit
+
+from . import config
+from . import lazy
+from . import telemetry
+from .workspace import EVICTED_FILE, entry_lock
+
+
+git = lazy.module("git")
+
+MIRROR_DIR = os.path.join(config.WORKSPACE_DIR, ".dora", "mirrors")
+# The remote of a workspace checkout that points at its mirror
+MIRROR_REMOTE = "mirror"
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+
+CLONE = "clone"
+UPDATE = "update"
+RESTORE = "restore"
+
+# git.RemoteProgress op codes by attribute name, so GitPython is only imported once a clone runs
+_STAGES = {
+    "COUNTING": "Counting objects",
+    "COMPRESSING": "Compressing objects",
+    "RECEIVING": "Receiving objects",
+    "RESOLVING": "Resolving deltas",
+    "FINDING_SOURCES": "Finding sources",
+    "CHECKING_OUT": "Checking out files",
+}
+
+
+def redact_url(url):
+    """Drop credentials (e.g. an Azure DevOps PAT) from a URL before logging or displaying it."""
+    parts = urlsplit(url)
+    if parts.username or parts.password:
+        parts = parts._replace(netloc=parts.hostname + (f":{parts.port}" if parts.port else ""))
+    return urlunsplit(parts)
+
+
+def repo_name_from_url(url):
+    """Workspace folder name for a repository URL, e.g. `app` for https://host/org/app.git."""
+    return url.rstrip("/").split("/")[-1].replace(".git", "")
+
+
+def mirror_path(url):
+    key = hashlib.sha256(redact_url(url).rstrip("/").encode("utf-8")).hexdigest()[:16]
+    name = os.path.basename(urlsplit(url).path.rstrip("/")).replace(".git", "") or "repo"
+    return os.path.join(MIRROR_DIR, f"{name}-{key}.git")
+
+
+def _proxy_options(proxy_url):
+    if not proxy_url:
+        return []
+    return [f"--config=http.proxy={proxy_url}", f"--config=https.proxy={proxy_url}"]
+
+
+def _is_partial(path):
+    repo = git.Repo(path)
+    try:
+        return repo.config_reader().has_option('remote "origin"', "promisor")
+    finally:
+        repo.close()
+
+
+def _attach_mirror(repo, source):
+    """The `mirror` remote of workspace checkout `repo`, added if needed and made its promisor remote.
+
+    Checkouts cloned before the remote existed fetched missing blobs from origin, i.e. upstream.
+    """
+    if MIRROR_REMOTE not in [remote.name for remote in repo.remotes]:
+        repo.create_remote(MIRROR_REMOTE, f"file://{source}")
+    else:
+        repo.remote(MIRROR_REMOTE).set_url(f"file://{source}")
+    with repo.config_writer() as writer:
+        origin, mirror = 'remote "origin"', f'remote "{MIRROR_REMOTE}"'
+        if writer.has_option(origin, "promisor"):
+            writer.set_value(mirror, "promisor", "true")
+            writer.set_value(mirror, "partialclonefilter", writer.get_value(origin, "partialclonefilter", "blob:none"))
+            writer.remove_option(origin, "promisor")
+            writer.remove_option(origin, "partialclonefilter")
+        if writer.has_option("extensions", "partialclone") and writer.get_value("extensions", "partialclone") == "origin":
+            writer.set_value("extensions", "partialclone", MIRROR_REMOTE)
+    return repo.remote(MIRROR_REMOTE)
+
+
+class CloneTask:
+    """Progress of one background clone or update."""
+
+    def __init__(self, action, url, dest, branch=None):
+        self.id = uuid.uuid4().hex[:12]
+        self.action = action
+        self.url = url
+        self.display_url = redact_url(url) if url else None
+        self.dest = dest
+        self.repo_name = os.path.basename(os.path.normpath(dest))
+        self.branch = branch
+        self.status = QUEUED
+        self.stage = "Queued"
+        self.progress = 0.0
+        self.message = ""
+        self.error = None
+        self.created_at = time.time()
+        self.finished_at = None
+        self._done = threading.Event()
+
+    @property
+    def is_active(self):
+        return self.status in (QUEUED, RUNNING)
+
+    def wait(self, timeout=None):
+        """Block until the task has finished. Returns False on timeout."""
+        return self._done.wait(timeout)
+
+
+class _TaskProgress:
+    # A callable progress handler: GitPython wraps it in a RemoteProgress
+    def __init__(self, task, label):
+        self.task = task
+        self.label = label
+
+    def __call__(self, op_code, cur_count, max_count=None, message=""):
+        progress = git.RemoteProgress
+        stage = next((label for name, label in _STAGES.items()
+                      if op_code & progress.OP_MASK == getattr(progress, name)), "Working")
+        self.task.stage = f"{self.label}: {stage}"
+        if max_count:
+            self.task.progress = min(float(cur_count) / float(max_count), 1.0)
+        if message:
+            self.task.message = message
+
+
+class CloneManager:
+    """Runs clones and updates in the background, at most ``max_workers`` at a time."""
+
+    def __init__(self, max_workers=None, use_mirror=None):
+        self.use_mirror = config.CLONE_USE_MIRROR if use_mirror is None else use_mirror
+        self._executor = ThreadPoolExecutor(max_workers=max_workers or config.CLONE_WORKERS, thread_name_prefix="ra-clone")
+        self._tasks = {}
+        self._lock = threading.Lock()
+        self._mirror_locks = {}
+
+    # --- Public API ---
+    def clone(self, url, dest, branch=None, proxy_url=None):
+        task = CloneTask(CLONE, url, dest, branch=branch)
+        self._start(task, self._clone, task, proxy_url)
+        return task
+
+    def update(self, dest):
+        """Fetch new commits into an existing workspace repository."""
+        task = CloneTask(UPDATE, None, dest)
+        self._start(task, self._update, task)
+        return task
+
+    def restore(self, dest):
+        """Bring back the checkout of a repository evicted by ra.storage, keeping its reports."""
+        task = CloneTask(RESTORE, None, dest)
+        self._start(task, self._restore, task)
+        return task
+
+    def get(self, task_id):
+        with self._lock:
+            return self._tasks.get(task_id)
+
+    def tasks(self):
+        with self._lock:
+            return sorted(self._tasks.values(), key=lambda t: t.created_at, reverse=True)
+
+    def active_task_for(self, dest):
+        dest = os.path.abspath(dest)
+        return next((t for t in self.tasks() if t.is_active and os.path.abspath(t.dest) == dest), None)
+
+    # --- Internals ---
+    def _start(self, task, fn, *args):
+        with self._lock:
+            self._tasks[task.id] = task
+        logging.info(f"Queued {task.action} of {task.display_url or task.dest} into {task.dest}")
+        self._executor.submit(self._run, task, fn, *args)
+
+    def _run(self, task, fn, *args):
+        task.status = RUNNING
+        started_at = time.time()
+        try:
+            # Eviction (ra.storage) waits until the task is done with the folder
+            with entry_lock(task.repo_name):
+                fn(*args)
+            task.status = SUCCEEDED
+            task.stage = "Done"
+            task.progress = 1.0
+        except Exception as e:
+            task.status = FAILED
+            task.error = str(e).replace(task.url, task.display_url) if task.url else str(e)
+            logging.error(f"{task.action} of {task.dest} failed: {task.error}")
+        finally:
+            task.finished_at = time.time()
+            telemetry.record(
+                task.action, task.finished_at - started_at, telemetry.OK if task.status == SUCCEEDED else telemetry.ERROR,
+                target=task.repo_name, queue_wait=round(started_at - task.created_at, 3), mirror=self.use_mirror,
+            )
+            task._done.set()
+
+    def _mirror_lock(self, path):
+        with self._lock:
+            return self._mirror_locks.setdefault(path, threading.Lock())
+
+    def _ensure_mirror(self, task, url, proxy_url):
+        path = mirror_path(url)
+        with self._mirror_lock(path):
+            progress = _TaskProgress(task, "Mirror")
+            if os.path.isdir(path) and _is_partial(path):
+                # Mirrors used to be blob-filtered, so checkouts still went upstream for file contents
+                logging.info(f"Replacing the partial mirror of {redact_url(url)} with a full one")
+                shutil.rmtree(path)
+            if os.path.isdir(path):
+                mirror = git.Repo(path)
+                mirror.remote("origin").set_url(url)
+                mirror.remote("origin").fetch(prune=True, progress=progress)
+            else:
+                os.makedirs(MIRROR_DIR, exist_ok=True)
+                mirror = git.Repo.clone_from(
+                    url, path, mirror=True, multi_options=_proxy_options(proxy_url), progress=progress
+                )
+            # Workspace clones request a blob filter from the mirror too
+            with mirror.config_writer() as writer:
+                writer.set_value("uploadpack", "allowFilter", "true")
+        return path
+
+    def _clone(self, task, proxy_url, dest=None):
+        options = _proxy_options(proxy_url)
+        dest = dest or task.dest
+        if self.use_mirror:
+            source = self._ensure_mirror(task, task.url, proxy_url)
+            repo = git.Repo.clone_from(
+                f"file://{source}", dest, no_checkout=True, filter="blob:none",
+                multi_options=options, progress=_TaskProgress(task, "Clone")
+            )
+            # Later fetches of new commits go through the mirror too (see _update); origin is the real remote
+            repo.remote("origin").set_url(task.url)
+            _attach_mirror(repo, source)
+            task.stage = "Checking out files"
+            repo.git.checkout(task.branch or repo.active_branch.name)
+        else:
+            kwargs = {"filter": "blob:none", "depth": config.CLONE_DEPTH or None}
+            if task.branch:
+                kwargs["branch"] = task.branch
+            git.Repo.clone_from(
+                task.url, dest, multi_options=options,
+                progress=_TaskProgress(task, "Clone"), **{k: v for k, v in kwargs.items() if v}
+            )
+
+    def _restore(self, task):
+        with open(os.path.join(task.dest, EVICTED_FILE), "r", encoding="utf-8") as f:
+            stub = json.load(f)
+        task.url = stub["url"]
+        task.display_url = redact_url(task.url)
+        task.branch = stub.get("branch")
+        root, name = os.path.split(os.path.normpath(task.dest))
+        staging = os.path.join(root, f".restoring-{name}")
+        shutil.rmtree(staging, ignore_errors=True)
+        self._clone(task, None, dest=staging)
+
+        repo = git.Repo(staging)
+        note = ""
+        try:
+            # Back to the commit the kept reports were generated for; "Fetch updates" moves on from there
+            repo.git.reset("--hard", stub["head"])
+        except git.GitCommandError:
+            note = f" (commit {stub['head'][:8]} is no longer available upstream)"
+        head = repo.head.commit.hexsha
+        repo.close()
+        task.stage = "Restoring reports"
+        kept = [os.path.relpath(os.path.join(directory, f), task.dest) for directory, _, files in os.walk(task.dest) for f in files]
+        for relative in kept:
+            if relative != EVICTED_FILE and not os.path.lexists(os.path.join(staging, relative)):
+                os.renames(os.path.join(task.dest, relative), os.path.join(staging, relative))
+        trash = os.path.join(root, f".trash-{uuid.uuid4().hex[:8]}")
+        os.rename(task.dest, trash)
+        os.rename(staging, task.dest)
+        shutil.rmtree(trash, ignore_errors=True)
+        task.message = f"Restored at {head[:8]}{note}"
+
+    def _fetch(self, repo, origin, progress):
+        if repo.git.rev_parse("--is-shallow-repository") == "true":
+            origin.fetch(depth=config.CLONE_DEPTH or 1, progress=progress)
+        else:
+            origin.fetch(prune=True, progress=progress)
+
+    def _update(self, task):
+        repo = git.Repo(task.dest)
+        origin = repo.remote("origin")
+        task.url = next(origin.urls)
+        task.display_url = redact_url(task.url)
+        progress = _TaskProgress(task, "Fetch")
+        if self.use_mirror and os.path.isdir(mirror_path(task.url)):
+            source = self._ensure_mirror(task, task.url, None)
+            # The mirror now has everything new: fetch from it into origin's branches rather than download
+            # the same objects again
+            mirror = _attach_mirror(repo, source)
+            mirror.fetch("+refs/heads/*:refs/remotes/origin/*", prune=True, progress=progress)
+        else:
+            self._fetch(repo, origin, progress)
+
+        if repo.head.is_detached or repo.active_branch.tracking_branch() is None:
+            task.message = "Fetched; HEAD is not tracking a remote branch, working tree left as is."
+            return
+        task.stage = "Fast-forwarding"
+        tracking = repo.active_branch.tracking_branch()
+        if repo.git.rev_parse("--is-shallow-repository") == "true":
+            repo.git.reset("--hard", tracking.name)
+        else:
+            repo.git.merge("--ff-only", tracking.name)
+        task.message = f"Now at {repo.head.commit.hexsha[:8]}"
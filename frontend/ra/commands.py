@@ -0,0 +1,186 @@
+"""Registry of analysis commands declared in ``commands.md``.
+
+Each non-empty line declares one command::
+
+    <name>,<command template>,<output artifact>[,key=value ...]
+
+The target type follows from the placeholder in the template (``$REPOSITORY``
+or ``$USE_CASE``). Optional ``key=value`` fields:
+
+* ``timeout``  - wall-clock limit in seconds
+* ``idle``     - seconds without output before the job is killed (default ``DORA_JOB_IDLE_TIMEOUT``)
+* ``class``    - concurrency class the scheduler limits jobs by (default ``llm``)
+* ``report``   - title shown in the Results view (default: the name without numbering)
+* ``needs``    - commands this one depends on, by name, report title or output
+  artifact, separated by ``;``. An indented line implicitly needs the
+  unindented command above it (e.g. "3.1 Risk Graph" needs "3. Obsolescence Report").
+
+The file is parsed once and re-parsed only when its mtime changes, so the
+scheduler, report cache and Results view all share one compiled view.
+"""
+import logging
+import os
+import re
+import threading
+
+from . import config
+from . import report_cache
+
+
+REPO = "repo"
+USE_CASE = "usecase"
+
+REPO_PLACEHOLDER = "$REPOSITORY"
+USE_CASE_PLACEHOLDER = "$USE_CASE"
+
+DEFAULT_CLASS = "llm"
+
+_NUMBERING_RE = re.compile(r"^\d+(\.\d+)*\.?\s+")
+
+
+class Command:
+    """One analysis command from commands.md."""
+
+    def __init__(self, name, template, output_file=None, timeout=None, concurrency_class=DEFAULT_CLASS, title=None,
+                 needs=None, idle_timeout=None, line_no=None):
+        self.name = name
+        self.template = template
+        self.output_file = report_cache.normalize_output(output_file) if output_file else None
+        self.target = USE_CASE if USE_CASE_PLACEHOLDER in template else REPO
+        self.timeout = timeout
+        self.idle_timeout = idle_timeout
+        self.concurrency_class = concurrency_class
+        self.title = title or _NUMBERING_RE.sub("", name)
+        # References as written in commands.md; CommandRegistry.dependencies() resolves them to names
+        self.needs = needs or []
+        self.line_no = line_no
+
+    @property
+    def is_docs(self):
+        return bool(self.output_file) and report_cache.artifact_root(self.output_file) == "_ra"
+
+    @property
+    def is_markdown_report(self):
+        return bool(self.output_file) and self.output_file.endswith(".md") and "/" not in self.output_file
+
+    def matches(self, reference):
+        """True if `reference` (a `needs=` entry) names this command or the artifact it produces."""
+        reference = report_cache.normalize_output(reference)
+        return reference in (self.name, self.title) or (
+            bool(self.output_file) and reference in (self.output_file, report_cache.artifact_root(self.output_file)))
+
+    def render(self, target_path):
+        """The shell command for a concrete repository or use case folder."""
+        if self.target == USE_CASE:
+            # Runs inside the use case folder, so the description is read from there
+            return self.template.replace(USE_CASE_PLACEHOLDER, "'$(cat usecase.md)'")
+        relative_repo_path = os.path.relpath(target_path, config.ROOT_DIR) + os.sep
+        return self.template.replace(REPO_PLACEHOLDER, relative_repo_path)
+
+    def cwd(self, target_path):
+        # Repo commands run from the project root (paths are relative to it); use case commands in their folder
+        return target_path if self.target == USE_CASE else config.ROOT_DIR
+
+    def __repr__(self):
+        return f"<Command {self.name!r} [{self.target}] -> {self.output_file}>"
+
+
+def parse_line(line, line_no=None, parent=None):
+    """Parse one commands.md line. Returns a Command, or None for blank/unparseable lines.
+
+    `parent` is the name of the last unindented command, which an indented line depends on.
+    """
+    if not line.strip():
+        return None
+    parts = [p.strip() for p in line.strip().split(",")]
+    if len(parts) < 2 or not parts[0] or not parts[1]:
+        logging.warning(f"Ignoring malformed line {line_no} in commands.md: {line.strip()}")
+        return None
+    name, template = parts[0], parts[1]
+    output_file = parts[2] if len(parts) > 2 and parts[2] and "=" not in parts[2] else None
+    options = {}
+    for field in parts[3 if output_file else 2:]:
+        key, sep, value = field.partition("=")
+        if sep:
+            options[key.strip()] = value.strip()
+        elif field:
+            logging.warning(f"Ignoring unknown field {field!r} on line {line_no} of commands.md")
+    timeout, idle = options.get("timeout"), options.get("idle")
+    needs = [n.strip() for n in options.get("needs", "").split(";") if n.strip()]
+    if parent and line[:1].isspace() and parent not in needs:
+        needs.insert(0, parent)
+    return Command(
+        name, template, output_file,
+        timeout=int(timeout) if timeout and timeout.isdigit() else None,
+        idle_timeout=int(idle) if idle and idle.isdigit() else None,
+        concurrency_class=options.get("class", DEFAULT_CLASS),
+        title=options.get("report"),
+        needs=needs,
+        line_no=line_no,
+    )
+
+
+class CommandRegistry:
+    """Parsed view of commands.md, reloaded when the file changes."""
+
+    def __init__(self, path=None):
+        self.path = path or config.COMMANDS_FILE
+        self._commands = []
+        self._mtime = None
+        self.error = None
+        self._lock = threading.Lock()
+
+    def _ensure_loaded(self):
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except OSError as e:
+            with self._lock:
+                self._commands, self._mtime, self.error = [], None, f"{self.path} not found ({e.strerror})"
+            return
+        with self._lock:
+            if mtime == self._mtime:
+                return
+            commands = []
+            parent = None
+            with open(self.path, "r", encoding="utf-8") as f:
+                for i, line in enumerate(f, start=1):
+                    command = parse_line(line, i, parent=parent)
+                    if command is None:
+                        continue
+                    commands.append(command)
+                    if not line[:1].isspace():
+                        parent = command.name
+            self._commands, self._mtime, self.error = commands, mtime, None
+            logging.info(f"Loaded {len(commands)} command(s) from {self.path}")
+
+    def commands(self, target=None):
+        self._ensure_loaded()
+        return [c for c in self._commands if target is None or c.target == target]
+
+    def get(self, name):
+        return next((c for c in self.commands() if c.name == name), None)
+
+    def by_output(self, output_file, target=REPO):
+        output_file = report_cache.normalize_output(output_file)
+        return next((c for c in self.commands(target) if c.output_file == output_file), None)
+
+    def dependencies(self, commands=None):
+        """Map each command name to the names of the commands it needs.
+
+        References that match no command are logged and ignored.
+        """
+        known = self.commands()
+        graph = {}
+        for command in commands if commands is not None else known:
+            graph[command.name] = []
+            for reference in command.needs:
+                match = next((c for c in known if c.matches(reference) and c.name != command.name), None)
+                if match is None:
+                    logging.warning(f"{command.name!r} needs unknown command or artifact {reference!r}; ignoring it")
+                elif match.name not in graph[command.name]:
+                    graph[command.name].append(match.name)
+        return graph
+
+    def reports(self, target=REPO):
+        """Commands whose output is a markdown report viewable in the Results tab, in declaration order."""
+        return [c for c in self.commands(target) if c.is_markdown_report]
@@ -0,0 +1,112 @@
+"""Paths and tunables shared by the orchestration modules.
+
+Every setting can be overridden through a ``DORA_*`` environment variable.
+"""
+import os
+
+
+FRONTEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ROOT_DIR = os.path.dirname(FRONTEND_DIR)
+
+WORKSPACE_DIR = os.path.abspath(os.environ.get("DORA_WORKSPACE", os.path.join(ROOT_DIR, "workspace")))
+COMMANDS_FILE = os.environ.get("DORA_COMMANDS_FILE", os.path.join(FRONTEND_DIR, "commands.md"))
+
+# Number of analysis jobs (i.e. `claude` processes) allowed to run at once, server-wide.
+MAX_WORKERS = int(os.environ.get("DORA_MAX_WORKERS", "4"))
+
+# Above this many changed files an incremental (delta) analysis falls back to a full run.
+DELTA_MAX_FILES = int(os.environ.get("DORA_DELTA_MAX_FILES", "200"))
+
+# Static docs gateway serving every repository's `_ra/site` under /docs/<repo>/.
+DOCS_HOST = os.environ.get("DORA_DOCS_HOST", "127.0.0.1")
+DOCS_PORT = int(os.environ.get("DORA_DOCS_PORT", "8005"))
+DOCS_BASE_URL = os.environ.get("DORA_DOCS_URL", f"http://localhost:{DOCS_PORT}").rstrip("/")
+
+# Clone pipeline: background workers, bare-mirror cache and shallow depth for unmirrored clones.
+CLONE_WORKERS = int(os.environ.get("DORA_CLONE_WORKERS", "2"))
+CLONE_USE_MIRROR = os.environ.get("DORA_CLONE_MIRROR", "1") != "0"
+CLONE_DEPTH = int(os.environ.get("DORA_CLONE_DEPTH", "1"))
+
+# Job output kept in memory per job, and the number of recent lines shown live in the UI.
+LOG_BUFFER_LINES = int(os.environ.get("DORA_LOG_BUFFER_LINES", "2000"))
+LOG_VIEW_LINES = int(os.environ.get("DORA_LOG_VIEW_LINES", "200"))
+
+# Live job views wake up on output and status events; this is only the fallback re-check interval in seconds.
+VIEW_REFRESH_TIMEOUT = float(os.environ.get("DORA_VIEW_REFRESH_TIMEOUT", "5"))
+
+# Minimum seconds between workspace index refreshes (explicit invalidations bypass it).
+INDEX_MIN_INTERVAL = float(os.environ.get("DORA_INDEX_MIN_INTERVAL", "2"))
+
+
+def _class_map(variable, cast=int):
+    # "llm=4,docs=1" -> {"llm": 4, "docs": 1}
+    result = {}
+    for item in os.environ.get(variable, "").split(","):
+        name, _, value = item.partition("=")
+        if name.strip() and value.strip():
+            result[name.strip()] = cast(value.strip())
+    return result
+
+
+# Per concurrency class limits (`class=` in commands.md), e.g. "llm=4,docs=1". Unlisted classes use MAX_WORKERS.
+CLASS_LIMITS = _class_map("DORA_CLASS_LIMITS")
+
+# LLM governor: job starts per minute per class (0 = unlimited), e.g. "llm=30",
+# and the back-off applied when a job's output shows a rate-limit error (doubling up to the maximum).
+CLASS_RPM = _class_map("DORA_CLASS_RPM", float)
+RATE_LIMIT_BACKOFF = float(os.environ.get("DORA_RATE_LIMIT_BACKOFF", "30"))
+RATE_LIMIT_BACKOFF_MAX = float(os.environ.get("DORA_RATE_LIMIT_BACKOFF_MAX", "600"))
+RATE_LIMIT_PATTERNS = os.environ.get(
+    "DORA_RATE_LIMIT_PATTERNS",
+    r"rate_limit_error|overloaded_error|API Error: (429|529)|429 Too Many Requests|usage limit reached",
+)
+
+# Job robustness: seconds without output before a job is killed (0 = never; commands.md `idle=` overrides),
+# grace period between SIGTERM and SIGKILL, automatic retries of transient failures and their base back-off.
+JOB_IDLE_TIMEOUT = int(os.environ.get("DORA_JOB_IDLE_TIMEOUT", "900"))
+KILL_GRACE = float(os.environ.get("DORA_KILL_GRACE", "10"))
+JOB_RETRIES = int(os.environ.get("DORA_JOB_RETRIES", "2"))
+RETRY_BACKOFF = float(os.environ.get("DORA_RETRY_BACKOFF", "30"))
+TRANSIENT_PATTERNS = os.environ.get(
+    "DORA_TRANSIENT_PATTERNS",
+    r"API Error: 5\d\d|ECONNRESET|ETIMEDOUT|ECONNREFUSED|socket hang up|Connection error|Request timed out",
+)
+
+# Performance telemetry (workspace/.dora/telemetry.jsonl) is rotated to a single `.1` file above this size.
+TELEMETRY_MAX_BYTES = int(float(os.environ.get("DORA_TELEMETRY_MAX_MB", "50")) * 2 ** 20)
+
+# Report rendering: characters of markdown per page of the Results views, and the mermaid CLI used to
+# pre-render diagrams to SVG (e.g. "npx -y @mermaid-js/mermaid-cli"; empty or not installed = render in the browser).
+REPORT_PAGE_CHARS = int(os.environ.get("DORA_REPORT_PAGE_CHARS", "20000"))
+MERMAID_CLI = os.environ.get("DORA_MERMAID_CLI", "mmdc")
+MERMAID_TIMEOUT = int(os.environ.get("DORA_MERMAID_TIMEOUT", "120"))
+
+# Workspace disk budget (0 = unlimited). Over budget, built sites and then checkouts of repositories unused for
+# at least EVICT_MIN_IDLE seconds are evicted, least recently used first, checking every EVICT_INTERVAL seconds.
+WORKSPACE_BUDGET_BYTES = int(float(os.environ.get("DORA_WORKSPACE_BUDGET_GB", "0")) * 2 ** 30)
+EVICT_MIN_IDLE = float(os.environ.get("DORA_EVICT_MIN_IDLE", "3600"))
+EVICT_INTERVAL = float(os.environ.get("DORA_EVICT_INTERVAL", "600"))
+
+# Context pack (ra/context.py): a local summary of each repository commit that analysis prompts are pointed at,
+# capped at CONTEXT_MAX_CHARS characters; at most CONTEXT_MAX_FILES source files are parsed for its import graph.
+CONTEXT_PACK = os.environ.get("DORA_CONTEXT_PACK", "1") != "0"
+CONTEXT_MAX_CHARS = int(os.environ.get("DORA_CONTEXT_MAX_CHARS", "24000"))
+CONTEXT_MAX_FILES = int(os.environ.get("DORA_CONTEXT_MAX_FILES", "20000"))
+
+# Static dependency graph (ra/depgraph.py): diagrams are folded to at most DEPGRAPH_MAX_NODES nodes and
+# DEPGRAPH_MAX_EDGES edges; views rebuild it at most every DEPGRAPH_MIN_INTERVAL seconds.
+DEPGRAPH_MAX_NODES = int(os.environ.get("DORA_DEPGRAPH_MAX_NODES", "40"))
+DEPGRAPH_MAX_EDGES = int(os.environ.get("DORA_DEPGRAPH_MAX_EDGES", "80"))
+DEPGRAPH_MAX_FILES = int(os.environ.get("DORA_DEPGRAPH_MAX_FILES", "20000"))
+DEPGRAPH_MIN_INTERVAL = float(os.environ.get("DORA_DEPGRAPH_MIN_INTERVAL", "10"))
+
+# Prewarming (ra/prewarm.py, off by default): every PREWARM_INTERVAL seconds the remote branch of each repository
+# with reports is compared to its HEAD with `git ls-remote`; inside the PREWARM_WINDOWS (local time, e.g.
+# "22:00-06:00,12:00-13:00"; empty = any time) up to PREWARM_MAX_REPOS changed repositories per check are updated
+# and their reports refreshed at batch priority, most viewed first (views decay with a PREWARM_VIEW_HALF_LIFE in days).
+PREWARM = os.environ.get("DORA_PREWARM", "0") != "0"
+PREWARM_INTERVAL = float(os.environ.get("DORA_PREWARM_INTERVAL", "1800"))
+PREWARM_WINDOWS = os.environ.get("DORA_PREWARM_WINDOWS", "22:00-06:00")
+PREWARM_MAX_REPOS = int(os.environ.get("DORA_PREWARM_MAX_REPOS", "5"))
+PREWARM_VIEW_HALF_LIFE = float(os.environ.get("DORA_PREWARM_VIEW_HALF_LIFE", "7")) * 86400
+PREWARM_LS_REMOTE_TIMEOUT = float(os.environ.get("DORA_PREWARM_LS_REMOTE_TIMEOUT", "30"))
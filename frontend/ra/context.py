@@ -0,0 +1,274 @@
+"""Precomputed repository context pack, handed to every analysis command.
+
+Without it, each ``claude -p "/ra-..."`` run rediscovers the repository: it
+lists the tree, reads the manifests and samples files to find the entry points
+and the structure. The pack does that once per commit, locally and without the
+model:
+
+* the file tree folded into directories, with file counts, sizes and languages;
+* dependency manifests with the versions their lockfiles pin (:mod:`ra.manifests`);
+* entry points (main modules, declared scripts, Dockerfile commands);
+* the import graph between directories and the most imported modules (:mod:`ra.depgraph`).
+
+Packs are markdown files in ``workspace/.dora/context/``, one per repository
+and commit, capped at ``config.CONTEXT_MAX_CHARS``. :func:`extend_command`
+points the command's prompt at the pack when the analysis is planned; the job's
+runner (:mod:`ra.runner`) builds it before the command starts, so planning
+stays instant.
+"""
+import json
+import logging
+import os
+import posixpath
+import re
+import time
+import tomllib
+from collections import Counter, defaultdict
+
+from . import config
+from . import depgraph
+from . import fsutil
+from . import incremental
+from . import lazy
+from . import manifests
+from . import report_cache
+from . import telemetry
+
+
+git = lazy.module("git")
+
+CONTEXT_DIR = os.path.join(config.WORKSPACE_DIR, ".dora", "context")
+# Part of the pack's file name: bump when the format changes so old packs are not reused
+CONTEXT_VERSION = 1
+
+LANGUAGES = {
+    ".py": "Python", ".ipynb": "Jupyter", ".js": "JavaScript", ".jsx": "JavaScript", ".mjs": "JavaScript",
+    ".cjs": "JavaScript", ".ts": "TypeScript", ".tsx": "TypeScript", ".java": "Java", ".kt": "Kotlin",
+    ".kts": "Kotlin", ".scala": "Scala", ".groovy": "Groovy", ".go": "Go", ".rs": "Rust", ".c": "C", ".h": "C/C++",
+    ".cc": "C++", ".cpp": "C++", ".hpp": "C++", ".cs": "C#", ".fs": "F#", ".vb": "Visual Basic", ".rb": "Ruby",
+    ".php": "PHP", ".swift": "Swift", ".m": "Objective-C", ".dart": "Dart", ".lua": "Lua", ".r": "R", ".R": "R",
+    ".pl": "Perl", ".sh": "Shell", ".bash": "Shell", ".ps1": "PowerShell", ".bat": "Batch", ".sql": "SQL",
+    ".html": "HTML", ".css": "CSS", ".scss": "SCSS", ".vue": "Vue", ".svelte": "Svelte", ".cob": "COBOL",
+    ".cbl": "COBOL", ".pas": "Pascal", ".f90": "Fortran", ".tf": "Terraform", ".proto": "Protobuf",
+    ".yaml": "YAML", ".yml": "YAML", ".json": "JSON", ".xml": "XML", ".toml": "TOML", ".md": "Markdown",
+}
+
+ENTRY_POINT_NAMES = {
+    "__main__.py", "main.py", "app.py", "manage.py", "wsgi.py", "asgi.py", "server.py", "cli.py",
+    "main.go", "Program.cs", "Startup.cs", "Main.java", "index.js", "index.ts", "server.js", "server.ts",
+    "app.js", "app.ts", "main.rs", "main.c", "main.cpp", "Dockerfile", "Procfile",
+}
+
+MAX_TREE_LINES = 120
+MAX_LARGEST_FILES = 15
+MAX_ENTRY_POINTS = 40
+MAX_EDGES = 60
+MAX_HUBS = 20
+MAX_EXTERNAL = 40
+
+_DOCKER_COMMAND_RE = re.compile(r"^\s*(ENTRYPOINT|CMD)\s+(.+)$", re.MULTILINE)
+
+def pack_path(target_path, rev):
+    name = os.path.basename(os.path.normpath(target_path))
+    return os.path.join(CONTEXT_DIR, f"{name}-{rev[:12]}-v{CONTEXT_VERSION}.md")
+
+
+def _size(number):
+    for unit in ("B", "KB", "MB", "GB"):
+        if number < 1024 or unit == "GB":
+            return f"{number:.0f} {unit}" if unit == "B" else f"{number:.1f} {unit}"
+        number /= 1024
+
+
+# --- Sections ---
+def _tree_section(files):
+    # Deepest folding that still fits MAX_TREE_LINES
+    for depth in (4, 3, 2, 1):
+        groups = defaultdict(lambda: [0, 0, Counter()])
+        for path, size in files.items():
+            directory = "/".join(path.split("/")[:-1][:depth]) or "."
+            group = groups[directory]
+            group[0] += 1
+            group[1] += size
+            language = LANGUAGES.get(os.path.splitext(path)[1])
+            if language:
+                group[2][language] += 1
+        if len(groups) <= MAX_TREE_LINES or depth == 1:
+            break
+    lines = ["## File tree", "", f"Directories folded to depth {depth}: files, size, main languages.", "", "```"]
+    for directory in sorted(groups)[:MAX_TREE_LINES]:
+        count, size, languages = groups[directory]
+        top = ", ".join(name for name, _ in languages.most_common(3))
+        label = directory + ("/" if directory != "." else "")
+        lines.append(f"{label:<50} {count:>6} files {_size(size):>10}  {top}")
+    if len(groups) > MAX_TREE_LINES:
+        lines.append(f"... {len(groups) - MAX_TREE_LINES} more directories")
+    lines.append("```")
+    largest = sorted(files.items(), key=lambda item: item[1], reverse=True)[:MAX_LARGEST_FILES]
+    lines += ["", "Largest files: " + ", ".join(f"`{path}` ({_size(size)})" for path, size in largest)]
+    return lines
+
+
+def _languages_section(files):
+    counts, sizes = Counter(), Counter()
+    for path, size in files.items():
+        language = LANGUAGES.get(os.path.splitext(path)[1])
+        if language:
+            counts[language] += 1
+            sizes[language] += size
+    lines = ["## Languages", ""]
+    lines += [f"- {language}: {counts[language]} files, {_size(sizes[language])}" for language, _ in sizes.most_common(12)]
+    return lines
+
+
+def _manifests_section(target_path, paths):
+    found = manifests.scan(target_path, paths)
+    lines = ["## Dependency manifests", ""]
+    if not found:
+        return lines + ["No dependency manifests found."]
+    for manifest in found:
+        lock = f", locked by `{manifest.lockfile}`" if manifest.lockfile else ", no lockfile"
+        lines.append(f"### `{manifest.path}` ({manifest.ecosystem}{lock})")
+        if manifest.error:
+            lines.append(f"Could not be parsed: {manifest.error}")
+        for dependency in manifest.dependencies:
+            version = dependency.spec or "*"
+            if dependency.locked and dependency.locked != dependency.spec:
+                version += f" (locked {dependency.locked})"
+            lines.append(f"- {dependency.name} {version}" + (" [dev]" if dependency.dev else ""))
+        lines.append("")
+    return lines
+
+
+def _entry_points_section(target_path, paths):
+    entries = [p for p in paths if posixpath.basename(p) in ENTRY_POINT_NAMES or p.endswith("Application.java")]
+    declared = []
+    for path in paths:
+        name = posixpath.basename(path)
+        try:
+            if name == "package.json":
+                with open(os.path.join(target_path, path), "r", encoding="utf-8") as f:
+                    data = json.load(f)
+                if isinstance(data.get("main"), str):
+                    declared.append(f"`{path}` main: {data['main']}")
+                bins = data.get("bin")
+                for command, target in (bins.items() if isinstance(bins, dict) else [(data.get("name"), bins)] if bins else []):
+                    declared.append(f"`{path}` bin {command}: {target}")
+                for script in ("start", "serve", "dev"):
+                    if script in (data.get("scripts") or {}):
+                        declared.append(f"`{path}` script {script}: `{data['scripts'][script]}`")
+            elif name == "pyproject.toml":
+                with open(os.path.join(target_path, path), "rb") as f:
+                    data = tomllib.load(f)
+                scripts = dict((data.get("project") or {}).get("scripts") or {})
+                scripts.update(((data.get("tool") or {}).get("poetry") or {}).get("scripts") or {})
+                declared += [f"`{path}` script {command}: {target}" for command, target in scripts.items()]
+            elif name == "Dockerfile" or name.endswith(".Dockerfile"):
+                with open(os.path.join(target_path, path), "r", encoding="utf-8", errors="replace") as f:
+                    declared += [f"`{path}` {m.group(1)} {m.group(2).strip()}" for m in _DOCKER_COMMAND_RE.finditer(f.read())]
+        except (OSError, ValueError, AttributeError) as e:
+            logging.warning(f"Cannot read entry points from {path}: {e}")
+    lines = ["## Entry points", ""]
+    lines += [f"- `{path}`" for path in entries[:MAX_ENTRY_POINTS]]
+    lines += [f"- {item}" for item in declared[:MAX_ENTRY_POINTS]]
+    if not entries and not declared:
+        lines.append("No conventional entry points found.")
+    return lines
+
+
+def _imports_section(target_path, paths):
+    graph = depgraph.import_graph(target_path, paths, max_files=config.CONTEXT_MAX_FILES)
+    edges = Counter()
+    for path, targets in graph.edges.items():
+        for imported in targets:
+            source_dir, target_dir = posixpath.dirname(path) or ".", posixpath.dirname(imported) or "."
+            if source_dir != target_dir:
+                edges[(source_dir, target_dir)] += 1
+
+    lines = ["## Import graph", ""]
+    if not graph.edges:
+        return lines + ["No Python, JavaScript or TypeScript sources."]
+    lines.append(f"From {len(graph.edges)} Python/JavaScript/TypeScript files. Directory -> directory (number of imports):")
+    lines.append("")
+    lines += [f"- {a} -> {b} ({n})" for (a, b), n in edges.most_common(MAX_EDGES)]
+    if len(edges) > MAX_EDGES:
+        lines.append(f"- ... {len(edges) - MAX_EDGES} more directory dependencies")
+    lines += ["", "Most imported modules: " + ", ".join(f"`{p}` ({n})" for p, n in graph.in_degree().most_common(MAX_HUBS))]
+    lines += ["", "External packages imported (by number of files): " +
+              ", ".join(f"{p} ({n})" for p, n in graph.external_packages().most_common(MAX_EXTERNAL))]
+    return lines
+
+
+# --- Building ---
+def render(target_path, rev):
+    """The pack's markdown for the repository as checked out."""
+    paths = depgraph.list_files(target_path)
+    files = {}
+    for path in paths:
+        try:
+            files[path] = os.lstat(os.path.join(target_path, path)).st_size
+        except OSError:
+            continue  # Deleted in the working tree, or a submodule that is not checked out
+    paths = [p for p in paths if p in files]
+    name = os.path.basename(os.path.normpath(target_path))
+    lines = [
+        f"# Context pack: {name} at {rev[:12]}",
+        "",
+        f"Computed locally from the checkout: {len(files)} tracked files, {_size(sum(files.values()))}.",
+        "",
+    ]
+    for section in (_languages_section(files), _entry_points_section(target_path, paths),
+                    _manifests_section(target_path, paths), _imports_section(target_path, paths), _tree_section(files)):
+        lines += section + [""]
+    text = "\n".join(lines)
+    if len(text) > config.CONTEXT_MAX_CHARS:
+        text = text[:config.CONTEXT_MAX_CHARS].rsplit("\n", 1)[0] + "\n\n(truncated)\n"
+    return text, len(files)
+
+
+def _usable(rev):
+    return rev is not None and not rev.startswith("usecase:")
+
+
+def build(target_path, rev=None):
+    """Path of the context pack for commit `rev` (default: the current one), built if needed. None if unavailable."""
+    rev = rev or report_cache.revision(target_path)
+    if not _usable(rev):
+        return None
+    path = pack_path(target_path, rev)
+    name = os.path.basename(os.path.normpath(target_path))
+    # Concurrent commands of one pipeline, in any process, wait for the first build instead of repeating it
+    with fsutil.locked(os.path.join(CONTEXT_DIR, f"{name}.lock")):
+        if os.path.exists(path):
+            return path
+        started_at = time.monotonic()
+        try:
+            text, file_count = render(target_path, rev)
+        except (OSError, git.GitError) as e:
+            logging.warning(f"Cannot build the context pack for {target_path}: {e}")
+            return None
+        os.makedirs(CONTEXT_DIR, exist_ok=True)
+        fsutil.atomic_write_text(path, text)
+        duration = time.monotonic() - started_at
+        logging.info(f"Built context pack {path} ({len(text)} chars, {file_count} files) in {duration:.1f}s")
+        telemetry.record(telemetry.CONTEXT, duration, target=os.path.basename(os.path.normpath(target_path)),
+                         files=file_count, output_bytes=len(text))
+    return path
+
+
+def extend_command(command, target_path, rev):
+    """Point the prompt of `command` at the context pack for commit `rev` (unchanged if disabled or unavailable).
+
+    Returns (command, pack path or None). Only the path is computed: the pack is built by :func:`build`.
+    """
+    if not config.CONTEXT_PACK or not _usable(rev):
+        return command, None
+    path = pack_path(target_path, rev)
+    instructions = (
+        f" CONTEXT PACK: {os.path.abspath(path)} summarises this repository at its current commit"
+        f" (languages, entry points, dependency manifests with locked versions, import graph, file tree)."
+        f" Read it first and rely on it instead of listing directories or reading manifests;"
+        f" open source files only for the details your analysis needs."
+    )
+    extended = incremental.extend_prompt(command, instructions, purpose="context")
+    return (extended, path) if extended != command else (command, None)
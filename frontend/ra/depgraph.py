@@ -0,0 +1,384 @@
+"""Static dependency graphs of a repository, rendered as Mermaid without the model.
+
+Structure diagrams do not need a minutes-long analysis run: the imports of the
+Python (:mod:`ast`), JavaScript and TypeScript sources (:mod:`ra.imports`) and
+the dependency manifests of every ecosystem (:mod:`ra.manifests`) give them
+in seconds. :func:`build` writes a markdown report with
+
+* a module graph: source files, or directories when there are too many files,
+  folded to the deepest level that keeps ``config.DEPGRAPH_MAX_NODES`` nodes;
+* a package graph: the projects declared by manifests, the projects of the
+  same repository they depend on and their most used external packages;
+* import cycles between the nodes of the module graph, and the most imported modules.
+
+The report is ``workspace/.dora/depgraph/<name>.md`` and is shown like any other
+report. Parsed imports are cached per file (by mtime and size) in
+``<name>.imports.json`` next to it, so a rebuild only re-parses changed files.
+"""
+import json
+import logging
+import os
+import posixpath
+import threading
+import time
+from collections import Counter, defaultdict
+
+from . import config
+from . import fsutil
+from . import imports
+from . import lazy
+from . import manifests
+from . import report_cache
+from . import telemetry
+
+
+git = lazy.module("git")
+
+DEPGRAPH_DIR = os.path.join(config.WORKSPACE_DIR, ".dora", "depgraph")
+# Stored in the parse cache: bump when read_imports() output changes so old caches are discarded
+CACHE_VERSION = 1
+
+ROOT_LABEL = "(root)"
+MAX_HUBS = 15
+MAX_CYCLES = 10
+# External dependencies drawn per project in the package graph
+MAX_PROJECT_DEPENDENCIES = 12
+
+_caches = {}
+_built = {}
+_locks = {}
+_locks_guard = threading.Lock()
+
+
+def _name(target_path):
+    return os.path.basename(os.path.normpath(target_path))
+
+
+def _lock_for(target_path):
+    with _locks_guard:
+        return _locks.setdefault(os.path.realpath(target_path), threading.Lock())
+
+
+def report_path(target_path):
+    return os.path.join(DEPGRAPH_DIR, f"{_name(target_path)}.md")
+
+
+def list_files(target_path):
+    """Tracked files of the repository ("/"-separated, relative), skipping vendored and generated directories."""
+    output = git.Repo(target_path).git.ls_files("-z")
+    return [p for p in output.split("\0") if p and not manifests.SKIP_DIRS.intersection(p.split("/")[:-1])]
+
+
+# --- Import graph ---
+class ImportGraph:
+    """Imports between the Python/JavaScript/TypeScript files of a repository."""
+
+    def __init__(self, edges, external, parsed):
+        self.edges = edges        # {path: {imported repository file}}
+        self.external = external  # {path: {imported external package}}
+        self.parsed = parsed      # Files parsed to build it; the others came from the cache
+
+    @property
+    def sources(self):
+        return list(self.edges)
+
+    def in_degree(self):
+        """Counter of how many files import each file."""
+        return Counter(imported for targets in self.edges.values() for imported in targets)
+
+    def external_packages(self):
+        """Counter of how many files import each external package."""
+        return Counter(package for packages in self.external.values() for package in packages)
+
+
+def _cache_path(target_path):
+    return os.path.join(DEPGRAPH_DIR, f"{_name(target_path)}.imports.json")
+
+
+def _load_cache(target_path):
+    key = os.path.realpath(target_path)
+    if key not in _caches:
+        try:
+            with open(_cache_path(target_path), "r", encoding="utf-8") as f:
+                data = json.load(f)
+            _caches[key] = data["files"] if data.get("version") == CACHE_VERSION else {}
+        except (OSError, ValueError, KeyError):
+            _caches[key] = {}
+    return _caches[key]
+
+
+def import_graph(target_path, paths, max_files=None):
+    """The import graph of the sources among `paths`, re-parsing only files changed since the last call."""
+    sources = [p for p in paths if imports.language(p)][:max_files or config.DEPGRAPH_MAX_FILES]
+    index = imports.ModuleIndex(sources)
+    with _lock_for(target_path):
+        cache = _load_cache(target_path)
+        files, parsed = {}, 0
+        for path in sources:
+            try:
+                stat = os.stat(os.path.join(target_path, path))
+            except OSError:
+                continue  # Deleted in the working tree
+            # Relative imports resolve against the module name, which changes when an __init__.py comes or goes
+            module = index.python_module(path) if imports.language(path) == imports.PYTHON else ""
+            entry = cache.get(path)
+            if entry is None or entry[:3] != [stat.st_mtime_ns, stat.st_size, module]:
+                entry = [stat.st_mtime_ns, stat.st_size, module, imports.read_imports(target_path, path, index)]
+                parsed += 1
+            files[path] = entry
+        if parsed or len(files) != len(cache):
+            _caches[os.path.realpath(target_path)] = files
+            try:
+                os.makedirs(DEPGRAPH_DIR, exist_ok=True)
+                fsutil.atomic_write_text(_cache_path(target_path), json.dumps({"version": CACHE_VERSION, "files": files}))
+            except OSError as e:
+                logging.warning(f"Cannot save the import cache of {target_path}: {e}")
+
+    edges, external = {}, {}
+    for path, entry in files.items():
+        edges[path], external[path] = imports.resolve_imports(path, entry[3], index)
+    return ImportGraph(edges, external, parsed)
+
+
+# --- Folding ---
+def _group(path, depth):
+    if depth is None:
+        return path
+    return "/".join(path.split("/")[:-1][:depth]) or ROOT_LABEL
+
+
+def fold(graph, max_nodes=None):
+    """(depth, Counter {(source, target): imports}) of the module graph at the finest readable level.
+
+    Depth None means one node per file; otherwise files are grouped by their directory cut to `depth`
+    levels. The finest level with at most `max_nodes` connected nodes wins, directories of depth 1 otherwise.
+    """
+    max_nodes = max_nodes or config.DEPGRAPH_MAX_NODES
+    max_depth = max((path.count("/") for path in graph.edges), default=0)
+    for depth in [None] + list(range(max_depth, 0, -1)):
+        edges = Counter()
+        for path, targets in graph.edges.items():
+            source = _group(path, depth)
+            for imported in targets:
+                target = _group(imported, depth)
+                if source != target:
+                    edges[(source, target)] += 1
+        if len({node for edge in edges for node in edge}) <= max_nodes:
+            break
+    return depth, edges
+
+
+def cycles(edges):
+    """Groups of nodes that import each other, directly or transitively, largest first."""
+    successors = defaultdict(set)
+    for source, target in edges:
+        successors[source].add(target)
+    reachable = {}
+    for start in successors:
+        seen, stack = set(), [start]
+        while stack:
+            for node in successors.get(stack.pop(), ()):
+                if node not in seen:
+                    seen.add(node)
+                    stack.append(node)
+        reachable[start] = seen
+    groups, grouped = [], set()
+    for node in sorted(successors):
+        if node in grouped or node not in reachable[node]:
+            continue
+        group = sorted(other for other in reachable[node] if node in reachable.get(other, ()))
+        grouped.update(group)
+        groups.append(group)
+    return sorted(groups, key=len, reverse=True)
+
+
+# --- Mermaid ---
+def _label(text):
+    return '"' + text.replace('"', "#quot;") + '"'
+
+
+def common_prefix(nodes):
+    """The directory (with its trailing "/") all `nodes` (files or directories) are in, "" if there is none."""
+    if not nodes or ROOT_LABEL in nodes:
+        return ""
+    common = posixpath.commonpath([posixpath.dirname(node) for node in nodes])
+    return common + "/" if common else ""
+
+
+def module_diagram(edges, max_edges=None):
+    """Mermaid flowchart of the `max_edges` heaviest edges; labels count imports between folded nodes."""
+    max_edges = max_edges or config.DEPGRAPH_MAX_EDGES
+    ids = {}
+    lines = ["flowchart LR"]
+    prefix = common_prefix({node for edge in edges for node in edge})
+    # Heaviest first, ties by name: the same graph always gives the same diagram, so its SVG is rendered once
+    for (source, target), count in sorted(edges.items(), key=lambda item: (-item[1], item[0]))[:max_edges]:
+        for node in (source, target):
+            if node not in ids:
+                ids[node] = f"m{len(ids)}"
+                lines.append(f"    {ids[node]}[{_label(node[len(prefix):] or node)}]")
+        arrow = f"-->|{count}|" if count > 1 else "-->"
+        lines.append(f"    {ids[source]} {arrow} {ids[target]}")
+    return "\n".join(lines)
+
+
+def _projects(found, graph):
+    # One project per manifest directory; a repository without manifests is one project using what it imports
+    projects = {}
+    for manifest in found:
+        directory = posixpath.dirname(manifest.path)
+        project = projects.setdefault(directory, {"name": None, "dependencies": {}})
+        project["name"] = project["name"] or manifest.name
+        for dependency in manifest.dependencies:
+            if not dependency.dev:
+                project["dependencies"].setdefault(manifests._normalize(manifest.ecosystem, dependency.name),
+                                                   dependency.name)
+    if not projects and graph.edges:
+        projects[""] = {"name": None, "dependencies": {p.lower(): p for p in graph.external_packages()}}
+    return projects
+
+
+def package_diagram(found, graph, max_nodes=None):
+    """Mermaid flowchart of the repository's projects, their dependencies on each other and their main
+    external dependencies (dashed), ranked by how many source files import them."""
+    max_nodes = max_nodes or config.DEPGRAPH_MAX_NODES
+    projects = _projects(found, graph)
+    if not projects:
+        return None
+    names = {}
+    for directory, project in projects.items():
+        if project["name"]:
+            names.setdefault(project["name"].lower(), directory)
+    usage = Counter({package.lower(): count for package, count in graph.external_packages().items()})
+
+    lines = ["flowchart LR"]
+    ids = {}
+    for directory in sorted(projects):
+        ids[directory] = f"p{len(ids)}"
+        label = projects[directory]["name"] or directory or ROOT_LABEL
+        lines.append(f"    {ids[directory]}[{_label(label)}]")
+    external_ids, budget = {}, max(max_nodes - len(projects), 0)
+    for directory in sorted(projects):
+        internal, external = [], []
+        for key, name in projects[directory]["dependencies"].items():
+            target = names.get(key)
+            if target is not None and target != directory:
+                internal.append(target)
+            elif target is None:
+                external.append((name, key))
+        lines += [f"    {ids[directory]} --> {ids[target]}" for target in sorted(set(internal))]
+        # Python distributions are imported by a module name that often matches the distribution name
+        external.sort(key=lambda item: (-usage.get(item[1].replace("-", "_"), usage.get(item[1], 0)), item[1]))
+        shown = 0
+        for name, key in external:
+            if shown == MAX_PROJECT_DEPENDENCIES:
+                break
+            if key not in external_ids:
+                if len(external_ids) >= budget:
+                    break
+                external_ids[key] = f"x{len(external_ids)}"
+                lines.append(f"    {external_ids[key]}({_label(name)})")
+            lines.append(f"    {ids[directory]} -.-> {external_ids[key]}")
+            shown += 1
+        if len(external) > shown:
+            more = f"{ids[directory]}_more"
+            lines.append(f"    {more}({_label(f'{len(external) - shown} more')})")
+            lines.append(f"    {ids[directory]} -.-> {more}")
+    return "\n".join(lines)
+
+
+# --- Report ---
+def render(target_path, rev, paths):
+    """(markdown report, ImportGraph) for the repository as checked out."""
+    graph = import_graph(target_path, paths)
+    found = manifests.scan(target_path, paths)
+    depth, edges = fold(graph)
+
+    lines = [
+        f"# Dependency graph: {_name(target_path)}" + (f" at {rev[:12]}" if rev else ""),
+        "",
+        f"Computed statically from {len(graph.edges)} Python/JavaScript/TypeScript files and "
+        f"{len(found)} dependency manifests, without the model.",
+        "",
+        "## Modules",
+        "",
+    ]
+    if not edges:
+        lines.append("No imports between the repository's Python, JavaScript or TypeScript sources.")
+    else:
+        shown = min(len(edges), config.DEPGRAPH_MAX_EDGES)
+        prefix = common_prefix({node for edge in edges for node in edge})
+        level = "Each node is a source file" if depth is None else \
+            f"Source files are grouped by directory, up to {depth} level{'s' if depth > 1 else ''} deep"
+        lines += [level + (f", relative to `{prefix}`" if prefix else "") + "; edges count imports." +
+                  (f" The {shown} heaviest of {len(edges)} dependencies are shown." if shown < len(edges) else ""),
+                  "", "```mermaid", module_diagram(edges), "```"]
+
+    lines += ["", "## Packages", ""]
+    diagram = package_diagram(found, graph)
+    if diagram is None:
+        lines.append("No dependency manifests and no imported packages found.")
+    else:
+        lines += ["Projects declared by manifests, the projects they depend on and their main runtime dependencies "
+                  "(dashed), most imported first.", "", "```mermaid", diagram, "```"]
+
+    groups = cycles(edges)
+    if groups:
+        lines += ["", "## Cycles", ""]
+        lines += [f"- {' <-> '.join(f'`{node}`' for node in group)}" for group in groups[:MAX_CYCLES]]
+        if len(groups) > MAX_CYCLES:
+            lines.append(f"- ... {len(groups) - MAX_CYCLES} more")
+    hubs = sorted(graph.in_degree().items(), key=lambda item: (-item[1], item[0]))[:MAX_HUBS]
+    if hubs:
+        lines += ["", "## Most imported modules", ""]
+        lines += [f"- `{path}`: imported by {count} files" for path, count in hubs]
+    return "\n".join(lines) + "\n", graph
+
+
+def build(target_path, max_age=0):
+    """Path of the repository's dependency graph report, rebuilt unless it was built within `max_age` seconds.
+
+    While the checkout cannot be read (e.g. it is evicted) the previous report is returned, or None.
+    """
+    path = report_path(target_path)
+    key = os.path.realpath(target_path)
+    with _lock_for(target_path):
+        built_at = _built.get(key)
+        if built_at is not None and time.monotonic() - built_at < max_age and os.path.exists(path):
+            return path
+    started_at = time.monotonic()
+    try:
+        text, graph = render(target_path, report_cache.revision(target_path), list_files(target_path))
+        os.makedirs(DEPGRAPH_DIR, exist_ok=True)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                unchanged = f.read() == text
+        except OSError:
+            unchanged = False
+        # An unchanged report keeps its mtime, so its parsed pages and rendered diagrams stay cached
+        if not unchanged:
+            fsutil.atomic_write_text(path, text)
+    except (OSError, git.GitError, ValueError) as e:
+        logging.warning(f"Cannot build the dependency graph of {target_path}: {e}")
+        return path if os.path.exists(path) else None
+    duration = time.monotonic() - started_at
+    with _lock_for(target_path):
+        _built[key] = time.monotonic()
+    logging.info(f"Built dependency graph {path} ({len(graph.edges)} files, {graph.parsed} parsed) in {duration:.1f}s")
+    telemetry.record(telemetry.DEPGRAPH, duration, target=_name(target_path), files=len(graph.edges),
+                     parsed=graph.parsed)
+    return path
+
+
+# --- Command line ---
+def add_arguments(parser):
+    parser.add_argument("target", help="repository directory")
+
+
+def main(args):
+    path = build(args.target)
+    if path is None:
+        raise SystemExit(f"Cannot build the dependency graph of {args.target}")
+    with open(path, "r", encoding="utf-8") as f:
+        print(f.read(), end="")
+    return 0
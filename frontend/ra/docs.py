@@ -0,0 +1,166 @@
+"""MkDocs toolchain and incremental site builds for generated `_ra/` documentation.
+
+The toolchain is checked once per process and only missing packages are
+installed. Builds are skipped when the content hash of the `_ra/` sources is
+unchanged since the last build, and use ``mkdocs build --dirty`` when only
+some pages changed. The hashes of the last build are kept under
+``workspace/.dora/docs/``, outside the site the gateway serves. Installs and builds are timed in :mod:`ra.telemetry`.
+"""
+import hashlib
+import importlib
+import importlib.util
+import json
+import logging
+import os
+import sys
+import threading
+import time
+
+from . import config
+from . import fsutil
+from . import telemetry
+
+
+# pip requirement -> importable module that proves it is installed
+DOCS_REQUIREMENTS = {
+    "mkdocs>=1.5.0": "mkdocs",
+    "mkdocs-material>=9.0.0": "material",
+    "mkdocs-mermaid2-plugin>=1.0.0": "mermaid2",
+    "pymdown-extensions>=10.0.0": "pymdownx",
+    "mkdocs-awesome-pages-plugin>=2.8.0": "mkdocs_awesome_pages_plugin",
+    "mkdocs-minify-plugin>=0.7.0": "mkdocs_minify_plugin",
+    "mkdocs-git-revision-date-localized-plugin>=1.2.0": "mkdocs_git_revision_date_localized_plugin",
+}
+
+SITE_DIR = "site"
+BUILD_STATE_DIR = os.path.join(config.WORKSPACE_DIR, ".dora", "docs")
+# Where the build state used to be kept, inside the published site
+LEGACY_BUILD_STATE_FILE = ".dora-build.json"
+
+UNCHANGED = "unchanged"
+INCREMENTAL = "incremental"
+FULL = "full"
+
+_toolchain_lock = threading.Lock()
+# One build at a time per docs folder; a concurrent request waits and then finds the site up to date
+_build_locks = {}
+_build_locks_guard = threading.Lock()
+_toolchain_ready = False
+
+
+def ensure_toolchain():
+    """Make sure the MkDocs packages are importable. Runs pip at most once per process.
+
+    Returns None when the toolchain is ready, otherwise the installer's error output.
+    """
+    global _toolchain_ready
+    with _toolchain_lock:
+        if _toolchain_ready:
+            return None
+
+        missing = [req for req, module in DOCS_REQUIREMENTS.items() if importlib.util.find_spec(module) is None]
+        if missing:
+            logging.info(f"Installing missing documentation dependencies: {', '.join(missing)}")
+            started_at = time.monotonic()
+            install_process, usage = telemetry.run_process([sys.executable, "-m", "pip", "install", *missing])
+            telemetry.record(telemetry.DOCS_INSTALL, time.monotonic() - started_at,
+                             telemetry.OK if install_process.returncode == 0 else telemetry.ERROR,
+                             packages=len(missing), **usage)
+            if install_process.returncode != 0:
+                # Not marked ready, so a later attempt can retry (e.g. once the network is back)
+                return install_process.stderr
+            importlib.invalidate_caches()
+
+        _toolchain_ready = True
+        return None
+
+
+def source_hashes(ra_path):
+    """Content hash of every source file under `_ra/`, excluding the built site."""
+    hashes = {}
+    for root, dirs, files in os.walk(ra_path):
+        if root == ra_path and SITE_DIR in dirs:
+            dirs.remove(SITE_DIR)
+        dirs.sort()
+        for name in sorted(files):
+            path = os.path.join(root, name)
+            digest = hashlib.sha256()
+            with open(path, "rb") as f:
+                for chunk in iter(lambda: f.read(1 << 20), b""):
+                    digest.update(chunk)
+            hashes[os.path.relpath(path, ra_path)] = digest.hexdigest()
+    return hashes
+
+
+def build_state_path(ra_path):
+    # One file per repository: `ra_path` is <workspace entry>/_ra
+    target = os.path.basename(os.path.dirname(os.path.abspath(ra_path)))
+    return os.path.join(BUILD_STATE_DIR, f"{target}.json")
+
+
+def _load_build_state(ra_path):
+    # A site that is gone (never built, or evicted by ra.storage) needs a full build whatever was recorded
+    if not os.path.isdir(os.path.join(ra_path, SITE_DIR)):
+        return None
+    try:
+        with open(build_state_path(ra_path), "r", encoding="utf-8") as f:
+            return json.load(f).get("sources", {})
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+
+def _save_build_state(ra_path, hashes):
+    os.makedirs(BUILD_STATE_DIR, exist_ok=True)
+    fsutil.atomic_write_text(build_state_path(ra_path), json.dumps({"sources": hashes}))
+    try:
+        # --dirty builds keep files mkdocs did not write, so the old state file would stay published
+        os.remove(os.path.join(ra_path, SITE_DIR, LEGACY_BUILD_STATE_FILE))
+    except FileNotFoundError:
+        pass
+
+
+def plan_build(ra_path, hashes=None):
+    """Decide how much of the site needs rebuilding: UNCHANGED, INCREMENTAL or FULL."""
+    hashes = source_hashes(ra_path) if hashes is None else hashes
+    previous = _load_build_state(ra_path)
+    if previous is None:
+        return FULL
+    if previous == hashes:
+        return UNCHANGED
+    added_or_removed = set(previous) ^ set(hashes)
+    config_changed = any(previous.get(p) != hashes.get(p) for p in hashes if not p.startswith("docs" + os.sep))
+    # New or deleted pages and config/theme changes affect navigation on every page
+    if added_or_removed or config_changed:
+        return FULL
+    return INCREMENTAL
+
+
+def build_site(ra_path):
+    """Build `_ra/site` only as far as needed. Returns (mode, error output or None)."""
+    with _build_locks_guard:
+        lock = _build_locks.setdefault(os.path.realpath(ra_path), threading.Lock())
+    with lock:
+        return _build_site(ra_path)
+
+
+def _build_site(ra_path):
+    started_at = time.monotonic()
+    target = os.path.basename(os.path.dirname(os.path.abspath(ra_path)))
+    hashes = source_hashes(ra_path)
+    mode = plan_build(ra_path, hashes)
+    if mode == UNCHANGED:
+        logging.info(f"Documentation sources unchanged in {ra_path}; skipping build.")
+        telemetry.record(telemetry.DOCS_BUILD, time.monotonic() - started_at, target=target, mode=mode,
+                         sources=len(hashes))
+        return mode, None
+
+    args = [sys.executable, "-m", "mkdocs", "build", "--dirty" if mode == INCREMENTAL else "--clean"]
+    logging.info(f"Building documentation in {ra_path} ({mode}).")
+    build_process, usage = telemetry.run_process(args, cwd=ra_path)
+    telemetry.record(telemetry.DOCS_BUILD, time.monotonic() - started_at,
+                     telemetry.OK if build_process.returncode == 0 else telemetry.ERROR,
+                     target=target, mode=mode, sources=len(hashes), **usage)
+    if build_process.returncode != 0:
+        return mode, build_process.stderr
+    _save_build_state(ra_path, hashes)
+    return mode, None
@@ -0,0 +1,60 @@
+"""Filesystem helpers shared by the orchestration modules.
+
+Writers go through a temporary file or directory next to the destination and
+rename it into place, so concurrent readers never see partial content;
+:func:`locked` serialises read-modify-write updates across processes.
+"""
+import contextlib
+import fcntl
+import os
+import shutil
+import tempfile
+
+
+def atomic_write_text(path, text):
+    directory = os.path.dirname(path) or "."
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(text)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def atomic_copy(source, destination):
+    """Copy a file or directory so readers never observe a partially written destination."""
+    parent = os.path.dirname(destination)
+    os.makedirs(parent, exist_ok=True)
+    tmp_path = tempfile.mkdtemp(dir=parent, prefix=".tmp-")
+    staged = os.path.join(tmp_path, os.path.basename(destination))
+    try:
+        if os.path.isdir(source):
+            shutil.copytree(source, staged)
+        else:
+            shutil.copy2(source, staged)
+        if os.path.isdir(destination) and not os.path.islink(destination):
+            # Directories cannot be swapped with a single rename; move the old one aside first
+            old = os.path.join(tmp_path, "old")
+            os.rename(destination, old)
+        os.replace(staged, destination)
+    finally:
+        shutil.rmtree(tmp_path, ignore_errors=True)
+
+
+@contextlib.contextmanager
+def locked(path, shared=False, blocking=True):
+    """Hold a lock on the file `path` (created if missing), against other threads and processes.
+
+    Shared holders only exclude exclusive ones. Without `blocking`, raises BlockingIOError if the lock is taken.
+    """
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        # flock() locks belong to the open file, so every caller opening its own descriptor is serialised
+        fcntl.flock(fd, (fcntl.LOCK_SH if shared else fcntl.LOCK_EX) | (0 if blocking else fcntl.LOCK_NB))
+        yield
+    finally:
+        os.close(fd)
@@ -0,0 +1,198 @@
+"""Single static HTTP gateway serving every repository's built docs site.
+
+``/docs/<repo>/...`` maps to ``<workspace>/<repo>/_ra/site/...``. Responses
+carry ETag/Last-Modified validators and Cache-Control headers, and text
+assets are gzip-compressed (compressed bodies are memoised per file version).
+One gateway thread replaces a `mkdocs serve` process per repository.
+
+``/metrics`` exposes :mod:`ra.telemetry` in the Prometheus text format.
+"""
+import email.utils
+import gzip
+import html
+import logging
+import mimetypes
+import os
+import threading
+from collections import OrderedDict
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import quote, unquote, urlsplit
+
+from . import config
+from . import storage
+from . import telemetry
+
+
+DOCS_PREFIX = "/docs/"
+METRICS_PATH = "/metrics"
+SITE_SUBDIR = os.path.join("_ra", "site")
+
+COMPRESSIBLE_TYPES = ("text/", "application/javascript", "application/json", "application/xml", "image/svg+xml")
+MIN_GZIP_SIZE = 1024
+GZIP_CACHE_ENTRIES = 512
+
+
+def site_path(repo_path):
+    return os.path.join(repo_path, SITE_SUBDIR)
+
+
+def has_site(repo_path):
+    return os.path.isfile(os.path.join(site_path(repo_path), "index.html"))
+
+
+def docs_url(repo_name):
+    return f"{config.DOCS_BASE_URL}{DOCS_PREFIX}{quote(repo_name)}/"
+
+
+class _GzipCache:
+    """Small LRU of compressed bodies keyed by (path, mtime, size)."""
+
+    def __init__(self, max_entries=GZIP_CACHE_ENTRIES):
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._max_entries = max_entries
+
+    def get(self, path, stat):
+        key = (path, stat.st_mtime_ns, stat.st_size)
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                return self._entries[key]
+        with open(path, "rb") as f:
+            body = gzip.compress(f.read(), compresslevel=6)
+        with self._lock:
+            self._entries[key] = body
+            while len(self._entries) > self._max_entries:
+                self._entries.popitem(last=False)
+        return body
+
+
+class DocsRequestHandler(BaseHTTPRequestHandler):
+    server_version = "DORA-docs"
+    gzip_cache = _GzipCache()
+
+    def do_GET(self):
+        self._serve(send_body=True)
+
+    def do_HEAD(self):
+        self._serve(send_body=False)
+
+    def log_message(self, format, *args):
+        logging.debug(f"docs gateway: {self.address_string()} {format % args}")
+
+    def _serve(self, send_body):
+        path = unquote(urlsplit(self.path).path)
+        if path == METRICS_PATH:
+            return self._send_metrics(send_body)
+        if path in ("", "/", DOCS_PREFIX, DOCS_PREFIX.rstrip("/")):
+            return self._send_index(send_body)
+        if not path.startswith(DOCS_PREFIX):
+            return self.send_error(HTTPStatus.NOT_FOUND)
+
+        repo_name, slash, rest = path[len(DOCS_PREFIX):].partition("/")
+        if repo_name.startswith("."):
+            return self.send_error(HTTPStatus.FORBIDDEN)
+        if not slash:
+            # `/docs/<repo>` -> `/docs/<repo>/` so relative links in the site resolve
+            return self._redirect(f"{DOCS_PREFIX}{quote(repo_name)}/")
+
+        root = os.path.realpath(site_path(os.path.join(config.WORKSPACE_DIR, repo_name)))
+        file_path = os.path.realpath(os.path.join(root, rest))
+        if file_path != root and not file_path.startswith(root + os.sep):
+            return self.send_error(HTTPStatus.FORBIDDEN)
+        if os.path.isdir(file_path):
+            if rest and not rest.endswith("/"):
+                return self._redirect(quote(path) + "/")
+            file_path = os.path.join(file_path, "index.html")
+        if not os.path.isfile(file_path):
+            return self.send_error(HTTPStatus.NOT_FOUND, f"No built documentation at {path}")
+        # Reading the docs counts as using the repository for the disk budget's LRU order
+        storage.touch(repo_name)
+        self._send_file(file_path, send_body)
+
+    def _send_file(self, file_path, send_body):
+        stat = os.stat(file_path)
+        etag = f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"'
+        content_type = mimetypes.guess_type(file_path)[0] or "application/octet-stream"
+        # HTML must be revalidated so regenerated docs show up; assets can be cached for a while
+        cache_control = "no-cache" if content_type == "text/html" else "public, max-age=3600"
+
+        if etag in self.headers.get("If-None-Match", ""):
+            self.send_response(HTTPStatus.NOT_MODIFIED)
+            self.send_header("ETag", etag)
+            self.send_header("Cache-Control", cache_control)
+            self.end_headers()
+            return
+
+        use_gzip = (
+            "gzip" in self.headers.get("Accept-Encoding", "")
+            and content_type.startswith(COMPRESSIBLE_TYPES)
+            and stat.st_size >= MIN_GZIP_SIZE
+        )
+        if use_gzip:
+            body = self.gzip_cache.get(file_path, stat)
+        else:
+            with open(file_path, "rb") as f:
+                body = f.read()
+
+        self.send_response(HTTPStatus.OK)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("ETag", etag)
+        self.send_header("Last-Modified", email.utils.formatdate(stat.st_mtime, usegmt=True))
+        self.send_header("Cache-Control", cache_control)
+        self.send_header("Vary", "Accept-Encoding")
+        if use_gzip:
+            self.send_header("Content-Encoding", "gzip")
+        self.end_headers()
+        if send_body:
+            self.wfile.write(body)
+
+    def _send_index(self, send_body):
+        repos = []
+        if os.path.isdir(config.WORKSPACE_DIR):
+            repos = sorted(d for d in os.listdir(config.WORKSPACE_DIR)
+                           if not d.startswith(".") and has_site(os.path.join(config.WORKSPACE_DIR, d)))
+        items = "".join(f'<li><a href="{DOCS_PREFIX}{quote(r)}/">{html.escape(r)}</a></li>' for r in repos)
+        body = f"<!doctype html><title>DORA docs</title><h1>Documentation</h1><ul>{items}</ul>".encode("utf-8")
+        self.send_response(HTTPStatus.OK)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+        if send_body:
+            self.wfile.write(body)
+
+    def _send_metrics(self, send_body):
+        body = telemetry.prometheus_text().encode("utf-8")
+        self.send_response(HTTPStatus.OK)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+        if send_body:
+            self.wfile.write(body)
+
+    def _redirect(self, location):
+        self.send_response(HTTPStatus.MOVED_PERMANENTLY)
+        self.send_header("Location", location)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+
+def start_gateway(host=None, port=None):
+    """Start the gateway on a daemon thread. Returns the server, or None if the port is taken."""
+    host = host or config.DOCS_HOST
+    port = port or config.DOCS_PORT
+    try:
+        server = ThreadingHTTPServer((host, port), DocsRequestHandler)
+    except OSError as e:
+        # Most likely another DORA process on this box already serves the docs
+        logging.warning(f"Docs gateway not started on {host}:{port}: {e}")
+        return None
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, name="ra-docs-gateway", daemon=True)
+    thread.start()
+    logging.info(f"Docs gateway serving {config.WORKSPACE_DIR} on http://{host}:{port}{DOCS_PREFIX}")
+    return server
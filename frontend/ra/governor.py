@@ -0,0 +1,274 @@
+"""Concurrency and rate governor for the `claude` processes the scheduler starts.
+
+Every concurrency class from ``commands.md`` (``class=``, i.e. one provider
+endpoint) gets an :class:`EndpointLimiter` combining:
+
+* an adaptive concurrency limit (AIMD): it grows by one slot per "round" of
+  successful jobs up to the configured maximum, and is halved when a job's
+  output shows a rate-limit error (at most once per back-off window, so a
+  burst of failing jobs does not collapse it to one);
+* an optional token bucket capping job starts per minute;
+* a pause after a rate-limit error, doubling on repeated errors and reset
+  by the next clean run.
+
+The limiter state lives in ``workspace/.dora/governor.json`` and is only
+changed under a file lock, so every process sharing the workspace (the UI,
+``python -m ra batch``, ``python -m ra prewarm``) counts the same running
+jobs, spends the same tokens and backs off together after a rate-limit error.
+Slots and waiting jobs of processes that died are dropped.
+
+Admission never blocks: the scheduler offers its queued jobs in priority
+order (interactive before batch, FIFO within a priority) and a job whose class
+is full or paused stays queued while jobs of other classes start. Each
+scheduler also publishes the best priority it has waiting per class
+(:meth:`Governor.set_waiting`), and a class admits no job while another
+process waits with a better priority.
+"""
+import contextlib
+import json
+import logging
+import os
+import re
+import threading
+import time
+import uuid
+
+from . import config
+from . import fsutil
+from . import jobstore
+
+
+GOVERNOR_FILE = os.path.join(config.WORKSPACE_DIR, ".dora", "governor.json")
+# Other processes release slots without notifying us: blocked dispatchers re-check this often
+POLL_INTERVAL = 2.0
+
+_RATE_LIMIT_RE = re.compile(config.RATE_LIMIT_PATTERNS, re.IGNORECASE)
+
+
+def is_rate_limit_error(line):
+    return bool(_RATE_LIMIT_RE.search(line))
+
+
+class LimiterStore:
+    """The state of every class's limiter, shared by all processes through one JSON file."""
+
+    def __init__(self, path=GOVERNOR_FILE):
+        self.path = path
+        self._lock = threading.Lock()
+
+    @contextlib.contextmanager
+    def transaction(self):
+        """The whole state as a dict, written back on exit if it changed."""
+        with self._lock, fsutil.locked(self.path + ".lock"):
+            try:
+                with open(self.path, "r", encoding="utf-8") as f:
+                    state = json.load(f)
+            except (OSError, ValueError):
+                state = {}
+            before = json.dumps(state, sort_keys=True)
+            yield state
+            if json.dumps(state, sort_keys=True) != before:
+                fsutil.atomic_write_text(self.path, json.dumps(state))
+
+
+def _owner_alive(owner):
+    # Owners are "<pid>-<suffix>"
+    pid = int(owner.partition("-")[0])
+    return pid == os.getpid() or jobstore.pid_alive(pid)
+
+
+class EndpointLimiter:
+    """Admission control for one concurrency class, on behalf of one scheduler (`owner`)."""
+
+    def __init__(self, name, max_concurrency, rpm=0, store=None, owner=None):
+        self.name = name
+        self.max_concurrency = max(1, max_concurrency)
+        self.rpm = rpm or 0
+        self.store = store or LimiterStore()
+        self.owner = owner or f"{os.getpid()}-{uuid.uuid4().hex[:6]}"
+
+    # --- Admission ---
+    def try_acquire(self, priority=0):
+        """Admit a job if one may start now. Returns the admission time (for release()), or None."""
+        with self.store.transaction() as state:
+            now = time.time()
+            entry = self._entry(state, now)
+            if self._admission_delay(entry, now, priority) != 0:
+                return None
+            entry["running"][self.owner] = entry["running"].get(self.owner, 0) + 1
+            if self.rpm:
+                entry["tokens"] -= 1
+            return now
+
+    def adopt(self, owner):
+        """Count a job that is already running under `owner` (a re-attached runner), whatever the limit says."""
+        with self.store.transaction() as state:
+            now = time.time()
+            # Idempotent: another process may have adopted the same runner before
+            self._entry(state, now)["running"][owner] = 1
+            return now
+
+    def admission_delay(self, priority=0):
+        """0 when a job may start now; otherwise seconds until it is worth asking again."""
+        with self.store.transaction() as state:
+            now = time.time()
+            return self._admission_delay(self._entry(state, now), now, priority)
+
+    def release(self, admitted_at=None, rate_limited=False, owner=None):
+        owner = owner or self.owner
+        with self.store.transaction() as state:
+            entry = self._entry(state, time.time())
+            running = entry["running"].get(owner, 0) - 1
+            if running > 0:
+                entry["running"][owner] = running
+            else:
+                entry["running"].pop(owner, None)
+            # Jobs admitted before the last decrease say nothing about the reduced limit
+            if not rate_limited and (admitted_at is None or admitted_at > entry["last_decrease"]):
+                # Additive increase: about one more slot per `limit` clean runs. Capped by this process's maximum,
+                # but a process configured with fewer workers never lowers the shared limit
+                increased = min(float(self.max_concurrency), entry["limit"] + 1.0 / entry["limit"])
+                entry["limit"] = max(entry["limit"], increased)
+                entry["backoff"] = 0.0
+
+    def report_rate_limit(self):
+        """A running job hit a rate limit: halve the limit and pause new starts, in every process."""
+        with self.store.transaction() as state:
+            now = time.time()
+            entry = self._entry(state, now)
+            entry["rate_limited"] += 1
+            if now - entry["last_decrease"] < max(entry["backoff"], config.RATE_LIMIT_BACKOFF):
+                return  # Already backing off for this burst
+            entry["last_decrease"] = now
+            entry["limit"] = max(1.0, min(entry["limit"], self.max_concurrency) / 2)
+            entry["backoff"] = min(config.RATE_LIMIT_BACKOFF_MAX, entry["backoff"] * 2 or config.RATE_LIMIT_BACKOFF)
+            entry["paused_until"] = now + entry["backoff"]
+            logging.warning(f"Rate limit hit on {self.name!r}: concurrency limit now {entry['limit']:.1f}, "
+                            f"pausing new jobs for {entry['backoff']:.0f}s")
+
+    def set_waiting(self, state, priority):
+        # Within a transaction: the best priority this owner has queued for the class (None = nothing queued)
+        entry = self._entry(state, time.time())
+        if priority is None:
+            entry["waiting"].pop(self.owner, None)
+        else:
+            entry["waiting"][self.owner] = priority
+
+    # --- Internals ---
+    def _entry(self, state, now):
+        entry = state.setdefault(self.name, {
+            "limit": float(self.max_concurrency), "tokens": float(self.max_concurrency), "refilled_at": now,
+            "paused_until": 0.0, "backoff": 0.0, "last_decrease": 0.0, "rate_limited": 0, "running": {}, "waiting": {},
+        })
+        # Slots and waiting jobs of processes that died are gone with them
+        entry["running"] = {owner: n for owner, n in entry["running"].items() if _owner_alive(owner)}
+        entry["waiting"] = {owner: p for owner, p in entry["waiting"].items() if _owner_alive(owner)}
+        if self.rpm:
+            # Only a token bucket needs the clock; without one, reads leave the file untouched
+            entry["tokens"] = min(float(self.max_concurrency),
+                                  entry["tokens"] + max(now - entry["refilled_at"], 0) * self.rpm / 60.0)
+            entry["refilled_at"] = now
+        return entry
+
+    def _admission_delay(self, entry, now, priority):
+        if now < entry["paused_until"]:
+            return entry["paused_until"] - now
+        if any(p < priority for owner, p in entry["waiting"].items() if owner != self.owner):
+            return POLL_INTERVAL  # Another process has more urgent jobs waiting for this class
+        if sum(entry["running"].values()) >= int(min(entry["limit"], self.max_concurrency)):
+            return POLL_INTERVAL
+        if self.rpm and entry["tokens"] < 1:
+            return (1 - entry["tokens"]) * 60.0 / self.rpm
+        return 0
+
+    def stats(self):
+        with self.store.transaction() as state:
+            now = time.time()
+            entry = self._entry(state, now)
+            return {
+                "class": self.name,
+                "running": sum(entry["running"].values()),
+                "limit": round(min(entry["limit"], self.max_concurrency), 2),
+                "max": self.max_concurrency,
+                "rpm": self.rpm,
+                "rate_limited": entry["rate_limited"],
+                "paused_for": max(0.0, round(entry["paused_until"] - now, 1)),
+            }
+
+
+class Slot:
+    """A granted slot; watches the job's output for rate-limit errors until released (or its block exits)."""
+
+    def __init__(self, limiter, admitted_at, owner=None):
+        self.limiter = limiter
+        self.admitted_at = admitted_at
+        # Held by the limiter's owner unless adopted under another one
+        self.owner = owner
+        self.rate_limited = False
+
+    def observe(self, line):
+        if not self.rate_limited and is_rate_limit_error(line):
+            self.rate_limited = True
+            self.limiter.report_rate_limit()
+
+    def release(self):
+        self.limiter.release(self.admitted_at, self.rate_limited, self.owner)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.release()
+        return False
+
+
+class Governor:
+    """One limiter per concurrency class, created on first use, over the shared :class:`LimiterStore`."""
+
+    def __init__(self, default_concurrency=None, store=None):
+        self.default_concurrency = default_concurrency or config.MAX_WORKERS
+        self.store = store or LimiterStore()
+        # Identifies this scheduler's slots and waiting jobs in the shared state
+        self.owner = f"{os.getpid()}-{uuid.uuid4().hex[:6]}"
+        self._limiters = {}
+        self._lock = threading.Lock()
+
+    def limiter(self, concurrency_class):
+        concurrency_class = concurrency_class or "default"
+        with self._lock:
+            if concurrency_class not in self._limiters:
+                self._limiters[concurrency_class] = EndpointLimiter(
+                    concurrency_class,
+                    config.CLASS_LIMITS.get(concurrency_class, self.default_concurrency),
+                    config.CLASS_RPM.get(concurrency_class, 0),
+                    store=self.store, owner=self.owner,
+                )
+            return self._limiters[concurrency_class]
+
+    def try_slot(self, concurrency_class, priority=0):
+        """A slot if a job of `concurrency_class` may start now, else None; use it as a context manager."""
+        limiter = self.limiter(concurrency_class)
+        admitted_at = limiter.try_acquire(priority)
+        return Slot(limiter, admitted_at) if admitted_at is not None else None
+
+    def adopt_slot(self, concurrency_class, owner):
+        """A slot for a job of `concurrency_class` that is already running, registered under `owner`.
+
+        Owners are "<pid>-<suffix>": the slot is dropped with that process if it is never released.
+        """
+        limiter = self.limiter(concurrency_class)
+        return Slot(limiter, limiter.adopt(owner), owner=owner)
+
+    def set_waiting(self, priorities):
+        """Publish {class: best queued priority} of this scheduler; classes not listed have nothing queued."""
+        limiters = [self.limiter(name) for name in priorities]
+        with self._lock:
+            limiters = {limiter.name: limiter for limiter in limiters + list(self._limiters.values())}
+        with self.store.transaction() as state:
+            for name, limiter in limiters.items():
+                limiter.set_waiting(state, priorities.get(name))
+
+    def stats(self):
+        with self._lock:
+            limiters = list(self._limiters.values())
+        return [limiter.stats() for limiter in limiters]
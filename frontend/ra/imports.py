@@ -0,0 +1,174 @@
+"""Import statements of source files, resolved to the modules of the same repository.
+
+Python files are parsed with :mod:`ast`. JavaScript and TypeScript files are
+scanned for ``import``/``export ... from``, ``require()`` and ``import()``.
+:class:`ModuleIndex` maps what a file imports onto the repository's own files;
+everything else is reported as an external package (standard library modules
+excluded), so callers get both the internal import graph and the third-party
+packages each file uses. Parsing (:func:`read_imports`) and resolution
+(:func:`resolve_imports`) are separate steps so callers can cache the former
+per file and redo only the latter when files are added or removed.
+"""
+import ast
+import os
+import posixpath
+import re
+import sys
+import warnings
+
+
+PYTHON = "python"
+JAVASCRIPT = "javascript"
+
+PY_EXTENSIONS = (".py",)
+JS_EXTENSIONS = (".ts", ".tsx", ".js", ".jsx", ".mjs", ".cjs")
+
+# Larger files are generated or vendored more often than not, and slow to parse
+MAX_FILE_BYTES = 512 * 1024
+
+_JS_IMPORT_RE = re.compile(
+    r"""(?:\bimport\s+(?:[\w*{}\s,$]+\s+from\s+)?|\bexport\s+[\w*{}\s,$]+\s+from\s+|\brequire\s*\(\s*|\bimport\s*\(\s*)"""
+    r"""['"]([^'"\n]+)['"]""")
+
+
+def language(path):
+    extension = os.path.splitext(path)[1]
+    if extension in PY_EXTENSIONS:
+        return PYTHON
+    if extension in JS_EXTENSIONS:
+        return JAVASCRIPT
+    return None
+
+
+# --- Parsing ---
+def python_imports(source, module, is_package=False):
+    """(imported module, [imported names]) for each import in `source`, relative imports made absolute."""
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", SyntaxWarning)
+        tree = ast.parse(source)
+    package = module.split(".") if is_package else module.split(".")[:-1]
+    imports = []
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            imports += [(alias.name, []) for alias in node.names]
+        elif isinstance(node, ast.ImportFrom):
+            if node.level:
+                base = package[:len(package) - node.level + 1] if node.level - 1 <= len(package) else []
+                name = ".".join(base + ([node.module] if node.module else []))
+            else:
+                name = node.module or ""
+            if name:
+                imports.append((name, [alias.name for alias in node.names if alias.name != "*"]))
+    return imports
+
+
+def js_imports(source):
+    """Module specifiers imported or required by a JavaScript/TypeScript source."""
+    return [match.group(1) for match in _JS_IMPORT_RE.finditer(source)]
+
+
+# --- Resolution ---
+class ModuleIndex:
+    """The Python and JavaScript modules among a repository's files ("/"-separated relative paths)."""
+
+    def __init__(self, paths):
+        python = [p for p in paths if p.endswith(PY_EXTENSIONS)]
+        self.package_dirs = {posixpath.dirname(p) for p in python if posixpath.basename(p) == "__init__.py"}
+        self.python = {}
+        for path in python:
+            self.python.setdefault(self.python_module(path), path)
+        self.javascript = {p for p in paths if p.endswith(JS_EXTENSIONS)}
+
+    def python_module(self, path):
+        """Dotted module name: the path below its source root, the first ancestor that is not a package."""
+        directory, name = posixpath.split(path[:-len(".py")])
+        parts = [] if name == "__init__" else [name]
+        while directory in self.package_dirs:
+            directory, package = posixpath.split(directory)
+            parts.insert(0, package)
+        return ".".join(parts) or name
+
+    def resolve_python(self, name, names=()):
+        """Files of an absolute import (`from name import names`), or None if it is not a repository module."""
+        resolved = [self.python[f"{name}.{n}"] for n in names if f"{name}.{n}" in self.python]
+        # Imported names that are attributes of the module rather than submodules
+        if name in self.python and len(resolved) < len(names):
+            resolved.append(self.python[name])
+        if not resolved:
+            # `import a.b.c` of a module whose parent is the last one we know (e.g. an extension module)
+            parts = name.split(".")
+            while parts and ".".join(parts) not in self.python:
+                parts.pop()
+            if not parts:
+                return None
+            resolved.append(self.python[".".join(parts)])
+        return resolved
+
+    def resolve_javascript(self, importer, specifier):
+        """File of a relative specifier, None for a package specifier or an unresolved one."""
+        if not specifier.startswith("."):
+            return None
+        base = posixpath.normpath(posixpath.join(posixpath.dirname(importer), specifier))
+        candidates = [base] + [base + e for e in JS_EXTENSIONS] + [f"{base}/index{e}" for e in JS_EXTENSIONS]
+        # TypeScript sources import their compiled name (`./util.js` for util.ts)
+        stem, extension = posixpath.splitext(base)
+        if extension in JS_EXTENSIONS:
+            candidates += [stem + e for e in JS_EXTENSIONS]
+        return next((c for c in candidates if c in self.javascript), None)
+
+
+def _package_name(specifier):
+    # `@scope/name/sub` -> `@scope/name`, `name/sub` -> `name`; node builtins are not packages
+    if specifier.startswith("node:"):
+        return None
+    parts = specifier.split("/")
+    return "/".join(parts[:2]) if specifier.startswith("@") else parts[0]
+
+
+def read_imports(root, path, index):
+    """What `path` imports, unresolved: [(module, [names])] for Python, [specifier] for JavaScript.
+
+    Unreadable, unparseable and oversized files import nothing.
+    """
+    kind = language(path)
+    try:
+        if kind is None or os.path.getsize(os.path.join(root, path)) > MAX_FILE_BYTES:
+            return []
+        with open(os.path.join(root, path), "r", encoding="utf-8", errors="replace") as f:
+            source = f.read()
+    except OSError:
+        return []
+    if kind == JAVASCRIPT:
+        return js_imports(source)
+    try:
+        return python_imports(source, index.python_module(path), posixpath.basename(path) == "__init__.py")
+    except (SyntaxError, ValueError, RecursionError):
+        return []
+
+
+def resolve_imports(path, imported, index):
+    """(repository files, external packages) of what read_imports() returned for `path`."""
+    internal, external = set(), set()
+    if language(path) == PYTHON:
+        for name, names in imported:
+            resolved = index.resolve_python(name, names)
+            if resolved:
+                internal.update(resolved)
+            elif name.split(".")[0] not in sys.stdlib_module_names:
+                external.add(name.split(".")[0])
+    else:
+        for specifier in imported:
+            resolved = index.resolve_javascript(path, specifier)
+            if resolved:
+                internal.add(resolved)
+            elif not specifier.startswith("."):
+                package = _package_name(specifier)
+                if package:
+                    external.add(package)
+    internal.discard(path)
+    return internal, external
+
+
+def file_imports(root, path, index):
+    """(repository files imported by `path`, external packages it imports)."""
+    return resolve_imports(path, read_imports(root, path, index), index)
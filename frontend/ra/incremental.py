@@ -0,0 +1,96 @@
+"""Incremental (delta) analysis of repositories that moved since their last report.
+
+When a report was generated from an older commit with the same command
+template and prompt version, only the files changed between that commit and
+the current HEAD need to be re-examined. The command's prompt is extended with
+delta instructions so the model updates the previous report in place instead
+of rediscovering the whole tree.
+"""
+import logging
+import os
+import re
+
+from . import config
+from . import fsutil
+from . import lazy
+from . import report_cache
+
+
+git = lazy.module("git")
+
+DELTA_DIR = os.path.join(config.WORKSPACE_DIR, ".dora", "deltas")
+
+# Matches the quoted prompt passed to `claude -p "..."`
+_PROMPT_RE = re.compile(r'(-p\s+")((?:[^"\\]|\\.)*)(")')
+
+
+def extend_prompt(command, instructions, purpose="extra"):
+    """Append `instructions` to the quoted `-p "..."` prompt of a command (unchanged if there is none)."""
+    rewritten, count = _PROMPT_RE.subn(lambda m: m.group(1) + m.group(2) + instructions + m.group(3), command, count=1)
+    if count == 0:
+        logging.warning(f"No quoted prompt found in command; running it without {purpose} instructions: {command}")
+        return command
+    return rewritten
+
+
+class DeltaPlan:
+    """What changed between the commit a report was built from and HEAD."""
+
+    def __init__(self, output_file, base_rev, head_rev, files):
+        self.output_file = report_cache.normalize_output(output_file)
+        self.base_rev = base_rev
+        self.head_rev = head_rev
+        self.files = files
+        self.file_list_path = None
+
+
+def changed_files(repo_path, base_rev, head_rev):
+    """Paths changed between two commits, or None if the diff cannot be computed (e.g. shallow history)."""
+    try:
+        repo = git.Repo(repo_path)
+        repo.commit(base_rev)
+        output = repo.git.diff("--name-only", "--no-renames", f"{base_rev}..{head_rev}")
+    except (git.GitCommandError, git.InvalidGitRepositoryError, ValueError) as e:
+        logging.info(f"Cannot diff {repo_path} from {base_rev[:8]}: {e}")
+        return None
+    return [line for line in output.splitlines() if line.strip()]
+
+
+def plan_delta(target_path, output_file, command_template, head_rev):
+    """Return a DeltaPlan if the existing report can be updated incrementally, otherwise None."""
+    if not output_file or not head_rev or head_rev.startswith("usecase:"):
+        return None
+    if not os.path.exists(os.path.join(target_path, report_cache.normalize_output(output_file))):
+        return None
+
+    previous = report_cache.load_provenance(target_path).get(report_cache.normalize_output(output_file))
+    if not previous or not previous.get("revision") or previous["revision"] == head_rev:
+        return None
+    # A different command or prompt produces a different report; patching the old one would mix the two
+    if previous.get("template_hash") != report_cache.template_hash(command_template):
+        return None
+    if previous.get("prompt_version") != report_cache.PROMPT_VERSION:
+        return None
+
+    files = changed_files(target_path, previous["revision"], head_rev)
+    if files is None:
+        return None
+    if len(files) > config.DELTA_MAX_FILES:
+        logging.info(f"{len(files)} files changed in {target_path}; running a full analysis instead of a delta.")
+        return None
+    return DeltaPlan(output_file, previous["revision"], head_rev, files)
+
+
+def delta_command(command, target_path, plan):
+    """Rewrite `command` so the prompt only asks for the changed files to be re-examined."""
+    os.makedirs(DELTA_DIR, exist_ok=True)
+    name = f"{os.path.basename(os.path.normpath(target_path))}-{plan.base_rev[:12]}-{plan.head_rev[:12]}.txt"
+    plan.file_list_path = os.path.join(DELTA_DIR, name)
+    fsutil.atomic_write_text(plan.file_list_path, "\n".join(plan.files) + "\n")
+
+    instructions = (
+        f" DELTA MODE: {plan.output_file} already exists and was generated from commit {plan.base_rev[:12]}."
+        f" Only the {len(plan.files)} file(s) listed in {plan.file_list_path} changed since then (HEAD is {plan.head_rev[:12]})."
+        f" Re-examine only those files and update {plan.output_file} in place, keeping sections that are unaffected by the changes as they are."
+    )
+    return extend_prompt(command, instructions, purpose="delta")
@@ -0,0 +1,573 @@
+"""Process-wide analysis job queue backed by a bounded pool of worker threads.
+
+A single :class:`JobScheduler` is shared by every Streamlit session, so any
+session can queue a job, watch its output or cancel it, while at most
+``max_workers`` `claude` processes run at the same time.
+
+Every job is recorded on disk (see :mod:`ra.jobstore`) and executed by a
+detached :mod:`ra.runner` process, so its output, status and exit code
+survive browser reloads and Streamlit restarts. A restarted scheduler
+re-attaches to runners that are still alive and re-queues jobs that never
+started (after the rest of their retry back-off). Runners whose scheduler is
+gone are adopted: they count against this scheduler's workers and hold a
+governor slot of their class until they exit.
+
+Runner processes are owned by an asyncio :class:`~ra.supervisor.Supervisor`:
+worker threads only dispatch queued jobs, while output, exits and status
+changes arrive on the supervisor's event loop and are published to its
+subscribers (see :meth:`JobScheduler.subscribe`).
+
+Jobs submitted with a ``flight_key`` are single-flight: while a job with the
+same key is queued or running, here or in another process sharing the
+workspace, submitting again returns that job instead of starting a second
+identical process.
+
+A worker takes the highest priority queued job (:data:`INTERACTIVE` before
+:data:`BATCH`) whose concurrency class the :class:`~ra.governor.Governor`
+admits right now; jobs of a full or paused class stay queued without holding
+a worker, so other classes keep running. The governor's limits, rate-limit
+back-off and priorities apply across every process sharing the workspace.
+
+A job that fails transiently (idle timeout, provider rate limit or network
+error in its output, or a runner that died) is re-queued with exponential
+back-off up to ``config.JOB_RETRIES`` times. Its partial report is kept as a
+checkpoint (see :mod:`ra.checkpoint`) and the retry continues from it. The
+reason of every failure is recorded in the job's status.
+
+Every attempt is recorded in :mod:`ra.telemetry` with its queue wait, wall
+time and the command's CPU time, peak RSS and output size.
+"""
+import heapq
+import itertools
+import logging
+import os
+import random
+import re
+import signal
+import sys
+import threading
+import time
+import uuid
+
+from . import config
+from . import jobstore
+from . import telemetry
+from .governor import Governor
+from .logstream import LogStream
+from .supervisor import Supervisor, OUTPUT, STATUS
+
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+CANCELLED = "cancelled"
+
+FINISHED_STATES = (SUCCEEDED, FAILED, CANCELLED)
+
+_TRANSIENT_RE = re.compile(config.TRANSIENT_PATTERNS, re.IGNORECASE)
+
+# Dispatch priorities: lower runs first
+INTERACTIVE = 0
+BATCH = 10
+
+# Jobs loaded back from disk when the scheduler starts
+RECOVER_LIMIT = 100
+ATTACH_POLL_INTERVAL = 0.5
+
+
+def _scheduler_alive(owner):
+    # Schedulers are recorded by their governor owner, "<pid>-<suffix>"
+    return bool(owner) and jobstore.pid_alive(int(owner.partition("-")[0]))
+
+
+class Job:
+    """A single command run against a repository or use case."""
+
+    SPEC_FIELDS = ("id", "name", "command", "base_command", "cwd", "target", "target_path", "kind", "output_file",
+                   "timeout", "idle_timeout", "concurrency_class", "priority", "flight_key", "meta", "created_at")
+
+    def __init__(self, name, command, cwd, target, target_path, kind="repo", output_file=None, timeout=None,
+                 idle_timeout=None, concurrency_class=None, priority=INTERACTIVE, flight_key=None, meta=None, job_id=None):
+        self.id = job_id or uuid.uuid4().hex[:12]
+        self.name = name
+        self.command = command
+        # The command as submitted; retries rewrite `command` to resume from a checkpoint
+        self.base_command = command
+        self.cwd = os.path.abspath(cwd)
+        self.target = target
+        self.target_path = target_path
+        self.kind = kind
+        self.output_file = output_file
+        # Declared per command in commands.md (see ra.commands)
+        self.timeout = timeout
+        self.idle_timeout = idle_timeout
+        self.concurrency_class = concurrency_class
+        self.priority = priority
+        # Identical work (same target, revision and command) shares one job while it is in flight
+        self.flight_key = flight_key
+        # Free-form data for completion hooks (e.g. the report cache key); persisted with the job
+        self.meta = meta or {}
+        self.status = QUEUED
+        self.return_code = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        # When the job last became eligible to run (submitted, or re-queued for a retry)
+        self.queued_at = None
+        self.runner_pid = None
+        self.cancel_requested = False
+        # Set when the current attempt's output showed a provider rate-limit (see ra.governor) or network error
+        self.rate_limited = False
+        self.transient_error = False
+        self.attempt = 1
+        self.log = LogStream(jobstore.log_path(self.id))
+
+    @classmethod
+    def from_disk(cls, job_id):
+        spec = jobstore.read_spec(job_id)
+        if spec is None:
+            return None
+        job = cls(spec["name"], spec["command"], spec["cwd"], spec["target"], spec["target_path"],
+                  kind=spec.get("kind", "repo"), output_file=spec.get("output_file"),
+                  timeout=spec.get("timeout"), idle_timeout=spec.get("idle_timeout"),
+                  concurrency_class=spec.get("concurrency_class"),
+                  priority=spec.get("priority", INTERACTIVE), flight_key=spec.get("flight_key"), meta=spec.get("meta"), job_id=job_id)
+        job.created_at = spec.get("created_at", job.created_at)
+        job.base_command = spec.get("base_command", job.command)
+        status = jobstore.read_status(job_id)
+        job.status = status.get("status", QUEUED)
+        job.return_code = status.get("return_code")
+        job.started_at = status.get("started_at")
+        job.finished_at = status.get("finished_at")
+        job.runner_pid = status.get("runner_pid")
+        job.rate_limited = status.get("rate_limited", False)
+        job.attempt = status.get("attempt", 1)
+        return job
+
+    def save_spec(self):
+        jobstore.write_spec(self.id, {field: getattr(self, field) for field in self.SPEC_FIELDS})
+
+    @property
+    def is_active(self):
+        return self.status not in FINISHED_STATES
+
+    def __repr__(self):
+        return f"<Job {self.id} {self.name!r} on {self.target!r} [{self.status}]>"
+
+
+class JobScheduler:
+    """Runs queued jobs on at most ``max_workers`` concurrent processes."""
+
+    def __init__(self, max_workers=None, on_finish=None, recover=True):
+        self.max_workers = max_workers or config.MAX_WORKERS
+        # Called with every job, from a background thread, once it reaches a finished state
+        self.on_finish = on_finish
+        # Short-lived processes (e.g. the batch CLI) pass recover=False so they don't adopt the UI's jobs
+        # Heap of (priority, sequence, job id): interactive jobs overtake queued batch jobs
+        self._queue = []
+        self._sequence = itertools.count()
+        self._jobs = {}
+        # flight_key -> id of the queued or running job doing that work
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self._workers = []
+        # Adaptive per-class concurrency and rate limits, shared by all workers
+        self.governor = Governor(self.max_workers)
+        # Owns the runner processes; workers only dispatch, so running jobs are bounded by capacity instead
+        self.supervisor = Supervisor()
+        # Guards the queue and the running count; notified on enqueue and whenever a job releases its slot
+        self._dispatch = threading.Condition()
+        self._running = 0
+        if recover:
+            self._recover()
+        for i in range(self.max_workers):
+            worker = threading.Thread(target=self._worker, name=f"ra-worker-{i}", daemon=True)
+            worker.start()
+            self._workers.append(worker)
+
+    # --- Public API ---
+    def submit(self, name, command, cwd, target, target_path, kind="repo", output_file=None, timeout=None,
+               idle_timeout=None, concurrency_class=None, priority=INTERACTIVE, flight_key=None, meta=None):
+        """Queue a job, or return the in-flight job with the same `flight_key` if there is one."""
+        job = Job(name, command, cwd, target, target_path, kind=kind, output_file=output_file, timeout=timeout,
+                  idle_timeout=idle_timeout, concurrency_class=concurrency_class, priority=priority,
+                  flight_key=flight_key, meta=meta)
+        existing = self.inflight(flight_key)
+        if existing is None and flight_key:
+            # Another process sharing the workspace may already be running this work
+            existing = self._attach_inflight_on_disk(flight_key)
+        if existing is None:
+            with self._lock:
+                existing = self._inflight_locked(flight_key)
+                if existing is None:
+                    self._jobs[job.id] = job
+                    if flight_key:
+                        self._inflight[flight_key] = job.id
+        if existing is not None:
+            logging.info(f"Joining in-flight job {existing.id} instead of starting {name} on {kind} {target} again")
+            return existing
+        job.save_spec()
+        jobstore.update_status(job.id, status=QUEUED)
+        self._enqueue(job)
+        logging.info(f"Queued job {job.id}: {name} on {kind} {target}")
+        return job
+
+    def get(self, job_id):
+        with self._lock:
+            job = self._jobs.get(job_id)
+        return job or self.attach(job_id)
+
+    def attach(self, job_id):
+        """Load a job that is on disk but unknown to this scheduler (e.g. a link from an older process)."""
+        if not job_id or job_id != os.path.basename(job_id) or not os.path.isdir(jobstore.job_dir(job_id)):
+            return None
+        job = Job.from_disk(job_id)
+        if job is None:
+            return None
+        with self._lock:
+            job = self._jobs.setdefault(job_id, job)
+        job.log.refresh()
+        return job
+
+    def jobs(self):
+        """All known jobs, newest first."""
+        with self._lock:
+            return sorted(self._jobs.values(), key=lambda j: j.created_at, reverse=True)
+
+    def active_jobs(self):
+        return [job for job in self.jobs() if job.is_active]
+
+    def class_stats(self):
+        """Governor state per concurrency class, with the number of queued jobs of each."""
+        waiting = {}
+        for job in self.active_jobs():
+            if job.status == QUEUED:
+                waiting[job.concurrency_class or "default"] = waiting.get(job.concurrency_class or "default", 0) + 1
+        return [dict(limiter, waiting=waiting.get(limiter["class"], 0)) for limiter in self.governor.stats()]
+
+    def subscribe(self, job_id=None):
+        """Output and status events of one job (or all jobs); see :class:`ra.supervisor.Subscription`."""
+        return self.supervisor.subscribe(job_id)
+
+    def inflight(self, flight_key):
+        """The queued or running job for `flight_key` in this process, if any."""
+        with self._lock:
+            return self._inflight_locked(flight_key)
+
+    def cancel(self, job_id):
+        job = self.get(job_id)
+        if job is None or not job.is_active:
+            return False
+        job.cancel_requested = True
+        # Recorded, so whichever process settles the job treats the killed runner as cancelled, not crashed
+        jobstore.update_status(job.id, cancel_requested=True)
+        if job.status == QUEUED:
+            self._finish(job, CANCELLED, None)
+            with self._dispatch:
+                # Drop it from the queue and from the waiting jobs published to other processes
+                self._dispatch.notify()
+        elif job.runner_pid and jobstore.pid_alive(job.runner_pid):
+            # The runner and the command it runs each lead their own process group
+            for pid in (jobstore.read_status(job.id).get("pid"), job.runner_pid):
+                try:
+                    if pid:
+                        os.killpg(pid, signal.SIGKILL)
+                except ProcessLookupError:
+                    pass  # Process already dead
+        logging.info(f"Cancellation requested for job {job.id}")
+        return True
+
+    # --- Single flight ---
+    def _inflight_locked(self, flight_key):
+        job = self._jobs.get(self._inflight.get(flight_key)) if flight_key else None
+        return job if job is not None and job.is_active else None
+
+    def _attach_inflight_on_disk(self, flight_key):
+        # Only running jobs of other processes can be followed (through their runner's pid and log file)
+        for job_id in jobstore.list_job_ids(limit=RECOVER_LIMIT):
+            with self._lock:
+                if job_id in self._jobs:
+                    continue
+            spec = jobstore.read_spec(job_id) or {}
+            status = jobstore.read_status(job_id)
+            if (spec.get("flight_key") != flight_key or status.get("status") != RUNNING
+                    or not jobstore.pid_alive(status.get("runner_pid"))):
+                continue
+            running = self.attach(job_id)
+            if running is None:
+                continue
+            with self._lock:
+                existing = self._inflight_locked(flight_key)
+                if existing is not None:
+                    return existing
+                self._inflight[flight_key] = running.id
+            self._follow_detached(running)
+            return running
+        return None
+
+    # --- Recovery ---
+    def _recover(self):
+        for job_id in reversed(jobstore.list_job_ids(limit=RECOVER_LIMIT)):
+            job = Job.from_disk(job_id)
+            if job is None:
+                continue
+            self._jobs[job.id] = job
+            if job.is_active and job.flight_key:
+                self._inflight[job.flight_key] = job.id
+            if job.status == QUEUED:
+                # A job waiting out its retry back-off keeps waiting for the rest of it
+                delay = (jobstore.read_status(job.id).get("retry_at") or 0) - time.time()
+                if delay > 0:
+                    logging.info(f"Re-queueing job {job.id} from a previous run in {delay:.0f}s")
+                    self._enqueue_later(job, delay)
+                else:
+                    logging.info(f"Re-queueing job {job.id} from a previous run")
+                    self._enqueue(job)
+            elif job.status == RUNNING:
+                logging.info(f"Re-attaching to job {job.id} (runner PID: {job.runner_pid})")
+                self._follow_detached(job)
+            else:
+                job.log.refresh()
+
+    def _follow_detached(self, job):
+        # The runner is no longer our child, so follow its log file and status record instead of a pipe
+        slot = None
+        if not _scheduler_alive(jobstore.read_status(job.id).get("scheduler")):
+            # Its scheduler is gone (a restart): adopt the job, so new starts here and in other processes
+            # still leave room for it. The slot is keyed by the runner, so it also goes if we do.
+            slot = self.governor.adopt_slot(job.concurrency_class, f"{job.runner_pid}-{job.id}")
+            with self._dispatch:
+                self._running += 1
+            jobstore.update_status(job.id, scheduler=self.governor.owner)
+        self.supervisor.watch(job.runner_pid, key=job.id, on_poll=lambda: self._publish_output(job),
+                              on_exit=lambda: self._on_detached_exit(job, slot), interval=ATTACH_POLL_INTERVAL)
+
+    def _on_detached_exit(self, job, slot):
+        try:
+            self._settle(job, None)
+        finally:
+            if slot is not None:
+                slot.release()
+                self._release_capacity()
+
+    def _publish_output(self, job, slot=None):
+        lines = job.log.refresh()
+        for line in lines:
+            line_without_newline = line.strip()
+            if slot is not None:
+                slot.observe(line_without_newline)
+                if _TRANSIENT_RE.search(line_without_newline):
+                    job.transient_error = True
+            if line_without_newline:
+                logging.info(f"[{job.id}] {line_without_newline}")
+        if lines:
+            self.supervisor.publish(job.id, OUTPUT, lines)
+
+    # --- Workers ---
+    def _enqueue(self, job):
+        job.queued_at = time.time()
+        with self._dispatch:
+            heapq.heappush(self._queue, (job.priority, next(self._sequence), job.id))
+            self._dispatch.notify()
+
+    def _enqueue_later(self, job, delay):
+        timer = threading.Timer(delay, self._enqueue, args=(job,))
+        timer.daemon = True
+        timer.start()
+
+    def _release_capacity(self):
+        with self._dispatch:
+            self._running -= 1
+            # A finished job frees a worker and a slot of its class, which may admit any waiting job
+            self._dispatch.notify_all()
+
+    def _next_job(self):
+        # Wait until a worker is free and a queued job may start, then claim both
+        with self._dispatch:
+            while True:
+                job, slot, wait = self._claim_locked(self._running < self.max_workers)
+                if job is not None:
+                    self._running += 1
+                    return job, slot
+                self._dispatch.wait(wait)
+
+    def _claim_locked(self, may_start):
+        # The first queued job, in priority order, whose class admits it now. Returns (job, slot, None), or
+        # (None, None, seconds until it is worth looking again; None = until a job is queued or finishes).
+        # Also publishes what is still waiting, so other processes hold back less urgent jobs of those classes.
+        wait, blocked, claimed, waiting = None, set(), None, {}
+        for entry in sorted(self._queue):
+            with self._lock:
+                job = self._jobs.get(entry[2])
+            if job is None or job.status != QUEUED:
+                self._queue.remove(entry)  # Cancelled while queued
+                continue
+            concurrency_class = job.concurrency_class or "default"
+            if may_start and claimed is None and concurrency_class not in blocked:
+                slot = self.governor.try_slot(concurrency_class, job.priority)
+                if slot is not None:
+                    claimed = (entry, job, slot)
+                    continue
+                # Later jobs of this class must not overtake this one; other classes may still start
+                blocked.add(concurrency_class)
+                delay = self.governor.limiter(concurrency_class).admission_delay(job.priority)
+                wait = delay if wait is None else min(wait, delay)
+            waiting.setdefault(concurrency_class, job.priority)
+        heapq.heapify(self._queue)
+        self.governor.set_waiting(waiting)
+        if claimed is None:
+            return None, None, wait
+        entry, job, slot = claimed
+        self._queue.remove(entry)
+        heapq.heapify(self._queue)
+        return job, slot, None
+
+    def _worker(self):
+        while True:
+            job, slot = self._next_job()
+            started = False
+            try:
+                # The job may have been cancelled since it was claimed
+                if job.status == QUEUED:
+                    self._start(job, slot)
+                    started = True
+            except Exception as e:
+                logging.error(f"Error in job {job.id}: {e}")
+                jobstore.append_log(job.id, str(e))
+                job.log.refresh()
+                self._finish(job, FAILED, 1)
+            finally:
+                if not started:
+                    slot.release()
+                    self._release_capacity()
+
+    def _start(self, job, slot):
+        job.status = RUNNING
+        job.started_at = time.time()
+        job.rate_limited = job.transient_error = False
+        logging.info(f"Starting job {job.id}: {job.name} on {job.kind} {job.target}")
+        jobstore.update_status(job.id, status=RUNNING, started_at=job.started_at)
+        env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [config.FRONTEND_DIR, os.environ.get("PYTHONPATH")])))
+        # The runner echoes each line it logs; the echo is only a wake-up, the log file itself is read
+        job.runner_pid = self.supervisor.spawn(
+            [sys.executable, "-m", "ra.runner", job.id], key=job.id,
+            on_output=lambda chunk: self._publish_output(job, slot),
+            on_exit=lambda runner_code: self._on_exit(job, slot, runner_code),
+            cwd=config.FRONTEND_DIR, env=env, start_new_session=True,
+        )
+        # The scheduler owning the runner; a restarted scheduler adopts runners whose owner is gone
+        jobstore.update_status(job.id, runner_pid=job.runner_pid, scheduler=self.governor.owner)
+        self.supervisor.publish(job.id, STATUS, RUNNING)
+
+    def _on_exit(self, job, slot, runner_code):
+        try:
+            self._publish_output(job, slot)
+            if slot.rate_limited:
+                job.rate_limited = True
+                jobstore.update_status(job.id, rate_limited=True)
+            self._settle(job, runner_code)
+        except Exception as e:
+            logging.error(f"Error in job {job.id}: {e}")
+            self._finish(job, FAILED, runner_code)
+        finally:
+            slot.release()
+            self._release_capacity()
+
+    def _settle(self, job, runner_code):
+        status = jobstore.read_status(job.id)
+        return_code = status.get("return_code", runner_code)
+        # Possibly cancelled from another process sharing the workspace
+        job.cancel_requested = job.cancel_requested or bool(status.get("cancel_requested"))
+        self._record_attempt(job, status)
+        if job.cancel_requested:
+            self._finish(job, CANCELLED, return_code)
+            return
+        from . import checkpoint  # Not at module level: checkpoint -> report_cache -> jobs
+        if status.get("status") == SUCCEEDED:
+            # The report is complete: no later run of the same work should continue a partial one
+            checkpoint.discard(job.flight_key, job.id)
+            self._finish(job, SUCCEEDED, return_code)
+            return
+
+        if status.get("status") == FAILED:
+            reason = self._transient_reason(job, status)
+        else:
+            # The runner died without recording a result (killed, or the host went down)
+            jobstore.append_log(job.id, "--- Job runner exited without recording a result ---")
+            reason = "runner died"
+        # Only an interrupted attempt leaves a partial report worth continuing; a failed one may be wrong
+        failure = reason or ("wall-clock timeout" if status.get("timed_out") == "wall" else "error")
+        jobstore.update_status(job.id, failure_reason=failure)
+        partial = checkpoint.save(job) if failure in checkpoint.RESUMABLE else None
+        if reason and job.attempt <= config.JOB_RETRIES:
+            self._retry(job, reason, partial)
+        else:
+            if partial:
+                jobstore.append_log(job.id, f"--- Partial output kept at {partial}; the next run continues from it ---")
+            job.log.refresh()
+            self._finish(job, FAILED, return_code)
+
+    def _record_attempt(self, job, status):
+        # One telemetry event per attempt, with the usage the runner measured for the command
+        started_at = status.get("started_at") or job.started_at
+        if not started_at:
+            return
+        outcome, finished_at = status.get("status"), status.get("finished_at")
+        if outcome not in FINISHED_STATES or finished_at is None or finished_at < started_at:
+            # The runner died (or was killed by a cancellation) before recording its result
+            outcome, finished_at = "died", time.time()
+        if job.cancel_requested:
+            outcome = CANCELLED
+        telemetry.record(
+            telemetry.ANALYSIS, finished_at - started_at, outcome,
+            job_id=job.id, command=job.name, target=job.target, kind=job.kind, attempt=job.attempt,
+            concurrency_class=job.concurrency_class, priority=job.priority,
+            queue_wait=round(job.started_at - job.queued_at, 3) if job.queued_at and job.started_at else None,
+            cpu_seconds=status.get("cpu_seconds"), max_rss_bytes=status.get("max_rss_bytes"),
+            output_bytes=status.get("output_bytes"), timed_out=status.get("timed_out"),
+            rate_limited=job.rate_limited or None,
+        )
+
+    def _transient_reason(self, job, status):
+        # Failures worth retrying as they are; a wall-clock timeout or a plain non-zero exit is not
+        if status.get("timed_out") == "idle":
+            return "idle timeout"
+        if job.rate_limited:
+            return "rate limited"
+        if job.transient_error:
+            return "transient error"
+        return None
+
+    def _retry(self, job, reason, partial):
+        from . import checkpoint
+        job.attempt += 1
+        job.command = checkpoint.resume_command(job.base_command, job.output_file, partial) if partial else job.base_command
+        job.save_spec()
+        delay = config.RETRY_BACKOFF * 2 ** (job.attempt - 2) * random.uniform(0.8, 1.2)
+        jobstore.append_log(job.id, f"--- Attempt {job.attempt - 1} failed ({reason}); retrying in {delay:.0f}s "
+                                    f"(attempt {job.attempt} of {config.JOB_RETRIES + 1})"
+                                    f"{', resuming from the partial output' if partial else ''} ---")
+        job.log.refresh()
+        job.status = QUEUED
+        jobstore.update_status(job.id, status=QUEUED, attempt=job.attempt, retry_at=time.time() + delay)
+        self.supervisor.publish(job.id, STATUS, QUEUED)
+        logging.info(f"Retrying job {job.id} in {delay:.0f}s ({reason})")
+        self._enqueue_later(job, delay)
+
+    def _finish(self, job, status, return_code):
+        job.status = status
+        job.return_code = return_code
+        job.finished_at = time.time()
+        with self._lock:
+            if job.flight_key and self._inflight.get(job.flight_key) == job.id:
+                del self._inflight[job.flight_key]
+        jobstore.update_status(job.id, status=status, return_code=return_code, finished_at=job.finished_at)
+        logging.info(f"Job {job.id} {status} (exit code: {return_code})")
+        if self.on_finish is not None:
+            try:
+                self.on_finish(job)
+            except Exception as e:
+                logging.error(f"Error in completion hook of job {job.id}: {e}")
+        # After the hooks, so a woken viewer already sees their effects (cached report, next pipeline stages)
+        self.supervisor.publish(job.id, STATUS, status)
@@ -0,0 +1,91 @@
+"""On-disk job records under ``workspace/.dora/jobs/<job_id>/``.
+
+Each job directory holds:
+
+* ``job.json``   - the immutable job spec (command, cwd, target, ...)
+* ``status.json`` - status, pids, timestamps and exit code, rewritten atomically
+  under ``status.lock``
+* ``output.log`` - the append-only combined stdout/stderr of the command
+
+The files are written by the detached :mod:`ra.runner` process as well as by
+the scheduler, so a job's output and result survive UI reconnects and
+Streamlit restarts.
+"""
+import json
+import os
+
+from . import config
+from . import fsutil
+
+
+JOBS_DIR = os.path.join(config.WORKSPACE_DIR, ".dora", "jobs")
+
+SPEC_FILE = "job.json"
+STATUS_FILE = "status.json"
+STATUS_LOCK_FILE = "status.lock"
+LOG_FILE = "output.log"
+
+
+def job_dir(job_id):
+    return os.path.join(JOBS_DIR, job_id)
+
+
+def log_path(job_id):
+    return os.path.join(job_dir(job_id), LOG_FILE)
+
+
+def _read_json(path):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+
+def write_spec(job_id, spec):
+    os.makedirs(job_dir(job_id), exist_ok=True)
+    fsutil.atomic_write_text(os.path.join(job_dir(job_id), SPEC_FILE), json.dumps(spec, indent=2))
+
+
+def read_spec(job_id):
+    return _read_json(os.path.join(job_dir(job_id), SPEC_FILE))
+
+
+def read_status(job_id):
+    return _read_json(os.path.join(job_dir(job_id), STATUS_FILE)) or {}
+
+
+def update_status(job_id, **fields):
+    """Merge `fields` into the job's status record."""
+    # The runner and the scheduler both update the record; without the lock one writer's fields could be lost
+    with fsutil.locked(os.path.join(job_dir(job_id), STATUS_LOCK_FILE)):
+        status = read_status(job_id)
+        status.update(fields)
+        fsutil.atomic_write_text(os.path.join(job_dir(job_id), STATUS_FILE), json.dumps(status, indent=2))
+    return status
+
+
+def append_log(job_id, text):
+    with open(log_path(job_id), "a", encoding="utf-8") as f:
+        f.write(text if text.endswith("\n") else text + "\n")
+
+
+def list_job_ids(limit=None):
+    """Job ids on disk, most recently created first."""
+    if not os.path.isdir(JOBS_DIR):
+        return []
+    entries = [e for e in os.scandir(JOBS_DIR) if e.is_dir() and os.path.isfile(os.path.join(e.path, SPEC_FILE))]
+    entries.sort(key=lambda e: e.stat().st_mtime, reverse=True)
+    return [e.name for e in entries[:limit]]
+
+
+def pid_alive(pid):
+    if not pid:
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
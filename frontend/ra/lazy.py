@@ -0,0 +1,26 @@
+"""Modules imported on first use.
+
+GitPython, the Mermaid component and the shadcn UI components (which pull in
+pandas) together add more than half a second to the first page render, yet
+many views and most headless commands never touch them. ``git = lazy.module("git")``
+binds a stand-in that imports the real module when an attribute is first
+accessed; after that every access is a ``sys.modules`` lookup.
+"""
+import importlib
+
+
+class _LazyModule:
+    def __init__(self, name):
+        self._name = name
+
+    def __getattr__(self, attribute):
+        # import_module() holds the import lock, so threads racing on the first access import once
+        return getattr(importlib.import_module(self._name), attribute)
+
+    def __repr__(self):
+        return f"<lazy module {self._name!r}>"
+
+
+def module(name):
+    """A stand-in for module `name` that imports it on first attribute access."""
+    return _LazyModule(name)
@@ -0,0 +1,110 @@
+"""Bounded log streaming for long-running jobs.
+
+A job's complete output lives in an append-only file on disk (written by the
+job runner). A :class:`LogStream` tails that file from a byte offset and keeps
+only the most recent lines in a ring buffer. Readers follow the stream with a
+line cursor and only receive lines appended since their last read; older
+lines are paged back in from the file on demand.
+"""
+import os
+import threading
+from collections import deque
+
+from . import config
+
+
+# A byte offset is remembered every INDEX_EVERY lines so history pages can be read without scanning the file
+INDEX_EVERY = 1000
+READ_CHUNK = 1 << 16
+
+
+class LogStream:
+    """Tail of an append-only log file: bounded in memory, complete on disk."""
+
+    def __init__(self, path, max_lines=None):
+        self.path = path
+        self._lines = deque(maxlen=max_lines or config.LOG_BUFFER_LINES)
+        self._total = 0
+        self._offsets = [0]
+        self._read_bytes = 0
+        self._lock = threading.Lock()
+
+    @property
+    def total_lines(self):
+        return self._total
+
+    @property
+    def size(self):
+        """Bytes of complete lines consumed from the file so far."""
+        return self._read_bytes
+
+    def refresh(self):
+        """Pick up lines appended to the file since the last call. Returns (at most a buffer's worth of) the new lines."""
+        new_lines = deque(maxlen=self._lines.maxlen)
+        with self._lock:
+            try:
+                f = open(self.path, "rb")
+            except FileNotFoundError:
+                return []
+            with f:
+                f.seek(self._read_bytes)
+                pending = b""
+                for chunk in iter(lambda: f.read(READ_CHUNK), b""):
+                    data = pending + chunk
+                    # A trailing partial line is left for the next refresh
+                    end = data.rfind(b"\n") + 1
+                    for raw in data[:end].splitlines(keepends=True):
+                        line = raw.decode("utf-8", errors="replace")
+                        self._lines.append(line)
+                        new_lines.append(line)
+                        self._total += 1
+                        self._read_bytes += len(raw)
+                        if self._total % INDEX_EVERY == 0:
+                            self._offsets.append(self._read_bytes)
+                    pending = data[end:]
+        return list(new_lines)
+
+    def since(self, cursor):
+        """Lines consumed after line number `cursor`.
+
+        Returns (lines, new_cursor, skipped) where `skipped` counts lines that
+        already fell out of the ring buffer and must be paged in from disk.
+        """
+        with self._lock:
+            first_buffered = self._total - len(self._lines)
+            start = max(cursor, first_buffered)
+            lines = list(self._lines)[start - first_buffered:] if start < self._total else []
+            return lines, self._total, start - cursor
+
+    def tail(self, count):
+        with self._lock:
+            return list(self._lines)[-count:] if count else []
+
+    def read_from(self, offset, max_bytes=READ_CHUNK):
+        """Raw output starting at byte `offset`, for clients resuming a stream. Returns (text, next_offset)."""
+        try:
+            with open(self.path, "rb") as f:
+                f.seek(offset)
+                data = f.read(max_bytes)
+        except FileNotFoundError:
+            return "", offset
+        return data.decode("utf-8", errors="replace"), offset + len(data)
+
+    def read_page(self, start_line, count):
+        """Read `count` lines starting at line number `start_line` from the log file."""
+        with self._lock:
+            block = min(start_line // INDEX_EVERY, len(self._offsets) - 1)
+            offset = self._offsets[block]
+        lines = []
+        if not os.path.exists(self.path):
+            return lines
+        with open(self.path, "rb") as f:
+            f.seek(offset)
+            line_no = block * INDEX_EVERY
+            for raw in f:
+                if line_no >= start_line + count:
+                    break
+                if line_no >= start_line:
+                    lines.append(raw.decode("utf-8", errors="replace"))
+                line_no += 1
+        return lines
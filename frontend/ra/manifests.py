@@ -0,0 +1,370 @@
+"""Dependency manifests and lockfiles, read without any package manager.
+
+:func:`scan` finds the manifests of the common ecosystems (npm, PyPI, Go,
+Cargo, Maven, Gradle, NuGet, Composer, RubyGems) among a repository's files
+and parses each into its declared dependencies, together with the version a
+lockfile in the same directory pins for each of them. Parsing is best effort:
+a file that cannot be read is reported with an error instead of dependencies.
+"""
+import json
+import logging
+import os
+import re
+import tomllib
+import xml.etree.ElementTree as ElementTree
+
+
+# Ecosystems
+NPM = "npm"
+PYPI = "pypi"
+GO = "go"
+CARGO = "cargo"
+MAVEN = "maven"
+GRADLE = "gradle"
+NUGET = "nuget"
+COMPOSER = "composer"
+RUBYGEMS = "rubygems"
+
+# Directories whose manifests belong to vendored or generated code
+SKIP_DIRS = {"node_modules", "vendor", "third_party", "site-packages", ".venv", "venv", "dist", "build", "target", "_ra"}
+
+MAX_DEPENDENCIES = 300
+
+
+class Dependency:
+    def __init__(self, name, spec=None, dev=False):
+        self.name = name
+        self.spec = spec or None
+        self.dev = dev
+        self.locked = None
+
+
+class Manifest:
+    """One manifest file and what it declares."""
+
+    def __init__(self, path, ecosystem, dependencies=None, lockfile=None, error=None, name=None):
+        self.path = path
+        self.ecosystem = ecosystem
+        # The name other projects depend on it by, when the manifest declares one
+        self.name = name
+        self.dependencies = dependencies or []
+        self.lockfile = lockfile
+        self.error = error
+
+
+def _normalize(ecosystem, name):
+    name = name.lower()
+    # PyPI treats runs of -, _ and . as the same character
+    return re.sub(r"[-_.]+", "-", name) if ecosystem == PYPI else name
+
+
+def _read_text(path):
+    with open(path, "r", encoding="utf-8", errors="replace") as f:
+        return f.read()
+
+
+def _read_json(path):
+    with open(path, "r", encoding="utf-8", errors="replace") as f:
+        return json.load(f)
+
+
+def _read_toml(path):
+    with open(path, "rb") as f:
+        return tomllib.load(f)
+
+
+def _xml_children(element, name):
+    # Namespace-agnostic lookup: pom.xml and .csproj files may or may not declare one
+    return [child for child in element.iter() if child.tag.rsplit("}", 1)[-1] == name]
+
+
+def _xml_text(element, name):
+    for child in element:
+        if child.tag.rsplit("}", 1)[-1] == name:
+            return (child.text or "").strip() or None
+    return None
+
+
+# --- Manifest parsers: path -> [Dependency] ---
+_REQUIREMENT_RE = re.compile(r"^\s*([A-Za-z0-9][A-Za-z0-9._-]*)\s*(\[[^\]]*\])?\s*(.*?)\s*(;.*)?$")
+
+
+def _requirement(line, dev=False):
+    match = _REQUIREMENT_RE.match(line)
+    return Dependency(match.group(1), match.group(3), dev=dev) if match else None
+
+
+def _parse_package_json(path):
+    data = _read_json(path)
+    return [Dependency(name, spec, dev=section == "devDependencies")
+            for section in ("dependencies", "devDependencies") for name, spec in (data.get(section) or {}).items()]
+
+
+def _parse_requirements(path):
+    dependencies = []
+    for line in _read_text(path).splitlines():
+        line = line.split(" #", 1)[0].strip()
+        if not line or line.startswith(("#", "-", "http:", "https:", "git+")):
+            continue
+        dependency = _requirement(line)
+        if dependency:
+            dependencies.append(dependency)
+    return dependencies
+
+
+def _poetry_dependencies(table, dev=False):
+    dependencies = []
+    for name, spec in (table or {}).items():
+        if name.lower() == "python":
+            continue
+        dependencies.append(Dependency(name, spec.get("version") if isinstance(spec, dict) else spec, dev=dev))
+    return dependencies
+
+
+def _parse_pyproject(path):
+    data = _read_toml(path)
+    project = data.get("project") or {}
+    dependencies = [d for d in map(_requirement, project.get("dependencies") or []) if d]
+    for extra in (project.get("optional-dependencies") or {}).values():
+        dependencies += [d for d in (_requirement(r, dev=True) for r in extra) if d]
+    poetry = (data.get("tool") or {}).get("poetry") or {}
+    dependencies += _poetry_dependencies(poetry.get("dependencies"))
+    dependencies += _poetry_dependencies(poetry.get("dev-dependencies"), dev=True)
+    for group in (poetry.get("group") or {}).values():
+        dependencies += _poetry_dependencies(group.get("dependencies"), dev=True)
+    return dependencies
+
+
+def _parse_pipfile(path):
+    data = _read_toml(path)
+    return (_poetry_dependencies(data.get("packages")) +
+            _poetry_dependencies(data.get("dev-packages"), dev=True))
+
+
+def _parse_go_mod(path):
+    dependencies, in_block = [], False
+    for line in _read_text(path).splitlines():
+        line = line.split("//", 1)[0].strip()
+        if line.startswith("require ("):
+            in_block = True
+            continue
+        if in_block and line == ")":
+            in_block = False
+            continue
+        if line.startswith("require "):
+            line = line[len("require "):]
+        elif not in_block:
+            continue
+        parts = line.split()
+        if len(parts) >= 2:
+            dependencies.append(Dependency(parts[0], parts[1]))
+    return dependencies
+
+
+def _parse_cargo_toml(path):
+    data = _read_toml(path)
+    return [Dependency(name, spec.get("version") if isinstance(spec, dict) else spec, dev=section != "dependencies")
+            for section in ("dependencies", "dev-dependencies", "build-dependencies")
+            for name, spec in (data.get(section) or {}).items()]
+
+
+def _parse_pom(path):
+    root = ElementTree.parse(path).getroot()
+    dependencies = []
+    for element in _xml_children(root, "dependency"):
+        group, artifact = _xml_text(element, "groupId"), _xml_text(element, "artifactId")
+        if artifact:
+            dependencies.append(Dependency(f"{group}:{artifact}" if group else artifact, _xml_text(element, "version"),
+                                           dev=_xml_text(element, "scope") == "test"))
+    return dependencies
+
+
+_GRADLE_RE = re.compile(
+    r"\b(implementation|api|compile|compileOnly|runtimeOnly|testImplementation|testCompile|kapt|annotationProcessor)"
+    r"\s*\(?\s*['\"]([^'\":\s]+:[^'\":\s]+)(?::([^'\"\s]+))?['\"]")
+
+
+def _parse_gradle(path):
+    return [Dependency(m.group(2), m.group(3), dev=m.group(1).startswith("test"))
+            for m in _GRADLE_RE.finditer(_read_text(path))]
+
+
+def _parse_csproj(path):
+    root = ElementTree.parse(path).getroot()
+    return [Dependency(element.get("Include"), element.get("Version") or _xml_text(element, "Version"))
+            for element in _xml_children(root, "PackageReference") if element.get("Include")]
+
+
+def _parse_packages_config(path):
+    root = ElementTree.parse(path).getroot()
+    return [Dependency(element.get("id"), element.get("version"))
+            for element in _xml_children(root, "package") if element.get("id")]
+
+
+def _parse_composer_json(path):
+    data = _read_json(path)
+    return [Dependency(name, spec, dev=section == "require-dev")
+            for section in ("require", "require-dev") for name, spec in (data.get(section) or {}).items()
+            if name != "php" and not name.startswith("ext-")]
+
+
+_GEM_RE = re.compile(r"""^\s*gem\s+['"]([^'"]+)['"](?:\s*,\s*['"]([^'"]+)['"])?""", re.MULTILINE)
+
+
+def _parse_gemfile(path):
+    return [Dependency(m.group(1), m.group(2)) for m in _GEM_RE.finditer(_read_text(path))]
+
+
+# --- Lockfile parsers: path -> {name: version} ---
+def _lock_package_json(path):
+    data = _read_json(path)
+    versions = {}
+    for key, info in (data.get("packages") or {}).items():
+        # lockfileVersion 2/3: "node_modules/<name>", nested ones pin transitive copies
+        if key.startswith("node_modules/") and "/node_modules/" not in key:
+            versions[key[len("node_modules/"):]] = info.get("version")
+    for name, info in (data.get("dependencies") or {}).items():
+        versions.setdefault(name, info.get("version"))
+    return versions
+
+
+_YARN_ENTRY_RE = re.compile(r'^"?(@?[^@\s"]+)@[^\n]*:\n\s+version:?\s+"?([^"\n]+)"?', re.MULTILINE)
+
+
+def _lock_yarn(path):
+    versions = {}
+    for match in _YARN_ENTRY_RE.finditer(_read_text(path)):
+        versions.setdefault(match.group(1), match.group(2))
+    return versions
+
+
+def _lock_toml_packages(path):
+    # poetry.lock, uv.lock and Cargo.lock all list [[package]] tables with name and version
+    return {package["name"]: package.get("version") for package in _read_toml(path).get("package", [])
+            if "name" in package}
+
+
+def _lock_pipfile(path):
+    data = _read_json(path)
+    return {name: (info.get("version") or "").lstrip("=")
+            for section in ("default", "develop") for name, info in (data.get(section) or {}).items()}
+
+
+def _lock_composer(path):
+    data = _read_json(path)
+    return {package["name"]: package.get("version")
+            for section in ("packages", "packages-dev") for package in data.get(section) or [] if "name" in package}
+
+
+_GEMFILE_LOCK_RE = re.compile(r"^    ([^\s(]+) \(([^)]+)\)$", re.MULTILINE)
+
+
+def _lock_gemfile(path):
+    return {m.group(1): m.group(2) for m in _GEMFILE_LOCK_RE.finditer(_read_text(path))}
+
+
+def _lock_nuget(path):
+    data = _read_json(path)
+    return {name: info.get("resolved")
+            for framework in (data.get("dependencies") or {}).values() for name, info in framework.items()}
+
+
+MANIFESTS = {
+    "package.json": (NPM, _parse_package_json),
+    "requirements.txt": (PYPI, _parse_requirements),
+    "pyproject.toml": (PYPI, _parse_pyproject),
+    "Pipfile": (PYPI, _parse_pipfile),
+    "go.mod": (GO, _parse_go_mod),
+    "Cargo.toml": (CARGO, _parse_cargo_toml),
+    "pom.xml": (MAVEN, _parse_pom),
+    "build.gradle": (GRADLE, _parse_gradle),
+    "build.gradle.kts": (GRADLE, _parse_gradle),
+    "packages.config": (NUGET, _parse_packages_config),
+    "composer.json": (COMPOSER, _parse_composer_json),
+    "Gemfile": (RUBYGEMS, _parse_gemfile),
+}
+
+LOCKFILES = {
+    "package-lock.json": (NPM, _lock_package_json),
+    "npm-shrinkwrap.json": (NPM, _lock_package_json),
+    "yarn.lock": (NPM, _lock_yarn),
+    "poetry.lock": (PYPI, _lock_toml_packages),
+    "uv.lock": (PYPI, _lock_toml_packages),
+    "Pipfile.lock": (PYPI, _lock_pipfile),
+    "Cargo.lock": (CARGO, _lock_toml_packages),
+    "composer.lock": (COMPOSER, _lock_composer),
+    "Gemfile.lock": (RUBYGEMS, _lock_gemfile),
+    "packages.lock.json": (NUGET, _lock_nuget),
+}
+
+
+def _project_name(path):
+    name = os.path.basename(path)
+    if name in ("package.json", "composer.json"):
+        return _read_json(path).get("name")
+    if name == "pyproject.toml":
+        data = _read_toml(path)
+        return (data.get("project") or {}).get("name") or ((data.get("tool") or {}).get("poetry") or {}).get("name")
+    if name == "Cargo.toml":
+        return (_read_toml(path).get("package") or {}).get("name")
+    if name == "go.mod":
+        match = re.search(r"^module\s+(\S+)", _read_text(path), re.MULTILINE)
+        return match.group(1) if match else None
+    if name == "pom.xml":
+        # Matched against the `group:artifact` names _parse_pom() gives dependencies; the group may be the parent's
+        root = ElementTree.parse(path).getroot()
+        parents = _xml_children(root, "parent")
+        group = _xml_text(root, "groupId") or (_xml_text(parents[0], "groupId") if parents else None)
+        artifact = _xml_text(root, "artifactId")
+        return f"{group}:{artifact}" if group and artifact else artifact
+    return None
+
+
+def _manifest_kind(name):
+    if name in MANIFESTS:
+        return MANIFESTS[name]
+    if name.endswith(".csproj") or name.endswith(".fsproj") or name.endswith(".vbproj"):
+        return NUGET, _parse_csproj
+    if name.startswith("requirements") and name.endswith(".txt"):
+        return PYPI, _parse_requirements
+    return None
+
+
+def is_manifest(path):
+    parts = path.split("/")
+    if SKIP_DIRS.intersection(parts[:-1]):
+        return False
+    return _manifest_kind(parts[-1]) is not None or parts[-1] in LOCKFILES
+
+
+def scan(root, paths):
+    """Parse the manifests among `paths` (relative to `root`, "/"-separated). Returns [Manifest], by path."""
+    paths = [p for p in paths if is_manifest(p)]
+    # The lockfiles of each directory, by ecosystem
+    lockfiles = {}
+    for path in paths:
+        name = path.rsplit("/", 1)[-1]
+        if name in LOCKFILES:
+            lockfiles.setdefault((os.path.dirname(path), LOCKFILES[name][0]), path)
+
+    manifests = []
+    for path in sorted(paths):
+        kind = _manifest_kind(path.rsplit("/", 1)[-1])
+        if kind is None:
+            continue
+        ecosystem, parse = kind
+        manifest = Manifest(path, ecosystem, lockfile=lockfiles.get((os.path.dirname(path), ecosystem)))
+        try:
+            manifest.dependencies = parse(os.path.join(root, path))[:MAX_DEPENDENCIES]
+            name = _project_name(os.path.join(root, path))
+            manifest.name = name if isinstance(name, str) else None
+            if manifest.lockfile:
+                locked = LOCKFILES[manifest.lockfile.rsplit("/", 1)[-1]][1](os.path.join(root, manifest.lockfile))
+                versions = {_normalize(ecosystem, name): version for name, version in locked.items()}
+                for dependency in manifest.dependencies:
+                    dependency.locked = versions.get(_normalize(ecosystem, dependency.name))
+        except (OSError, ValueError, KeyError, TypeError, AttributeError, ElementTree.ParseError) as e:
+            logging.warning(f"Cannot parse {path} in {root}: {e}")
+            manifest.error = str(e)
+        manifests.append(manifest)
+    return manifests
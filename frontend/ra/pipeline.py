@@ -0,0 +1,243 @@
+"""Dependency-aware analysis pipelines ("Run full assessment").
+
+A pipeline runs a set of commands from ``commands.md`` against one target as
+a DAG built from their ``needs=`` declarations. Every stage whose
+dependencies are satisfied is planned through :mod:`ra.analysis` and queued
+on the shared :class:`~ra.jobs.JobScheduler` straight away, so independent
+stages run concurrently and dependents start as soon as their inputs exist.
+A stage whose dependency fails, is cancelled or is blocked is not run.
+
+Stages are advanced from the scheduler's completion hook, so pipelines keep
+going without any browser session attached.
+"""
+import logging
+import os
+import threading
+import time
+import uuid
+
+from . import analysis as ra_analysis
+from . import docs
+from .jobs import SUCCEEDED, FAILED, CANCELLED, INTERACTIVE
+
+
+PENDING = "pending"    # Waiting for dependencies
+STARTING = "starting"  # Being planned / submitted
+QUEUED = "queued"      # Submitted; the job's own status tells whether it is running yet
+REUSED = "reused"      # Report already up to date, restored from cache or unchanged
+BLOCKED = "blocked"    # A dependency did not succeed
+
+DONE_STATES = (SUCCEEDED, REUSED)
+FINISHED_STATES = (SUCCEEDED, REUSED, FAILED, CANCELLED, BLOCKED)
+
+
+def with_dependencies(commands, graph, registry):
+    """`commands` plus everything they transitively need, in commands.md order."""
+    wanted = {c.name for c in commands}
+    frontier = list(wanted)
+    while frontier:
+        for name in graph.get(frontier.pop(), []):
+            if name not in wanted:
+                wanted.add(name)
+                frontier.append(name)
+    return [c for c in registry.commands() if c.name in wanted]
+
+
+def topological_order(graph):
+    """Stage names so that every stage comes after its dependencies. Raises ValueError on a cycle."""
+    order, visiting, visited = [], set(), set()
+
+    def visit(name, path):
+        if name in visited:
+            return
+        if name in visiting:
+            raise ValueError(f"Dependency cycle in commands.md: {' -> '.join(path + [name])}")
+        visiting.add(name)
+        for dependency in graph.get(name, []):
+            visit(dependency, path + [name])
+        visiting.discard(name)
+        visited.add(name)
+        order.append(name)
+
+    for name in graph:
+        visit(name, [])
+    return order
+
+
+class Stage:
+    """One command of a pipeline."""
+
+    def __init__(self, command, needs):
+        self.command = command
+        self.needs = needs
+        self.status = PENDING
+        self.outcome = None
+        self.job = None
+        self.error = None
+        self.docs = None
+        self.started_at = None
+        self.finished_at = None
+
+    @property
+    def name(self):
+        return self.command.name
+
+    @property
+    def current_status(self):
+        # A submitted stage follows its job (queued -> running) until the completion hook settles it
+        if self.status == QUEUED and self.job is not None:
+            return self.job.status
+        return self.status
+
+    def summary(self):
+        result = {"command": self.name, "output_file": self.command.output_file, "needs": self.needs,
+                  "status": self.current_status, "outcome": self.outcome,
+                  "job_id": self.job.id if self.job else None}
+        if self.started_at and self.finished_at:
+            result["duration"] = round(self.finished_at - self.started_at, 3)
+        if self.error:
+            result["error"] = self.error
+        if self.docs:
+            result["docs"] = self.docs
+        return result
+
+
+class Pipeline:
+    """All stages of one "full assessment" of a target."""
+
+    def __init__(self, target, target_path, stages):
+        self.id = uuid.uuid4().hex[:12]
+        self.target = target
+        self.target_path = target_path
+        self.stages = stages  # name -> Stage, in dependency order
+        self.created_at = time.time()
+        self.finished_at = None
+
+    @property
+    def is_active(self):
+        return any(stage.status not in FINISHED_STATES for stage in self.stages.values())
+
+    @property
+    def succeeded(self):
+        return all(stage.status in DONE_STATES for stage in self.stages.values())
+
+    def __repr__(self):
+        return f"<Pipeline {self.id} on {self.target!r} ({len(self.stages)} stages)>"
+
+
+class PipelineRunner:
+    """Starts pipelines and advances them as the scheduler finishes their jobs.
+
+    Register :meth:`on_job_finished` as (part of) the scheduler's completion hook.
+    """
+
+    def __init__(self, scheduler, registry, build_docs=True, priority=INTERACTIVE):
+        self.scheduler = scheduler
+        self.registry = registry
+        self.priority = priority
+        # Build the static docs site after a docs stage, like the UI does after "Base Documentation"
+        self.build_docs = build_docs
+        self._pipelines = {}
+        # job id -> [(pipeline, stage)]; several pipelines may join the same single-flight job
+        self._by_job = {}
+        self._lock = threading.Lock()
+
+    # --- Public API ---
+    def start(self, commands, target, target_path):
+        """Run `commands` (plus whatever they need) on a target. Raises ValueError on a dependency cycle."""
+        graph = self.registry.dependencies()
+        commands = with_dependencies(commands, graph, self.registry)
+        by_name = {c.name: c for c in commands}
+        names = list(by_name)  # commands.md order, so independent stages are queued in the order they are listed
+        order = topological_order({name: [d for d in graph.get(name, []) if d in names] for name in names})
+        stages = {name: Stage(by_name[name], [d for d in graph.get(name, []) if d in names]) for name in order}
+        pipeline = Pipeline(target, target_path, stages)
+        with self._lock:
+            self._pipelines[pipeline.id] = pipeline
+        logging.info(f"Starting pipeline {pipeline.id} on {target}: {', '.join(order)}")
+        self._advance(pipeline)
+        return pipeline
+
+    def get(self, pipeline_id):
+        with self._lock:
+            return self._pipelines.get(pipeline_id)
+
+    def pipelines(self):
+        with self._lock:
+            return sorted(self._pipelines.values(), key=lambda p: p.created_at, reverse=True)
+
+    def active_for(self, target):
+        return next((p for p in self.pipelines() if p.target == target and p.is_active), None)
+
+    def on_job_finished(self, job):
+        with self._lock:
+            entries = self._by_job.pop(job.id, [])
+        for pipeline, stage in entries:
+            if job.status == SUCCEEDED:
+                self._publish(stage, pipeline)
+            stage.status = job.status
+            stage.finished_at = job.finished_at
+            self._advance(pipeline)
+
+    # --- Internals ---
+    def _ready_stages(self, pipeline):
+        # Under the lock: claim every pending stage whose dependencies are settled
+        ready = []
+        for stage in pipeline.stages.values():
+            if stage.status != PENDING:
+                continue
+            dependency_states = [pipeline.stages[name].status for name in stage.needs]
+            if any(state in (FAILED, CANCELLED, BLOCKED) for state in dependency_states):
+                stage.status = BLOCKED
+                stage.error = "a dependency did not succeed"
+            elif all(state in DONE_STATES for state in dependency_states):
+                stage.status = STARTING
+                ready.append(stage)
+        return ready
+
+    def _advance(self, pipeline):
+        while True:
+            with self._lock:
+                # Stages are in dependency order, so a blocked stage also blocks its dependents in one pass
+                ready = self._ready_stages(pipeline)
+            if not ready:
+                break
+            for stage in ready:
+                self._start_stage(pipeline, stage)
+        if not pipeline.is_active and pipeline.finished_at is None:
+            pipeline.finished_at = time.time()
+            logging.info(f"Pipeline {pipeline.id} on {pipeline.target} finished "
+                         f"({'succeeded' if pipeline.succeeded else 'with failures'})")
+
+    def _start_stage(self, pipeline, stage):
+        stage.started_at = time.time()
+        try:
+            plan = ra_analysis.plan_analysis(stage.command, pipeline.target_path, scheduler=self.scheduler)
+            stage.outcome = plan.outcome
+            if plan.outcome in (ra_analysis.RUN, ra_analysis.IN_FLIGHT):
+                job = ra_analysis.submit(self.scheduler, plan, pipeline.target, priority=self.priority)
+                with self._lock:
+                    stage.job = job
+                    stage.status = QUEUED
+                    self._by_job.setdefault(job.id, []).append((pipeline, stage))
+                if not job.is_active:
+                    # Finished before it was registered, so the completion hook found nothing to advance
+                    self.on_job_finished(job)
+                return
+            self._publish(stage, pipeline)
+            stage.status = REUSED
+        except Exception as e:
+            logging.error(f"Pipeline {pipeline.id}: stage {stage.name!r} failed to start: {e}")
+            stage.error = str(e)
+            stage.status = FAILED
+        stage.finished_at = time.time()
+
+    def _publish(self, stage, pipeline):
+        if not (self.build_docs and stage.command.is_docs):
+            return
+        install_error = docs.ensure_toolchain()
+        if install_error:
+            stage.docs = {"status": FAILED, "error": install_error}
+            return
+        mode, build_error = docs.build_site(os.path.join(pipeline.target_path, "_ra"))
+        stage.docs = {"status": FAILED if build_error else SUCCEEDED, "mode": mode, "error": build_error}
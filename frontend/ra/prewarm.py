@@ -0,0 +1,299 @@
+"""Background refresh of reports whose repository moved upstream.
+
+Interactive users should find reports for the current upstream commit rather
+than start a run and wait. :class:`Prewarmer` checks every workspace repository
+that has reports with ``git ls-remote`` - one round trip per repository, no
+objects transferred - and compares the remote branch with the checkout's HEAD.
+Inside the configured off-peak windows (``config.PREWARM_WINDOWS``) it updates
+the changed repositories through the clone manager and re-runs the commands
+whose reports they already have, as pipelines at batch priority, so
+interactive jobs are still admitted first. Report views are counted
+(:func:`record_view`, decayed over ``config.PREWARM_VIEW_HALF_LIFE``) and the
+most viewed repositories are refreshed first.
+
+Evicted repositories, repositories with work in flight and checkouts not on
+a branch tracking ``origin`` are skipped.
+"""
+import json
+import logging
+import os
+import threading
+import time
+
+from . import commands as ra_commands
+from . import config
+from . import fsutil
+from . import lazy
+from . import report_cache
+from . import storage
+from . import telemetry
+from .clone import CloneManager, SUCCEEDED
+from .commands import CommandRegistry
+from .jobs import JobScheduler, BATCH
+from .pipeline import PipelineRunner
+from .search import SearchIndex
+from .workspace import WorkspaceIndex, EVICTED_FILE
+
+
+git = lazy.module("git")
+
+VIEWS_FILE = os.path.join(config.WORKSPACE_DIR, ".dora", "views.json")
+# Views of the same repository closer together than this count once
+VIEW_RESOLUTION = 60
+
+_views = {}
+_views_lock = threading.Lock()
+
+
+# --- View counting ---
+def _read_views():
+    try:
+        with open(VIEWS_FILE, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _decayed(score, since, now):
+    return score * 0.5 ** (max(now - since, 0) / config.PREWARM_VIEW_HALF_LIFE)
+
+
+def record_view(name):
+    """Count a view of one of `name`'s reports."""
+    now = time.time()
+    with _views_lock:
+        if now - _views.get(name, 0) < VIEW_RESOLUTION:
+            return
+        _views[name] = now
+        try:
+            # {name: [score, timestamp of the score]}, merged under the file lock so views counted by other
+            # processes are kept
+            with fsutil.locked(VIEWS_FILE + ".lock"):
+                recorded = _read_views()
+                score, since = recorded.get(name, (0.0, now))
+                recorded[name] = [round(_decayed(score, since, now) + 1, 4), round(now)]
+                fsutil.atomic_write_text(VIEWS_FILE, json.dumps(recorded))
+        except OSError as e:
+            logging.warning(f"Could not record a view of {name}: {e}")
+
+
+def view_scores():
+    """{name: recent views}, each view weighing half as much per half-life since it happened."""
+    now = time.time()
+    return {name: _decayed(score, since, now) for name, (score, since) in _read_views().items()}
+
+
+# --- Off-peak windows ---
+def parse_windows(text):
+    """"22:00-06:00,12:00-13:00" -> [(1320, 360), (720, 780)] in minutes after midnight. Raises ValueError."""
+    windows = []
+    for item in text.split(","):
+        if not item.strip():
+            continue
+        start, _, end = item.partition("-")
+        bounds = []
+        for value in (start, end):
+            hours, _, minutes = value.strip().partition(":")
+            bounds.append(int(hours) * 60 + int(minutes or 0))
+        windows.append(tuple(bounds))
+    return windows
+
+
+def in_window(windows, now=None):
+    """Whether local time `now` falls in one of `windows` (no windows: always). Windows may wrap midnight."""
+    if not windows:
+        return True
+    local = time.localtime(now)
+    minute = local.tm_hour * 60 + local.tm_min
+    return any(start <= minute < end if start <= end else (minute >= start or minute < end) for start, end in windows)
+
+
+# --- Remote check ---
+def remote_change(path, timeout=None):
+    """(branch, local HEAD, remote head) of the branch the checkout tracks, or None if it tracks none.
+
+    Raises git.GitError if the remote cannot be reached.
+    """
+    repo = git.Repo(path)
+    try:
+        if repo.head.is_detached or repo.active_branch.tracking_branch() is None:
+            return None
+        tracking = repo.active_branch.tracking_branch()
+        if tracking.remote_name != "origin":
+            return None
+        local = repo.head.commit.hexsha
+        # Never wait for credentials: an unreachable remote just fails this check
+        output = repo.git.ls_remote("origin", f"refs/heads/{tracking.remote_head}", env={"GIT_TERMINAL_PROMPT": "0"},
+                                    kill_after_timeout=timeout or config.PREWARM_LS_REMOTE_TIMEOUT)
+        remote = output.split()[0] if output.strip() else None
+        if remote and remote != local:
+            try:
+                # Local commits not pushed yet: the remote head is already part of HEAD
+                if repo.is_ancestor(remote, local):
+                    remote = local
+            except git.GitCommandError:
+                pass  # Not fetched yet, so certainly new
+    finally:
+        repo.close()
+    return tracking.remote_head, local, remote
+
+
+class Stale:
+    """A repository whose upstream branch moved past the commit its reports were generated for."""
+
+    def __init__(self, name, path, branch, local, remote, views, reports):
+        self.name = name
+        self.path = path
+        self.branch = branch
+        self.local = local
+        self.remote = remote
+        self.views = views
+        self.reports = reports
+
+    def as_dict(self):
+        return {"target": self.name, "branch": self.branch, "local": self.local[:12], "remote": self.remote[:12],
+                "views": round(self.views, 1), "reports": self.reports}
+
+
+class Prewarmer:
+    """Refreshes the reports of repositories that changed upstream, in off-peak windows.
+
+    Refreshes run as batch priority pipelines on the shared scheduler; register
+    :meth:`on_job_finished` as part of its completion hook. `is_busy(name)` adds
+    in-process knowledge (queued jobs, active clones) to the skip check.
+    """
+
+    def __init__(self, scheduler, registry, clones, index, is_busy=None, windows=None, max_repos=None):
+        self.registry = registry
+        self.clones = clones
+        self.index = index
+        self.is_busy = is_busy
+        self.windows = parse_windows(config.PREWARM_WINDOWS if windows is None else windows)
+        self.max_repos = config.PREWARM_MAX_REPOS if max_repos is None else max_repos
+        self.pipelines = PipelineRunner(scheduler, registry, priority=BATCH)
+        self.last_check = None
+        self._lock = threading.Lock()
+        self._thread = None
+
+    # --- Public API ---
+    def check(self):
+        """Repositories with reports whose upstream branch moved, most viewed first, and per-repository errors."""
+        scores = view_scores()
+        accessed = storage.last_access()
+        report_files = {c.output_file for c in self.registry.reports(ra_commands.REPO)}
+        stale, errors = [], {}
+        for entry in self.index.repos():
+            reports = sorted(f for f in entry.reports if f in report_files)
+            if entry.evicted or not reports or os.path.exists(os.path.join(entry.path, EVICTED_FILE)):
+                continue
+            try:
+                change = remote_change(entry.path)
+            except (git.GitError, ValueError, OSError) as e:
+                errors[entry.name] = str(e).strip().splitlines()[-1] if str(e).strip() else type(e).__name__
+                continue
+            if change is None or change[2] is None or change[1] == change[2]:
+                continue
+            branch, local, remote = change
+            stale.append(Stale(entry.name, entry.path, branch, local, remote, scores.get(entry.name, 0.0), reports))
+        stale.sort(key=lambda s: (-s.views, -accessed.get(s.name, 0), s.name))
+        return stale, errors
+
+    def run_once(self, dry_run=False, ignore_windows=False):
+        """One check; inside a window (or with `ignore_windows`) also refresh the top stale repositories.
+
+        Returns the check summary, also kept as :attr:`last_check`. Blocks while the updates run.
+        """
+        with self._lock:
+            started_at = time.monotonic()
+            stale, errors = self.check()
+            open_window = ignore_windows or in_window(self.windows)
+            refreshed = []
+            if open_window and not dry_run:
+                for candidate in stale:
+                    if len(refreshed) >= self.max_repos:
+                        break
+                    if self._busy(candidate.name):
+                        continue
+                    pipeline = self._refresh(candidate)
+                    if pipeline is not None:
+                        refreshed.append((candidate, pipeline))
+            self.last_check = {
+                "checked_at": time.time(),
+                "in_window": open_window,
+                "stale": [s.as_dict() for s in stale],
+                "refreshed": [{"target": s.name, "pipeline": p.id} for s, p in refreshed],
+                "errors": errors,
+            }
+            telemetry.record(telemetry.PREWARM, time.monotonic() - started_at, stale=len(stale),
+                             refreshed=len(refreshed), errors=len(errors) or None)
+            if stale:
+                logging.info(f"Prewarm: {len(stale)} repositories changed upstream, {len(refreshed)} refreshed")
+            return self.last_check, [p for _, p in refreshed]
+
+    def on_job_finished(self, job):
+        self.pipelines.on_job_finished(job)
+
+    def start(self, interval=None):
+        """Run run_once() every `interval` seconds on a daemon thread (no-op unless prewarming is enabled)."""
+        if not config.PREWARM or self._thread is not None:
+            return
+        interval = config.PREWARM_INTERVAL if interval is None else interval
+        self._thread = threading.Thread(target=self._loop, args=(interval,), name="ra-prewarm", daemon=True)
+        self._thread.start()
+
+    # --- Internals ---
+    def _loop(self, interval):
+        while True:
+            try:
+                self.run_once()
+            except Exception as e:
+                logging.error(f"Prewarm check failed: {e}")
+            time.sleep(interval)
+
+    def _busy(self, name):
+        return self.pipelines.active_for(name) is not None or bool(self.is_busy and self.is_busy(name))
+
+    def _refresh(self, candidate):
+        task = self.clones.update(candidate.path)
+        task.wait()
+        self.index.invalidate(candidate.name)
+        if task.status != SUCCEEDED:
+            logging.warning(f"Prewarm: update of {candidate.name} failed: {task.error}")
+            return None
+        commands = [c for c in self.registry.reports(ra_commands.REPO) if c.output_file in candidate.reports]
+        try:
+            return self.pipelines.start(commands, candidate.name, candidate.path)
+        except ValueError as e:
+            logging.error(f"Prewarm: cannot refresh {candidate.name}: {e}")
+            return None
+
+
+# --- Command line ---
+def add_arguments(parser):
+    parser.add_argument("--dry-run", action="store_true", help="only print which repositories changed upstream")
+    parser.add_argument("--ignore-windows", action="store_true", help="refresh now, even outside DORA_PREWARM_WINDOWS")
+    parser.add_argument("--no-docs", action="store_true", help="Don't build the documentation site after docs commands")
+
+
+def main(args):
+    registry = CommandRegistry()
+    if not registry.commands() and registry.error:
+        raise SystemExit(registry.error)
+    search_index = SearchIndex()
+
+    def on_job_finished(job):
+        report_cache.on_job_finished(job)
+        prewarmer.on_job_finished(job)
+        search_index.update(job.target)
+        storage.touch(job.target)
+
+    scheduler = JobScheduler(on_finish=on_job_finished, recover=False)
+    prewarmer = Prewarmer(scheduler, registry, CloneManager(), WorkspaceIndex())
+    prewarmer.pipelines.build_docs = not args.no_docs
+    summary, pipelines = prewarmer.run_once(dry_run=args.dry_run, ignore_windows=args.ignore_windows)
+    while any(pipeline.is_active for pipeline in pipelines):
+        time.sleep(1.0)
+    summary["refreshed"] = [{"target": p.target, "succeeded": p.succeeded,
+                             "stages": [s.summary() for s in p.stages.values()]} for p in pipelines]
+    print(json.dumps(summary, indent=2))
+    return 1 if any(not p.succeeded for p in pipelines) else 0
@@ -0,0 +1,148 @@
+"""Content-addressed cache of generated reports.
+
+A report is keyed by the revision it was generated from (the repository HEAD
+commit, or a hash of ``usecase.md`` for use cases), a hash of the command
+template from ``commands.md`` and :data:`PROMPT_VERSION`. Changing any of them
+changes the key, so stale reports are never served, while two clones of the
+same commit share one cache entry.
+
+Every target directory keeps a ``.ra-reports.json`` provenance file recording
+which key each of its reports was generated for.
+"""
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+
+from . import config
+from . import fsutil
+from . import lazy
+from .jobs import SUCCEEDED
+from .workspace import LOCKS_DIR
+
+
+git = lazy.module("git")
+
+# Bump when the prompt scripts behind the commands change in a way that should invalidate reports.
+PROMPT_VERSION = os.environ.get("DORA_PROMPT_VERSION", "1")
+
+CACHE_DIR = os.path.join(config.WORKSPACE_DIR, ".dora", "report-cache")
+PROVENANCE_FILE = ".ra-reports.json"
+
+# Jobs on the same target finish on different worker threads and processes (the UI, the batch CLI, prewarm);
+# serialize the read-modify-write of its provenance, with a file lock outside the checkout
+_provenance_lock = threading.Lock()
+
+
+def _provenance_lock_path(target_path):
+    return os.path.join(LOCKS_DIR, f"{os.path.basename(os.path.normpath(target_path))}.reports.lock")
+
+
+def normalize_output(output_file):
+    # commands.md is markdown, so underscores may be escaped (e.g. `\_ra/mkdocs.yml`)
+    return output_file.replace("\\_", "_") if output_file else output_file
+
+
+def artifact_root(output_file):
+    """The file or top-level directory that makes up a report, e.g. `_ra` for `_ra/mkdocs.yml`."""
+    return normalize_output(output_file).split("/", 1)[0]
+
+
+def revision(target_path):
+    """HEAD commit of a repository, or a content hash for a use case. None if unknown."""
+    usecase_md = os.path.join(target_path, "usecase.md")
+    if os.path.isfile(usecase_md):
+        with open(usecase_md, "rb") as f:
+            return "usecase:" + hashlib.sha256(f.read()).hexdigest()
+    try:
+        return git.Repo(target_path).head.commit.hexsha
+    except (git.InvalidGitRepositoryError, git.NoSuchPathError, ValueError) as e:
+        logging.warning(f"Cannot determine revision of {target_path}: {e}")
+        return None
+
+
+def template_hash(command_template):
+    return hashlib.sha256(command_template.encode("utf-8")).hexdigest()
+
+
+def report_key(rev, command_template):
+    if rev is None:
+        return None
+    material = "\0".join([rev, template_hash(command_template), PROMPT_VERSION])
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+# --- Provenance ---
+def load_provenance(target_path):
+    try:
+        with open(os.path.join(target_path, PROVENANCE_FILE), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+def record_provenance(target_path, output_file, key, rev, command_template):
+    with _provenance_lock, fsutil.locked(_provenance_lock_path(target_path)):
+        provenance = load_provenance(target_path)
+        provenance[normalize_output(output_file)] = {
+            "key": key,
+            "revision": rev,
+            "template_hash": template_hash(command_template),
+            "prompt_version": PROMPT_VERSION,
+            "generated_at": time.time(),
+        }
+        fsutil.atomic_write_text(os.path.join(target_path, PROVENANCE_FILE), json.dumps(provenance, indent=2))
+
+
+def is_fresh(target_path, output_file, key):
+    """True if the report in `target_path` exists and was generated for `key`."""
+    output_file = normalize_output(output_file)
+    if key is None or not os.path.exists(os.path.join(target_path, output_file)):
+        return False
+    return load_provenance(target_path).get(output_file, {}).get("key") == key
+
+
+# --- Cache store ---
+def _entry_path(key, output_file):
+    return os.path.join(CACHE_DIR, key[:2], key, artifact_root(output_file))
+
+
+def lookup(key, output_file):
+    if key is None:
+        return None
+    path = _entry_path(key, output_file)
+    return path if os.path.exists(path) else None
+
+
+def store(key, rev, command_template, target_path, output_file):
+    """Copy a freshly generated report into the cache and record its provenance."""
+    if key is None:
+        return False
+    source = os.path.join(target_path, artifact_root(output_file))
+    if not os.path.exists(os.path.join(target_path, normalize_output(output_file))):
+        logging.warning(f"Expected report {output_file} was not produced in {target_path}; not caching.")
+        return False
+    fsutil.atomic_copy(source, _entry_path(key, output_file))
+    record_provenance(target_path, output_file, key, rev, command_template)
+    logging.info(f"Cached {output_file} for {target_path} under key {key[:12]}")
+    return True
+
+
+def restore(key, rev, command_template, target_path, output_file):
+    """Serve a cache hit into `target_path`. Returns False on a miss."""
+    cached = lookup(key, output_file)
+    if cached is None:
+        return False
+    fsutil.atomic_copy(cached, os.path.join(target_path, artifact_root(output_file)))
+    record_provenance(target_path, output_file, key, rev, command_template)
+    logging.info(f"Restored {output_file} into {target_path} from cache key {key[:12]}")
+    return True
+
+
+def on_job_finished(job):
+    """Scheduler completion hook: cache the report a successful job produced."""
+    meta = job.meta
+    if job.status == SUCCEEDED and job.output_file and meta.get("cache_key"):
+        store(meta["cache_key"], meta.get("revision"), meta.get("command_template", ""), job.target_path, job.output_file)
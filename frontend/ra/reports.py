@@ -0,0 +1,239 @@
+"""Parsed, paginated and cached markdown reports for the Results views.
+
+A report is parsed once per file version (mtime and size): it is split into
+sections at ``#``/``##`` headings outside code fences, ````mermaid`` blocks
+are separated out, and sections are grouped into pages of about
+``config.REPORT_PAGE_CHARS`` characters so only the page being viewed is
+rendered.
+
+Mermaid diagrams are rendered to SVG once with the mermaid CLI (``mmdc``) when
+it is installed, and kept as ``workspace/.dora/mermaid/<hash>.svg`` keyed by
+the diagram source, so an unchanged diagram is never rendered again. Rendering
+happens in the background; until an SVG exists, or without the CLI, the view
+falls back to rendering the diagram in the browser.
+"""
+import base64
+import hashlib
+import logging
+import os
+import re
+import shlex
+import shutil
+import subprocess
+import tempfile
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from . import config
+from . import fsutil
+
+
+MERMAID_DIR = os.path.join(config.WORKSPACE_DIR, ".dora", "mermaid")
+
+MARKDOWN = "markdown"
+MERMAID = "mermaid"
+
+REPORT_CACHE_ENTRIES = 64
+SVG_CACHE_ENTRIES = 256
+
+_HEADING_RE = re.compile(r"^(#{1,2})\s+(.*?)[\s#]*$")
+_FENCE_RE = re.compile(r"^\s*(`{3,}|~{3,})\s*([\w+-]*)")
+
+
+class Part:
+    """A run of markdown, or one Mermaid diagram."""
+
+    def __init__(self, kind, text):
+        self.kind = kind
+        self.text = text
+        self.digest = hashlib.sha256(text.strip().encode("utf-8")).hexdigest() if kind == MERMAID else None
+
+
+class Page:
+    def __init__(self, title, parts):
+        self.title = title
+        self.parts = parts
+
+
+class Report:
+    """One version of a report file, ready to render page by page."""
+
+    def __init__(self, path, version, pages):
+        self.path = path
+        self.version = version
+        self.pages = pages
+
+    @property
+    def diagrams(self):
+        return [part for page in self.pages for part in page.parts if part.kind == MERMAID]
+
+
+def _is_closing_fence(line, fence):
+    stripped = line.strip()
+    return stripped.startswith(fence) and not stripped.strip(fence[0])
+
+
+def parse_sections(text):
+    """Split markdown into [(title, [Part, ...]), ...] at top-level headings outside code fences."""
+    sections = [[None, []]]
+    buffer, diagram, fence = [], None, None
+
+    def flush():
+        if "".join(buffer).strip():
+            sections[-1][1].append(Part(MARKDOWN, "".join(buffer)))
+        buffer.clear()
+
+    for line in text.splitlines(keepends=True):
+        if fence is not None:
+            if _is_closing_fence(line, fence):
+                fence = None
+                if diagram is not None:
+                    sections[-1][1].append(Part(MERMAID, "".join(diagram)))
+                    diagram = None
+                    continue
+            elif diagram is not None:
+                diagram.append(line)
+                continue
+            buffer.append(line)
+            continue
+        fence_match = _FENCE_RE.match(line)
+        if fence_match:
+            fence = fence_match.group(1)
+            if fence_match.group(2).lower() == MERMAID:
+                flush()
+                diagram = []
+                continue
+        else:
+            heading = _HEADING_RE.match(line)
+            if heading:
+                if buffer or sections[-1][1] or sections[-1][0] is not None:
+                    flush()
+                    sections.append([None, []])
+                sections[-1][0] = heading.group(2)
+        buffer.append(line)
+
+    if diagram is not None:
+        # Unterminated diagram: show it as the text it is
+        buffer.extend(["```mermaid\n"] + diagram)
+    flush()
+    return [(title, parts) for title, parts in sections if parts]
+
+
+def paginate(sections, page_chars=None):
+    """Group sections into pages of about `page_chars` characters; a longer section gets a page of its own."""
+    page_chars = page_chars or config.REPORT_PAGE_CHARS
+    pages, parts, title, size = [], [], None, 0
+    for section_title, section_parts in sections:
+        section_size = sum(len(part.text) for part in section_parts)
+        if parts and size + section_size > page_chars:
+            pages.append(Page(title, parts))
+            parts, title, size = [], None, 0
+        parts.extend(section_parts)
+        title = title or section_title
+        size += section_size
+    if parts or not pages:
+        pages.append(Page(title, parts))
+    return pages
+
+
+class MermaidRenderer:
+    """Renders diagrams to SVG files in the background with the mermaid CLI, once per diagram source."""
+
+    def __init__(self, command=None):
+        self.command = shlex.split(command if command is not None else config.MERMAID_CLI)
+        self.available = bool(self.command) and shutil.which(self.command[0]) is not None
+        # mmdc starts a headless browser per call; one at a time keeps that off the interactive path
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="ra-mermaid")
+        self._pending = set()
+        self._uris = OrderedDict()
+        self._lock = threading.Lock()
+
+    def svg_path(self, part):
+        return os.path.join(MERMAID_DIR, f"{part.digest}.svg")
+
+    def _failed_path(self, part):
+        return os.path.join(MERMAID_DIR, f"{part.digest}.failed")
+
+    def image_uri(self, part):
+        """A data URI of the pre-rendered SVG, or None if it is not available (yet)."""
+        with self._lock:
+            if part.digest in self._uris:
+                self._uris.move_to_end(part.digest)
+                return self._uris[part.digest]
+        try:
+            with open(self.svg_path(part), "rb") as f:
+                uri = "data:image/svg+xml;base64," + base64.b64encode(f.read()).decode("ascii")
+        except FileNotFoundError:
+            return None
+        with self._lock:
+            self._uris[part.digest] = uri
+            while len(self._uris) > SVG_CACHE_ENTRIES:
+                self._uris.popitem(last=False)
+        return uri
+
+    def prerender(self, parts):
+        """Queue the diagrams that have neither an SVG nor a recorded failure."""
+        if not self.available:
+            return
+        for part in parts:
+            with self._lock:
+                if part.digest in self._pending:
+                    continue
+                if os.path.exists(self.svg_path(part)) or os.path.exists(self._failed_path(part)):
+                    continue
+                self._pending.add(part.digest)
+            self._executor.submit(self._render, part)
+
+    def _render(self, part):
+        try:
+            os.makedirs(MERMAID_DIR, exist_ok=True)
+            with tempfile.TemporaryDirectory(dir=MERMAID_DIR, prefix=".tmp-") as tmp:
+                source, output = os.path.join(tmp, "diagram.mmd"), os.path.join(tmp, "diagram.svg")
+                with open(source, "w", encoding="utf-8") as f:
+                    f.write(part.text)
+                try:
+                    result = subprocess.run([*self.command, "-i", source, "-o", output, "-b", "transparent"],
+                                            capture_output=True, text=True, timeout=config.MERMAID_TIMEOUT)
+                    error = None if result.returncode == 0 and os.path.exists(output) else result.stderr or "no output"
+                except (OSError, subprocess.TimeoutExpired) as e:
+                    error = str(e)
+                if error is None:
+                    os.replace(output, self.svg_path(part))
+                else:
+                    # Not retried until the diagram changes; the browser renders it (or shows the syntax error)
+                    logging.warning(f"Mermaid pre-rendering failed for diagram {part.digest[:12]}: {error.strip()[:500]}")
+                    fsutil.atomic_write_text(self._failed_path(part), error)
+        finally:
+            with self._lock:
+                self._pending.discard(part.digest)
+
+
+class ReportRenderer:
+    """Process-wide cache of parsed reports, re-parsed only when the file changes."""
+
+    def __init__(self, max_entries=REPORT_CACHE_ENTRIES, mermaid=None):
+        self.mermaid = mermaid or MermaidRenderer()
+        self.max_entries = max_entries
+        self._reports = OrderedDict()
+        self._lock = threading.Lock()
+
+    def load(self, path):
+        """The parsed report at `path`; its diagrams are queued for pre-rendering on first load."""
+        path = os.path.realpath(path)
+        stat = os.stat(path)
+        version = (stat.st_mtime_ns, stat.st_size)
+        with self._lock:
+            report = self._reports.get(path)
+            if report is not None and report.version == version:
+                self._reports.move_to_end(path)
+                return report
+        with open(path, "r", encoding="utf-8") as f:
+            report = Report(path, version, paginate(parse_sections(f.read())))
+        with self._lock:
+            self._reports[path] = report
+            self._reports.move_to_end(path)
+            while len(self._reports) > self.max_entries:
+                self._reports.popitem(last=False)
+        self.mermaid.prerender(report.diagrams)
+        return report
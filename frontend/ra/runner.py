@@ -0,0 +1,150 @@
+"""Detached per-job runner: ``python -m ra.runner <job_id>``.
+
+The scheduler starts one runner per job in its own process group. The runner
+executes the job's shell command, appends its output to the job's
+``output.log`` and records pid, status and exit code in ``status.json``.
+Output is also echoed to the runner's stdout so a live scheduler is woken up
+immediately; if the scheduler goes away (browser reload, Streamlit restart)
+the runner keeps going and the job can be re-attached from disk.
+
+The command runs in a process group of its own, which a watchdog kills when
+it exceeds the job's wall-clock timeout or produces no output for its idle
+timeout, so a hung `claude` process cannot hold a job forever. The context
+pack the command's prompt points at (:mod:`ra.context`) is built first, here
+rather than in the process that planned the job. The command is
+reaped with ``os.wait4`` so its CPU time and peak RSS end up in the status
+record for :mod:`ra.telemetry`.
+"""
+import os
+import signal
+import subprocess
+import sys
+import threading
+import time
+
+from . import config
+from . import context
+from . import jobstore
+from . import telemetry
+from .workspace import EVICTED_FILE, entry_lock
+
+
+WALL = "wall"
+IDLE = "idle"
+
+
+class Watchdog(threading.Thread):
+    """Kills the command's process group on a wall-clock or idle-output timeout."""
+
+    def __init__(self, process, timeout=None, idle_timeout=None):
+        super().__init__(name="ra-watchdog", daemon=True)
+        self.process = process
+        self.timeout = timeout
+        self.idle_timeout = idle_timeout
+        self.started_at = self.last_output_at = time.monotonic()
+        self.reason = None
+        self._stopped = threading.Event()
+
+    def touch(self):
+        self.last_output_at = time.monotonic()
+
+    def stop(self):
+        self._stopped.set()
+
+    def run(self):
+        while not self._stopped.wait(1.0):
+            now = time.monotonic()
+            if self.timeout and now - self.started_at > self.timeout:
+                self.reason = WALL
+            elif self.idle_timeout and now - self.last_output_at > self.idle_timeout:
+                self.reason = IDLE
+            else:
+                continue
+            self._kill()
+            return
+
+    def _kill(self):
+        for sig, grace in ((signal.SIGTERM, config.KILL_GRACE), (signal.SIGKILL, None)):
+            try:
+                os.killpg(self.process.pid, sig)
+            except ProcessLookupError:
+                return
+            if grace is None or self._stopped.wait(grace):
+                return
+
+    def describe(self):
+        if self.reason == WALL:
+            return f"--- Killed: exceeded the {self.timeout}s wall-clock timeout ---"
+        return f"--- Killed: no output for {self.idle_timeout}s (idle timeout) ---"
+
+
+def run(job_id):
+    spec = jobstore.read_spec(job_id)
+    if spec is None:
+        print(f"No job spec found for {job_id}", file=sys.stderr)
+        return 2
+    # Held while the command runs, so the checkout cannot be evicted under it (see ra.storage)
+    with entry_lock(spec["target"]):
+        if os.path.exists(os.path.join(spec["target_path"], EVICTED_FILE)):
+            jobstore.append_log(job_id, "--- The checkout was evicted to stay under the disk budget; "
+                                        "restore it and run the analysis again ---")
+            jobstore.update_status(job_id, status="failed", return_code=1, runner_pid=os.getpid(),
+                                   started_at=time.time(), finished_at=time.time())
+            return 1
+        return _run(job_id, spec)
+
+
+def _run(job_id, spec):
+    echo = True
+    output_bytes = 0
+    meta = spec.get("meta") or {}
+    if meta.get("context_pack") and not os.path.exists(meta["context_pack"]):
+        if context.build(spec["target_path"], meta.get("revision")) is None:
+            jobstore.append_log(job_id, "--- The context pack could not be built; running without it ---")
+    with open(jobstore.log_path(job_id), "ab") as log:
+        # A session of its own, so the watchdog and cancellation can kill the whole command tree
+        process = subprocess.Popen(
+            spec["command"], shell=True, cwd=spec["cwd"],
+            stdout=subprocess.PIPE, stderr=subprocess.STDOUT, start_new_session=True
+        )
+        jobstore.update_status(job_id, status="running", pid=process.pid, runner_pid=os.getpid(),
+                               started_at=time.time(), timed_out=None, cpu_seconds=None,
+                               max_rss_bytes=None, output_bytes=None)
+        watchdog = Watchdog(process, spec.get("timeout"), spec.get("idle_timeout") or config.JOB_IDLE_TIMEOUT)
+        watchdog.start()
+
+        for line in iter(process.stdout.readline, b""):
+            watchdog.touch()
+            output_bytes += len(line)
+            log.write(line)
+            log.flush()
+            if echo:
+                try:
+                    sys.stdout.buffer.write(line)
+                    sys.stdout.buffer.flush()
+                except (BrokenPipeError, ValueError):
+                    # Nobody is listening any more; the log file is enough
+                    echo = False
+                    devnull = os.open(os.devnull, os.O_WRONLY)
+                    os.dup2(devnull, sys.stdout.fileno())
+        process.stdout.close()
+        usage = telemetry.wait(process)
+        return_code = process.returncode
+        watchdog.stop()
+        if watchdog.reason:
+            log.write((watchdog.describe() + "\n").encode("utf-8"))
+
+    jobstore.update_status(
+        job_id,
+        status="succeeded" if return_code == 0 and not watchdog.reason else "failed",
+        return_code=return_code,
+        timed_out=watchdog.reason,
+        finished_at=time.time(),
+        output_bytes=output_bytes,
+        **usage,
+    )
+    return return_code
+
+
+if __name__ == "__main__":
+    sys.exit(run(sys.argv[1]))
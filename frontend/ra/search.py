@@ -0,0 +1,236 @@
+"""Full-text search over the generated reports of every workspace entry.
+
+Reports (``ra-*.md``, ``functional-requirements.md``, the reports of use
+cases) and the ``_ra/docs`` pages of every repository are indexed in a
+SQLite FTS5 table in ``workspace/.dora/search.sqlite``. Indexing is
+incremental: a file is only re-read when its mtime or size changed, so
+updating a target after one of its jobs finished costs a ``stat`` per file,
+and a query across hundreds of repositories is a single ranked FTS lookup.
+
+Also available headless: ``python -m ra search "log4j"``.
+"""
+import contextlib
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+
+from . import config
+from .workspace import USE_CASE_FILE
+
+
+SEARCH_DB = os.path.join(config.WORKSPACE_DIR, ".dora", "search.sqlite")
+
+DOCS_DIR = os.path.join("_ra", "docs")
+REPORT_FILES = ("functional-requirements.md",)
+
+# Highlight markers for snippets; markdown bold, so the view can render them as is
+MARK_START, MARK_END = "**", "**"
+SNIPPET_TOKENS = 24
+# Title matches weigh more than body matches
+TITLE_WEIGHT, BODY_WEIGHT = 5.0, 1.0
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS documents (
+    id INTEGER PRIMARY KEY,
+    target TEXT NOT NULL,
+    path TEXT NOT NULL UNIQUE,
+    mtime_ns INTEGER NOT NULL,
+    size INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS documents_target ON documents (target);
+CREATE VIRTUAL TABLE IF NOT EXISTS pages USING fts5 (title, body, tokenize = 'porter unicode61');
+"""
+
+_HEADING_RE = re.compile(r"^#{1,6}\s+(.+?)[\s#]*$", re.MULTILINE)
+
+
+def report_paths(target_path):
+    """Paths, relative to `target_path`, of the reports and docs pages that are indexed."""
+    try:
+        names = os.listdir(target_path)
+    except OSError:
+        return []
+    if USE_CASE_FILE in names:
+        paths = [n for n in names if n.endswith(".md") and n != USE_CASE_FILE]
+    else:
+        paths = [n for n in names if n.endswith(".md") and (n.startswith("ra-") or n in REPORT_FILES)]
+    for root, dirs, files in os.walk(os.path.join(target_path, DOCS_DIR)):
+        dirs[:] = [d for d in dirs if not d.startswith(".")]
+        paths += [os.path.relpath(os.path.join(root, f), target_path) for f in files if f.endswith(".md")]
+    return sorted(paths)
+
+
+def _title(text, path):
+    match = _HEADING_RE.search(text)
+    return match.group(1) if match else os.path.basename(path)
+
+
+def _flatten(snippet):
+    # One line of prose: headings, list markers and line breaks of the source would break the result list
+    return " ".join(re.sub(r"(^|\n)\s*(#+|[-*>]|\d+\.)\s", "\\1", snippet).split())
+
+
+def to_match_query(text):
+    """`text` as an FTS5 query of quoted terms, for input that is not valid query syntax (e.g. `log4j-core`)."""
+    terms = [t.replace('"', '""') for t in text.split()]
+    return " ".join(f'"{t}"' for t in terms)
+
+
+class SearchResult:
+    def __init__(self, target, path, title, snippet, rank):
+        self.target = target
+        self.path = path
+        self.title = title
+        self.snippet = _flatten(snippet)
+        self.rank = rank
+
+    def as_dict(self):
+        return {"target": self.target, "path": self.path, "title": self.title, "snippet": self.snippet,
+                "rank": round(self.rank, 3)}
+
+
+class SearchIndex:
+    """Incrementally maintained FTS index of ``workspace/``, shared by the UI and the batch CLI.
+
+    Full refreshes are rate limited to one every ``min_interval`` seconds;
+    :meth:`update` re-checks one target immediately.
+    """
+
+    def __init__(self, root=None, path=None, min_interval=None):
+        self.root = root or config.WORKSPACE_DIR
+        self.path = path or SEARCH_DB
+        self.min_interval = config.INDEX_MIN_INTERVAL if min_interval is None else min_interval
+        self._last_refresh = 0.0
+        self._lock = threading.Lock()
+        with self._connect() as db:
+            db.execute("PRAGMA journal_mode = WAL")
+            db.executescript(_SCHEMA)
+
+    @contextlib.contextmanager
+    def _connect(self):
+        # One short-lived connection per call: they are cheap, and safe across threads and processes
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        db = sqlite3.connect(self.path, timeout=30)
+        try:
+            with db:  # Commits, or rolls back on error
+                yield db
+        finally:
+            db.close()
+
+    # --- Indexing ---
+    def update(self, target):
+        """Re-index the changed reports of one workspace entry (a name under the root). Returns files re-read.
+
+        Errors are logged rather than raised, so a busy or broken index never fails a job's completion hooks.
+        """
+        try:
+            with self._lock, self._connect() as db:
+                return self._update(db, target)
+        except sqlite3.Error as e:
+            logging.warning(f"Could not update the search index for {target}: {e}")
+            return 0
+
+    def refresh(self, force=False):
+        """Bring the whole index up to date with the workspace. Returns the number of files re-read."""
+        with self._lock:
+            now = time.monotonic()
+            if not force and now - self._last_refresh < self.min_interval:
+                return 0
+            self._last_refresh = now
+            try:
+                targets = sorted(e.name for e in os.scandir(self.root) if not e.name.startswith(".") and e.is_dir())
+            except FileNotFoundError:
+                targets = []
+            changed = 0
+            with self._connect() as db:
+                indexed = {row[0] for row in db.execute("SELECT DISTINCT target FROM documents")}
+                for target in set(indexed) - set(targets):
+                    self._delete(db, db.execute("SELECT id FROM documents WHERE target = ?", (target,)).fetchall())
+                for target in targets:
+                    changed += self._update(db, target)
+            return changed
+
+    def _update(self, db, target):
+        target_path = os.path.join(self.root, target)
+        known = {path: (doc_id, mtime_ns, size) for doc_id, path, mtime_ns, size in
+                 db.execute("SELECT id, path, mtime_ns, size FROM documents WHERE target = ?", (target,))}
+        changed = 0
+        for relative in report_paths(target_path):
+            path = os.path.join(target, relative)
+            try:
+                stat = os.stat(os.path.join(self.root, path))
+            except FileNotFoundError:
+                continue
+            doc_id, mtime_ns, size = known.pop(path, (None, None, None))
+            if (mtime_ns, size) == (stat.st_mtime_ns, stat.st_size):
+                continue
+            try:
+                with open(os.path.join(self.root, path), "r", encoding="utf-8", errors="replace") as f:
+                    text = f.read()
+            except OSError as e:
+                logging.warning(f"Cannot index {path}: {e}")
+                continue
+            if doc_id is None:
+                doc_id = db.execute("INSERT INTO documents (target, path, mtime_ns, size) VALUES (?, ?, ?, ?)",
+                                    (target, path, stat.st_mtime_ns, stat.st_size)).lastrowid
+            else:
+                db.execute("UPDATE documents SET mtime_ns = ?, size = ? WHERE id = ?",
+                           (stat.st_mtime_ns, stat.st_size, doc_id))
+                db.execute("DELETE FROM pages WHERE rowid = ?", (doc_id,))
+            db.execute("INSERT INTO pages (rowid, title, body) VALUES (?, ?, ?)", (doc_id, _title(text, path), text))
+            changed += 1
+        # Whatever is left was deleted from the workspace
+        self._delete(db, [(doc_id,) for doc_id, _, _ in known.values()])
+        if changed or known:
+            logging.info(f"Search index: {changed} file(s) indexed, {len(known)} removed for {target}")
+        return changed
+
+    def _delete(self, db, doc_ids):
+        db.executemany("DELETE FROM pages WHERE rowid = ?", doc_ids)
+        db.executemany("DELETE FROM documents WHERE id = ?", doc_ids)
+
+    # --- Queries ---
+    def search(self, query, limit=50, target=None):
+        """Best matches for `query` (FTS5 syntax, or plain words), most relevant first."""
+        query = query.strip()
+        if not query:
+            return []
+        sql = (
+            "SELECT d.target, d.path, p.title,"
+            f" snippet(pages, 1, ?, ?, ' … ', {SNIPPET_TOKENS}), bm25(pages, {TITLE_WEIGHT}, {BODY_WEIGHT}) AS rank"
+            " FROM pages AS p JOIN documents AS d ON d.id = p.rowid"
+            " WHERE pages MATCH ?" + (" AND d.target = ?" if target else "") +
+            " ORDER BY rank LIMIT ?"
+        )
+        with self._connect() as db:
+            for match in (query, to_match_query(query)):
+                params = [MARK_START, MARK_END, match] + ([target] if target else []) + [limit]
+                try:
+                    return [SearchResult(*row) for row in db.execute(sql, params)]
+                except sqlite3.OperationalError:
+                    continue  # Not valid FTS5 syntax: retry with every word quoted
+        return []
+
+    def stats(self):
+        with self._connect() as db:
+            documents, targets = db.execute("SELECT COUNT(*), COUNT(DISTINCT target) FROM documents").fetchone()
+        return {"documents": documents, "targets": targets}
+
+
+# --- Command line ---
+def add_arguments(parser):
+    parser.add_argument("query", help="FTS5 query, e.g. 'log4j', '\"spring boot\" NOT test', 'struts*'")
+    parser.add_argument("--target", help="only search the reports of this workspace entry")
+    parser.add_argument("--limit", type=int, default=50)
+
+
+def main(args):
+    index = SearchIndex()
+    index.refresh(force=True)
+    results = index.search(args.query, limit=args.limit, target=args.target)
+    print(json.dumps([r.as_dict() for r in results], indent=2))
+    return 0
@@ -0,0 +1,320 @@
+"""Disk budget for the workspace: evicts the least recently used checkouts and built sites.
+
+Every clone and docs build adds to ``workspace/``. With a budget set
+(``config.WORKSPACE_BUDGET_BYTES``), :class:`StorageManager` measures the
+workspace in the background and, while it is over budget, evicts repositories
+in least recently used order (last selection, analysis or docs view, see
+:func:`touch`):
+
+* first built docs sites (``_ra/site``), which the next publish rebuilds;
+* then checkouts. What the analyses generated - the outputs of the
+  commands in ``commands.md`` (reports, ``_ra/`` sources) and the report
+  provenance, whether or not the repository's ``.gitignore`` covers them - is
+  kept together with an ``.ra-evicted.json`` stub recording the remote,
+  branch and HEAD, so the repository keeps its results and
+  :meth:`ra.clone.CloneManager.restore` brings the checkout back with a fetch
+  from the mirror.
+
+Repositories with running jobs or clones, with modified tracked files, or used
+within ``config.EVICT_MIN_IDLE`` seconds are never evicted. Jobs and clones
+hold the entry's lock (:func:`ra.workspace.entry_lock`) while they use it, and
+eviction takes it exclusively around the final busy check and the move.
+"""
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+import uuid
+
+from . import commands as ra_commands
+from . import config
+from . import fsutil
+from . import jobstore
+from . import lazy
+from . import report_cache
+from . import telemetry
+from .commands import CommandRegistry
+from .workspace import EVICTED_FILE, entry_lock
+
+
+git = lazy.module("git")
+
+ACCESS_FILE = os.path.join(config.WORKSPACE_DIR, ".dora", "access.json")
+# Accesses closer together than this are recorded once
+ACCESS_RESOLUTION = 60
+
+SITE_PATH = os.path.join("_ra", "site")
+
+# Eviction kinds, cheapest to undo first
+SITE = "site"
+CHECKOUT = "checkout"
+
+_access = {}
+_access_lock = threading.Lock()
+
+
+# --- Access tracking ---
+def _read_access():
+    try:
+        with open(ACCESS_FILE, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def touch(name):
+    """Record that workspace entry `name` was used (selected, analysed, docs viewed)."""
+    now = time.time()
+    with _access_lock:
+        if now - _access.get(name, 0) < ACCESS_RESOLUTION:
+            return
+        _access[name] = now
+        try:
+            # Merge under the file lock, so accesses recorded by other processes (the batch CLI) are not lost
+            with fsutil.locked(ACCESS_FILE + ".lock"):
+                recorded = _read_access()
+                recorded[name] = max(now, recorded.get(name, 0))
+                fsutil.atomic_write_text(ACCESS_FILE, json.dumps(recorded))
+        except OSError as e:
+            logging.warning(f"Could not record access to {name}: {e}")
+
+
+def last_access():
+    """{name: timestamp of last recorded use}."""
+    recorded = _read_access()
+    with _access_lock:
+        for name, ts in _access.items():
+            recorded[name] = max(ts, recorded.get(name, 0))
+    return recorded
+
+
+# --- Measuring ---
+def disk_usage(path):
+    """Bytes allocated under `path` (like ``du``), not following symlinks."""
+    total, stack = 0, [path]
+    while stack:
+        try:
+            with os.scandir(stack.pop()) as entries:
+                for entry in entries:
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            stack.append(entry.path)
+                        else:
+                            total += entry.stat(follow_symlinks=False).st_blocks * 512
+                    except OSError:
+                        continue
+        except OSError:
+            continue
+    return total
+
+
+def _running_targets():
+    # Targets of jobs whose runner is alive, whichever process started them
+    targets = set()
+    for job_id in jobstore.list_job_ids():
+        status = jobstore.read_status(job_id)
+        if jobstore.pid_alive(status.get("runner_pid")):
+            spec = jobstore.read_spec(job_id) or {}
+            targets.add(spec.get("target"))
+    return targets
+
+
+class Candidate:
+    """Something that can be evicted: the site or the checkout of one repository."""
+
+    def __init__(self, name, path, kind, size, last_used):
+        self.name = name
+        self.path = path
+        self.kind = kind
+        self.size = size
+        self.last_used = last_used
+
+    def as_dict(self):
+        return {"target": self.name, "kind": self.kind, "bytes": self.size, "last_used": round(self.last_used)}
+
+
+class StorageManager:
+    """Keeps ``workspace/`` under a byte budget by evicting cold repositories.
+
+    `is_busy(name)` may add in-process knowledge (queued jobs, active clones)
+    to the on-disk check for running jobs. The `registry`'s commands tell which
+    files of a checkout are generated and must survive eviction.
+    """
+
+    def __init__(self, root=None, budget=None, is_busy=None, min_idle=None, registry=None):
+        self.root = root or config.WORKSPACE_DIR
+        self.budget = config.WORKSPACE_BUDGET_BYTES if budget is None else budget
+        self.min_idle = config.EVICT_MIN_IDLE if min_idle is None else min_idle
+        self.is_busy = is_busy
+        self.registry = registry or CommandRegistry()
+        self.last_usage = None
+        self._lock = threading.Lock()
+        self._thread = None
+
+    # --- Public API ---
+    def usage(self):
+        """Bytes used by the workspace, and by the site and checkout of each repository."""
+        entries, total = {}, 0
+        for entry in os.scandir(self.root):
+            if not entry.is_dir(follow_symlinks=False):
+                continue
+            size = disk_usage(entry.path)
+            total += size
+            if entry.name.startswith(".") or not os.path.isdir(os.path.join(entry.path, ".git")):
+                continue  # State, use cases and evicted repositories
+            site = disk_usage(os.path.join(entry.path, SITE_PATH))
+            entries[entry.name] = {SITE: site, CHECKOUT: size - site}
+        self.last_usage = {"total": total, "budget": self.budget, "repos": entries, "measured_at": time.time()}
+        return self.last_usage
+
+    def candidates(self, usage=None):
+        """Evictable items: idle sites, least recently used first, then idle checkouts in the same order."""
+        usage = usage or self.usage()
+        accessed = last_access()
+        now = time.time()
+        busy = _running_targets()
+        items = []
+        for name, sizes in usage["repos"].items():
+            path = os.path.join(self.root, name)
+            last_used = accessed.get(name) or os.stat(path).st_mtime
+            if now - last_used < self.min_idle or self._busy(name, busy):
+                continue
+            if sizes[SITE]:
+                items.append(Candidate(name, path, SITE, sizes[SITE], last_used))
+            items.append(Candidate(name, path, CHECKOUT, sizes[CHECKOUT], last_used))
+        return sorted(items, key=lambda c: (c.kind != SITE, c.last_used))
+
+    def evict(self, dry_run=False):
+        """Evict until the workspace fits the budget. Returns what was (or, with `dry_run`, would be) evicted."""
+        if not self.budget:
+            return []
+        with self._lock:
+            usage = self.usage()
+            excess = usage["total"] - self.budget
+            evicted = []
+            for candidate in self.candidates(usage):
+                if excess <= 0:
+                    break
+                if dry_run or self._evict(candidate):
+                    evicted.append(candidate)
+                    excess -= candidate.size
+            if excess > 0 and not dry_run:
+                logging.warning(f"Workspace is {excess / 2 ** 30:.1f} GiB over its budget with nothing left to evict")
+            return evicted
+
+    def start(self, interval=None):
+        """Run evict() every `interval` seconds on a daemon thread (no-op without a budget)."""
+        if not self.budget or self._thread is not None:
+            return
+        interval = config.EVICT_INTERVAL if interval is None else interval
+        self._thread = threading.Thread(target=self._loop, args=(interval,), name="ra-storage", daemon=True)
+        self._thread.start()
+
+    # --- Internals ---
+    def _busy(self, name, running_targets=None):
+        running_targets = _running_targets() if running_targets is None else running_targets
+        return name in running_targets or bool(self.is_busy and self.is_busy(name))
+
+    def _loop(self, interval):
+        while True:
+            try:
+                self.evict()
+            except Exception as e:
+                logging.error(f"Workspace eviction failed: {e}")
+            time.sleep(interval)
+
+    def _evict(self, candidate):
+        started_at = time.monotonic()
+        try:
+            # No job or clone can start using the entry while this is held, so the busy check stays true
+            with entry_lock(candidate.name, exclusive=True, blocking=False):
+                if self._busy(candidate.name):
+                    logging.info(f"Not evicting {candidate.name}: it started being used")
+                    return False
+                if candidate.kind == SITE:
+                    shutil.rmtree(os.path.join(candidate.path, SITE_PATH))
+                elif not self._evict_checkout(candidate):
+                    return False
+        except BlockingIOError:
+            logging.info(f"Not evicting {candidate.name}: a job or clone is using it")
+            return False
+        except (OSError, git.GitError, ValueError) as e:
+            logging.error(f"Could not evict the {candidate.kind} of {candidate.name}: {e}")
+            return False
+        logging.info(f"Evicted the {candidate.kind} of {candidate.name} ({candidate.size / 2 ** 20:.0f} MiB), "
+                     f"unused since {time.strftime('%Y-%m-%d %H:%M', time.localtime(candidate.last_used))}")
+        telemetry.record(telemetry.EVICT, time.monotonic() - started_at, target=candidate.name,
+                         kind=candidate.kind, bytes=candidate.size)
+        return True
+
+    def _evict_checkout(self, candidate):
+        repo = git.Repo(candidate.path)
+        try:
+            if repo.is_dirty(untracked_files=False):
+                logging.info(f"Not evicting {candidate.name}: tracked files were modified")
+                return False
+            if "origin" not in [r.name for r in repo.remotes]:
+                logging.info(f"Not evicting {candidate.name}: no remote to restore it from")
+                return False
+            stub = {
+                "url": next(repo.remote("origin").urls),
+                "branch": None if repo.head.is_detached else repo.active_branch.name,
+                "head": repo.head.commit.hexsha,
+                "evicted_at": time.time(),
+            }
+        finally:
+            repo.close()
+        keep = self._generated_files(candidate.path)
+
+        # Build the evicted form next to the checkout, then swap, so the entry is never half-evicted
+        staging = os.path.join(self.root, f".evicting-{candidate.name}")
+        shutil.rmtree(staging, ignore_errors=True)
+        os.makedirs(staging)
+        for relative in keep:
+            destination = os.path.join(staging, relative)
+            os.makedirs(os.path.dirname(destination), exist_ok=True)
+            shutil.copy2(os.path.join(candidate.path, relative), destination, follow_symlinks=False)
+        fsutil.atomic_write_text(os.path.join(staging, EVICTED_FILE), json.dumps(stub, indent=2))
+        trash = os.path.join(self.root, f".trash-{uuid.uuid4().hex[:8]}")
+        os.rename(candidate.path, trash)
+        os.rename(staging, candidate.path)
+        shutil.rmtree(trash, ignore_errors=True)
+        return True
+
+    def _generated_files(self, path):
+        # Command outputs and report provenance, listed explicitly: git's untracked list leaves out ignored paths
+        roots = {report_cache.artifact_root(c.output_file) for c in self.registry.commands(ra_commands.REPO)
+                 if c.output_file}
+        roots.add(report_cache.PROVENANCE_FILE)
+        files = []
+        for root in sorted(roots):
+            full = os.path.join(path, root)
+            if os.path.isfile(full) or os.path.islink(full):
+                files.append(root)
+            elif os.path.isdir(full):
+                for directory, subdirectories, names in os.walk(full):
+                    relative = os.path.relpath(directory, path)
+                    # The built site is rebuilt by the next publish
+                    subdirectories[:] = [d for d in subdirectories if os.path.join(relative, d) != SITE_PATH]
+                    files += [os.path.join(relative, name) for name in names]
+        return files
+
+
+# --- Command line ---
+def add_arguments(parser):
+    parser.add_argument("--budget-gb", type=float, help="byte budget in GiB (default: DORA_WORKSPACE_BUDGET_GB)")
+    parser.add_argument("--min-idle", type=float, help="seconds a repository must be unused before eviction")
+    parser.add_argument("--dry-run", action="store_true", help="only print what would be evicted")
+
+
+def main(args):
+    manager = StorageManager(
+        budget=int(args.budget_gb * 2 ** 30) if args.budget_gb is not None else None, min_idle=args.min_idle)
+    if not manager.budget:
+        raise SystemExit("No budget: set DORA_WORKSPACE_BUDGET_GB or pass --budget-gb")
+    evicted = manager.evict(dry_run=args.dry_run)
+    print(json.dumps({"total_bytes": manager.last_usage["total"], "budget_bytes": manager.budget,
+                      "dry_run": args.dry_run, "evicted": [c.as_dict() for c in evicted]}, indent=2))
+    return 0
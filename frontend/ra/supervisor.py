@@ -0,0 +1,191 @@
+"""Asyncio supervisor owning the job runner processes of a scheduler.
+
+One event loop, on one background thread, starts every child with
+``asyncio.create_subprocess_exec`` and multiplexes their stdout, so a running
+job costs a pipe and a task rather than a thread blocked in ``readline``.
+Runners left over from a previous process are watched from the same loop
+(through a pidfd where available) while their log file is tailed.
+
+Everything the supervisor observes is published as :class:`Event` objects.
+A :class:`Subscription` receives the events of one job, or of all jobs, and
+can be waited on from a thread (the Streamlit fragments) or awaited from a
+coroutine, so viewers wake up when output arrives instead of polling.
+"""
+import asyncio
+import logging
+import os
+import threading
+import time
+from collections import deque, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+
+# Event kinds
+OUTPUT = "output"  # data: the new log lines
+STATUS = "status"  # data: the job's new status
+
+Event = namedtuple("Event", "key kind data")
+
+READ_CHUNK = 1 << 16
+# Events kept per subscription for a subscriber that stopped reading
+MAX_PENDING = 10000
+
+
+def _alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class Subscription:
+    """Events for one key (or every key), for a thread to wait on or a coroutine to await."""
+
+    def __init__(self, supervisor, key=None, loop=None):
+        self._supervisor = supervisor
+        self.key = key
+        self._loop = loop
+        self._queue = asyncio.Queue() if loop is not None else None
+        self._events = deque(maxlen=MAX_PENDING)
+        self._cond = threading.Condition()
+
+    def _push(self, event):
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._queue.put_nowait, event)
+            return
+        with self._cond:
+            self._events.append(event)
+            self._cond.notify_all()
+
+    def wait(self, timeout=None, linger=0.0):
+        """Block until there are events (or `timeout` seconds passed). Returns and clears the pending events.
+
+        With `linger`, the first event is followed by that many seconds of
+        collecting more, so a burst of output wakes the caller once.
+        """
+        with self._cond:
+            woken = self._cond.wait_for(lambda: self._events, timeout)
+        if woken and linger:
+            time.sleep(linger)
+        with self._cond:
+            events = list(self._events)
+            self._events.clear()
+        return events
+
+    async def get(self):
+        """Next event, for subscriptions created with Supervisor.subscribe_async()."""
+        return await self._queue.get()
+
+    def close(self):
+        self._supervisor.unsubscribe(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+        return False
+
+
+class Supervisor:
+    """Starts and watches child processes on a private event loop."""
+
+    def __init__(self, hook_workers=None):
+        self._loop = asyncio.new_event_loop()
+        # Exit callbacks may do slow work (report cache, completion hooks), so they run off the loop
+        self._hooks = ThreadPoolExecutor(max_workers=hook_workers, thread_name_prefix="ra-supervisor-hook")
+        self._subscribers = set()
+        self._lock = threading.Lock()
+        self._thread = threading.Thread(target=self._loop.run_forever, name="ra-supervisor", daemon=True)
+        self._thread.start()
+
+    # --- Processes ---
+    def spawn(self, args, key=None, on_output=None, on_exit=None, **kwargs):
+        """Start `args` with stdout piped to the loop. Returns the child's pid.
+
+        `on_output(chunk)` runs on the loop for each chunk of stdout and must be
+        quick; `on_exit(return_code)` runs on a hook thread once the child exited.
+        Remaining keyword arguments go to ``asyncio.create_subprocess_exec``.
+        """
+        future = asyncio.run_coroutine_threadsafe(self._spawn(args, key, on_output, on_exit, kwargs), self._loop)
+        return future.result()
+
+    async def _spawn(self, args, key, on_output, on_exit, kwargs):
+        process = await asyncio.create_subprocess_exec(
+            *args, stdout=asyncio.subprocess.PIPE, stdin=asyncio.subprocess.DEVNULL, **kwargs)
+        self._loop.create_task(self._pump(process, key, on_output, on_exit))
+        return process.pid
+
+    async def _pump(self, process, key, on_output, on_exit):
+        while True:
+            chunk = await process.stdout.read(READ_CHUNK)
+            if not chunk:
+                break
+            self._call(key, on_output, chunk)
+        return_code = await process.wait()
+        await self._loop.run_in_executor(self._hooks, self._call, key, on_exit, return_code)
+
+    def watch(self, pid, key=None, on_poll=None, on_exit=None, interval=0.5):
+        """Follow a process that is not our child: `on_poll()` every `interval` seconds, `on_exit()` once it is gone."""
+        asyncio.run_coroutine_threadsafe(self._watch(pid, key, on_poll, on_exit, interval), self._loop)
+
+    async def _watch(self, pid, key, on_poll, on_exit, interval):
+        exited = asyncio.Event()
+        pidfd = None
+        try:
+            # A pidfd becomes readable when the process exits, so the exit is noticed without waiting for a poll
+            pidfd = os.pidfd_open(pid)
+            self._loop.add_reader(pidfd, exited.set)
+        except (AttributeError, OSError):
+            pass
+        try:
+            while not exited.is_set() and _alive(pid):
+                self._call(key, on_poll)
+                try:
+                    await asyncio.wait_for(exited.wait(), interval)
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            if pidfd is not None:
+                self._loop.remove_reader(pidfd)
+                os.close(pidfd)
+        self._call(key, on_poll)
+        await self._loop.run_in_executor(self._hooks, self._call, key, on_exit)
+
+    def _call(self, key, callback, *args):
+        if callback is None:
+            return
+        try:
+            callback(*args)
+        except Exception as e:
+            logging.error(f"Error in supervisor callback for {key}: {e}")
+
+    # --- Events ---
+    def publish(self, key, kind, data=None):
+        """Deliver an event to the subscribers of `key` and to those of every key. Safe from any thread."""
+        event = Event(key, kind, data)
+        with self._lock:
+            subscribers = [s for s in self._subscribers if s.key is None or s.key == key]
+        for subscription in subscribers:
+            subscription._push(event)
+
+    def subscribe(self, key=None):
+        """Subscription for a thread: events of `key`, or of every key if None."""
+        subscription = Subscription(self, key)
+        with self._lock:
+            self._subscribers.add(subscription)
+        return subscription
+
+    def subscribe_async(self, key=None):
+        """Subscription whose get() is awaited on the calling coroutine's event loop."""
+        subscription = Subscription(self, key, loop=asyncio.get_running_loop())
+        with self._lock:
+            self._subscribers.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscribers.discard(subscription)
@@ -0,0 +1,296 @@
+"""Structured performance telemetry for analysis jobs, clones and docs builds.
+
+Every measured phase appends one JSON object to
+``workspace/.dora/telemetry.jsonl``, from whichever process did the work (the
+UI, the batch CLI). Events carry the phase, its wall time and outcome, and -
+where a child process did the work - its CPU time and peak RSS taken from
+``os.wait4``, plus phase specific fields such as output bytes or queue wait.
+
+:func:`prometheus_text` folds the file into counters and histograms, served by
+the docs gateway at ``/metrics``; :func:`load_events` and :func:`summarize`
+feed the in-app Performance view, together with page rerun latencies that
+:class:`Timings` keeps in memory.
+"""
+import json
+import logging
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict, deque
+
+from . import config
+
+
+TELEMETRY_FILE = os.path.join(config.WORKSPACE_DIR, ".dora", "telemetry.jsonl")
+
+# Phases
+ANALYSIS = "analysis"
+CLONE = "clone"
+UPDATE = "update"
+RESTORE = "restore"
+EVICT = "evict"
+CONTEXT = "context"
+DEPGRAPH = "depgraph"
+STARTUP = "startup"
+PREWARM = "prewarm"
+DOCS_INSTALL = "docs_install"
+DOCS_BUILD = "docs_build"
+
+OK = "ok"
+ERROR = "error"
+
+DURATION_BUCKETS = (1, 5, 15, 60, 300, 900, 1800, 3600, 7200)
+
+_write_lock = threading.Lock()
+# inode -> (bytes parsed, events, first line) of the telemetry files, see load_events()
+_events_cache = {}
+_events_lock = threading.Lock()
+
+
+# --- Recording ---
+def record(phase, duration, outcome=OK, **fields):
+    """Append one event. Never raises: telemetry must not break the work it measures."""
+    event = {"ts": round(time.time(), 3), "phase": phase, "duration": round(duration, 3), "outcome": outcome}
+    event.update((k, v) for k, v in fields.items() if v is not None)
+    line = json.dumps(event, separators=(",", ":")) + "\n"
+    try:
+        with _write_lock:
+            os.makedirs(os.path.dirname(TELEMETRY_FILE), exist_ok=True)
+            _rotate_if_needed()
+            # One write() per line on an O_APPEND file, so lines from several processes don't interleave
+            with open(TELEMETRY_FILE, "a", encoding="utf-8") as f:
+                f.write(line)
+    except OSError as e:
+        logging.warning(f"Could not record telemetry for {phase}: {e}")
+
+
+def _rotate_if_needed():
+    try:
+        if os.path.getsize(TELEMETRY_FILE) > config.TELEMETRY_MAX_BYTES:
+            os.replace(TELEMETRY_FILE, TELEMETRY_FILE + ".1")
+    except FileNotFoundError:
+        pass
+
+
+# --- Child process resource usage ---
+def wait(process):
+    """Reap `process` with os.wait4 and return its CPU time and peak RSS (including reaped descendants)."""
+    _, wait_status, usage = os.wait4(process.pid, 0)
+    process.returncode = os.waitstatus_to_exitcode(wait_status)
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+    max_rss = usage.ru_maxrss if sys.platform == "darwin" else usage.ru_maxrss * 1024
+    return {"cpu_seconds": round(usage.ru_utime + usage.ru_stime, 3), "max_rss_bytes": max_rss}
+
+
+def run_process(args, **kwargs):
+    """Like ``subprocess.run(args, capture_output=True, text=True)``, also returning the child's usage.
+
+    Output goes through temporary files rather than pipes, so the child can be
+    reaped with :func:`wait` instead of ``Popen.communicate``.
+    """
+    with tempfile.TemporaryFile() as stdout, tempfile.TemporaryFile() as stderr:
+        process = subprocess.Popen(args, stdout=stdout, stderr=stderr, **kwargs)
+        usage = wait(process)
+        stdout.seek(0)
+        stderr.seek(0)
+        completed = subprocess.CompletedProcess(
+            args, process.returncode,
+            stdout.read().decode("utf-8", errors="replace"), stderr.read().decode("utf-8", errors="replace")
+        )
+    return completed, usage
+
+
+# --- Reading ---
+def _read_lines(path, offset=0):
+    # (parsed events, offset after the last complete line)
+    events = []
+    try:
+        with open(path, "rb") as f:
+            f.seek(offset)
+            for raw in f:
+                if not raw.endswith(b"\n"):
+                    break  # Still being written
+                offset += len(raw)
+                try:
+                    events.append(json.loads(raw))
+                except json.JSONDecodeError:
+                    continue
+    except FileNotFoundError:
+        pass
+    return events, offset
+
+
+def _first_line(path):
+    with open(path, "rb") as f:
+        return f.readline()
+
+
+def load_events(since=None, phase=None):
+    """Recorded events, oldest first, optionally only those after timestamp `since` and of one `phase`.
+
+    Each file is parsed once per process; later calls only parse lines appended since, so the
+    Performance view can call this on every rerun.
+    """
+    events = []
+    with _events_lock:
+        cached = {}
+        for path in (TELEMETRY_FILE + ".1", TELEMETRY_FILE):
+            try:
+                stat = os.stat(path)
+                head = _first_line(path)
+            except FileNotFoundError:
+                continue
+            # Keyed by inode, so a rotated file keeps its parsed events; the first line tells a reused inode apart
+            offset, parsed, cached_head = _events_cache.get(stat.st_ino, (0, [], head))
+            if cached_head != head or stat.st_size < offset:
+                offset, parsed = 0, []
+            if stat.st_size > offset:
+                appended, offset = _read_lines(path, offset)
+                parsed = parsed + appended
+            cached[stat.st_ino] = (offset, parsed, head)
+            events += parsed
+        _events_cache.clear()
+        _events_cache.update(cached)
+    return [e for e in events
+            if (since is None or e.get("ts", 0) >= since) and (phase is None or e.get("phase") == phase)]
+
+
+def summarize(events, key):
+    """Per-`key` totals (count, wall time, CPU, peak RSS, failures), costliest first."""
+    groups = defaultdict(lambda: {"count": 0, "failed": 0, "wall_s": 0.0, "cpu_s": 0.0, "max_rss_mb": 0.0,
+                                  "queue_wait_s": 0.0, "output_kb": 0.0})
+    for event in events:
+        group = groups[event.get(key) or "-"]
+        group["count"] += 1
+        group["failed"] += event.get("outcome") not in (OK, "succeeded")
+        group["wall_s"] += event.get("duration", 0.0)
+        group["cpu_s"] += event.get("cpu_seconds", 0.0)
+        group["max_rss_mb"] = max(group["max_rss_mb"], event.get("max_rss_bytes", 0) / 2 ** 20)
+        group["queue_wait_s"] += event.get("queue_wait", 0.0)
+        group["output_kb"] += event.get("output_bytes", 0) / 1024
+    rows = []
+    for name, group in groups.items():
+        row = {key: name, **{k: round(v, 1) if isinstance(v, float) else v for k, v in group.items()}}
+        row["mean_wall_s"] = round(group["wall_s"] / group["count"], 1)
+        rows.append(row)
+    return sorted(rows, key=lambda r: r["wall_s"], reverse=True)
+
+
+# --- In-process timings ---
+class Timings:
+    """Recent durations of something too frequent to record as events (page reruns), per key, in memory."""
+
+    def __init__(self, max_entries=500):
+        self.max_entries = max_entries
+        self.count = 0
+        self._durations = defaultdict(lambda: deque(maxlen=self.max_entries))
+        self._lock = threading.Lock()
+
+    def add(self, key, duration):
+        with self._lock:
+            self.count += 1
+            self._durations[key].append(duration)
+
+    def summary(self):
+        """[{key, runs, median_ms, p95_ms, max_ms}], slowest median first."""
+        with self._lock:
+            samples = {key: sorted(durations) for key, durations in self._durations.items()}
+        rows = [{"key": key, "runs": len(d), "median_ms": round(d[len(d) // 2] * 1000, 1),
+                 "p95_ms": round(d[min(int(len(d) * 0.95), len(d) - 1)] * 1000, 1), "max_ms": round(d[-1] * 1000, 1)}
+                for key, d in samples.items()]
+        return sorted(rows, key=lambda r: r["median_ms"], reverse=True)
+
+
+# --- Prometheus exposition ---
+def _labels(**labels):
+    def escape(value):
+        return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+    return "{" + ",".join(f'{k}="{escape(v)}"' for k, v in labels.items() if v is not None) + "}"
+
+
+class MetricsCollector:
+    """Aggregates the telemetry file into Prometheus metrics, reading only lines added since the last scrape."""
+
+    def __init__(self, path=TELEMETRY_FILE):
+        self.path = path
+        self._offset = 0
+        self._inode = None
+        self._lock = threading.Lock()
+        # (phase, outcome, command) -> [bucket counts..., count, sum]
+        self._durations = defaultdict(lambda: [0] * (len(DURATION_BUCKETS) + 2))
+        # (phase, command) -> total
+        self._cpu = defaultdict(float)
+        self._output_bytes = defaultdict(float)
+        self._max_rss = defaultdict(int)
+        # (phase, command) -> [count, sum]
+        self._queue_wait = defaultdict(lambda: [0, 0.0])
+
+    def _collect(self):
+        try:
+            inode = os.stat(self.path).st_ino
+        except FileNotFoundError:
+            return
+        if inode != self._inode:
+            # First scrape, or the file was rotated: the new file only holds events not yet counted
+            self._inode, self._offset = inode, 0
+        events, self._offset = _read_lines(self.path, self._offset)
+        for event in events:
+            self._add(event)
+
+    def _add(self, event):
+        phase, command = event.get("phase"), event.get("command")
+        duration = event.get("duration", 0.0)
+        histogram = self._durations[(phase, event.get("outcome"), command)]
+        for i, bound in enumerate(DURATION_BUCKETS):
+            if duration <= bound:
+                histogram[i] += 1
+        histogram[-2] += 1
+        histogram[-1] += duration
+        self._cpu[(phase, command)] += event.get("cpu_seconds", 0.0)
+        self._output_bytes[(phase, command)] += event.get("output_bytes", 0)
+        self._max_rss[(phase, command)] = max(self._max_rss[(phase, command)], event.get("max_rss_bytes", 0))
+        if "queue_wait" in event:
+            self._queue_wait[(phase, command)][0] += 1
+            self._queue_wait[(phase, command)][1] += event["queue_wait"]
+
+    def render(self):
+        with self._lock:
+            self._collect()
+            lines = [
+                "# HELP dora_phase_duration_seconds Wall time of analysis jobs, clones and docs builds.",
+                "# TYPE dora_phase_duration_seconds histogram",
+            ]
+            for (phase, outcome, command), histogram in sorted(self._durations.items(), key=str):
+                for bound, count in zip(DURATION_BUCKETS, histogram):
+                    labels = _labels(phase=phase, outcome=outcome, command=command, le=bound)
+                    lines.append(f"dora_phase_duration_seconds_bucket{labels} {count}")
+                labels = _labels(phase=phase, outcome=outcome, command=command, le="+Inf")
+                lines.append(f"dora_phase_duration_seconds_bucket{labels} {histogram[-2]}")
+                labels = _labels(phase=phase, outcome=outcome, command=command)
+                lines.append(f"dora_phase_duration_seconds_count{labels} {histogram[-2]}")
+                lines.append(f"dora_phase_duration_seconds_sum{labels} {histogram[-1]:.3f}")
+            for name, help_text, values, kind in (
+                ("dora_phase_cpu_seconds_total", "CPU time of the child processes of each phase.", self._cpu, "counter"),
+                ("dora_phase_output_bytes_total", "Output written by analysis jobs.", self._output_bytes, "counter"),
+                ("dora_phase_max_rss_bytes", "Largest peak RSS of a child process seen per phase.", self._max_rss, "gauge"),
+            ):
+                lines += [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"]
+                lines += [f"{name}{_labels(phase=phase, command=command)} {value:.12g}"
+                          for (phase, command), value in sorted(values.items(), key=str) if value]
+            lines += ["# HELP dora_phase_queue_wait_seconds Time jobs and clones waited for a worker before starting.",
+                      "# TYPE dora_phase_queue_wait_seconds summary"]
+            for (phase, command), (count, total) in sorted(self._queue_wait.items(), key=str):
+                lines.append(f"dora_phase_queue_wait_seconds_count{_labels(phase=phase, command=command)} {count}")
+                lines.append(f"dora_phase_queue_wait_seconds_sum{_labels(phase=phase, command=command)} {total:.3f}")
+            return "\n".join(lines) + "\n"
+
+
+_collector = MetricsCollector()
+
+
+def prometheus_text():
+    """All telemetry so far in the Prometheus text exposition format."""
+    return _collector.render()
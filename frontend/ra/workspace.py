@@ -0,0 +1,211 @@
+"""Shared index of the workspace directory.
+
+Every entry under ``workspace/`` is classified once as a repository or a use
+case (a folder containing ``usecase.md``), together with its HEAD commit,
+the reports it contains and when it was last analysed. The index is refreshed
+by mtime change detection: the workspace root is only re-listed when its
+mtime changes, and an entry is only re-scanned when its directory or git refs
+change, or when it is explicitly invalidated (e.g. after a job finishes).
+"""
+import logging
+import os
+import threading
+import time
+
+from . import config
+from . import fsutil
+
+
+REPO = "repo"
+USE_CASE = "usecase"
+
+USE_CASE_FILE = "usecase.md"
+# Left in place of a checkout evicted to stay under the disk budget (see ra.storage)
+EVICTED_FILE = ".ra-evicted.json"
+
+LOCKS_DIR = os.path.join(config.WORKSPACE_DIR, ".dora", "locks")
+
+
+def entry_lock(name, exclusive=False, blocking=True):
+    """Lock on workspace entry `name`: jobs and clones hold it shared while they use the folder, eviction
+    (see ra.storage) exclusively. Without `blocking`, raises BlockingIOError if it is taken."""
+    return fsutil.locked(os.path.join(LOCKS_DIR, f"{name}.lock"), shared=not exclusive, blocking=blocking)
+
+
+def _mtime(path):
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+
+def _read_first_line(path):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return f.readline().strip()
+    except OSError:
+        return None
+
+
+def _git_dir(path):
+    git_dir = os.path.join(path, ".git")
+    if os.path.isfile(git_dir):
+        # Worktrees and submodules point at the real git dir
+        line = _read_first_line(git_dir) or ""
+        if line.startswith("gitdir:"):
+            return os.path.normpath(os.path.join(path, line[len("gitdir:"):].strip()))
+    return git_dir if os.path.isdir(git_dir) else None
+
+
+def read_head(git_dir):
+    """Resolve HEAD by reading git's files directly (much cheaper than spawning git)."""
+    head = _read_first_line(os.path.join(git_dir, "HEAD"))
+    if not head:
+        return None, None
+    if not head.startswith("ref:"):
+        return head, None
+    ref = head[len("ref:"):].strip()
+    ref_file = os.path.join(git_dir, ref)
+    sha = _read_first_line(ref_file)
+    if sha:
+        return sha, ref_file
+    try:
+        with open(os.path.join(git_dir, "packed-refs"), "r", encoding="utf-8") as f:
+            for line in f:
+                parts = line.split()
+                if len(parts) == 2 and parts[1] == ref:
+                    return parts[0], ref_file
+    except OSError:
+        pass
+    return None, ref_file
+
+
+class WorkspaceEntry:
+    """One repository or use case folder in the workspace."""
+
+    def __init__(self, name, path):
+        self.name = name
+        self.path = path
+        self.kind = REPO
+        self.head = None
+        self.reports = []
+        self.has_docs = False
+        self.evicted = False
+        self.last_analysis = None
+        self._signature = None
+
+    def signature(self):
+        # Anything that changes the entry's HEAD or its set of files changes one of these mtimes
+        git_dir = _git_dir(self.path)
+        if git_dir is None:
+            return (_mtime(self.path),)
+        _, ref_file = read_head(git_dir)
+        return (
+            _mtime(self.path),
+            _mtime(os.path.join(git_dir, "HEAD")),
+            _mtime(ref_file) if ref_file else None,
+            _mtime(os.path.join(git_dir, "packed-refs")),
+        )
+
+    def scan(self, signature=None):
+        names = os.listdir(self.path)
+        self.kind = USE_CASE if USE_CASE_FILE in names else REPO
+        if self.kind == USE_CASE:
+            self.reports = sorted(n for n in names if n.endswith(".md") and n != USE_CASE_FILE)
+            self.head = None
+        else:
+            self.reports = sorted(n for n in names if n.startswith("ra-") and n.endswith(".md"))
+            git_dir = _git_dir(self.path)
+            self.head = read_head(git_dir)[0] if git_dir else None
+        self.has_docs = os.path.isdir(os.path.join(self.path, "_ra"))
+        self.evicted = EVICTED_FILE in names
+        report_mtimes = [_mtime(os.path.join(self.path, n)) for n in self.reports]
+        report_mtimes = [m for m in report_mtimes if m]
+        self.last_analysis = max(report_mtimes) / 1e9 if report_mtimes else None
+        self._signature = signature if signature is not None else self.signature()
+
+    def __repr__(self):
+        return f"<WorkspaceEntry {self.name} [{self.kind}] head={self.head and self.head[:8]} reports={len(self.reports)}>"
+
+
+class WorkspaceIndex:
+    """Process-wide, lazily refreshed view of ``workspace/``.
+
+    Refreshes are rate limited to one every ``min_interval`` seconds unless the
+    index was invalidated, so reruns of many sessions share the same scan.
+    """
+
+    def __init__(self, root=None, min_interval=None):
+        self.root = root or config.WORKSPACE_DIR
+        self.min_interval = config.INDEX_MIN_INTERVAL if min_interval is None else min_interval
+        self._entries = {}
+        self._root_mtime = None
+        self._last_refresh = 0.0
+        self._dirty = set()
+        self._dirty_all = True
+        self._lock = threading.Lock()
+
+    # --- Public API ---
+    def exists(self):
+        return os.path.isdir(self.root)
+
+    def entries(self, kind=None):
+        self.refresh()
+        with self._lock:
+            entries = sorted(self._entries.values(), key=lambda e: e.name)
+        return [e for e in entries if kind is None or e.kind == kind]
+
+    def repos(self):
+        return self.entries(REPO)
+
+    def use_cases(self):
+        return self.entries(USE_CASE)
+
+    def get(self, name):
+        self.refresh()
+        with self._lock:
+            return self._entries.get(name)
+
+    def invalidate(self, name=None):
+        """Force a re-scan of one entry (or everything) on the next access."""
+        with self._lock:
+            if name is None:
+                self._dirty_all = True
+            else:
+                self._dirty.add(name)
+
+    # --- Refresh ---
+    def refresh(self, force=False):
+        with self._lock:
+            now = time.monotonic()
+            if not (force or self._dirty_all or self._dirty) and now - self._last_refresh < self.min_interval:
+                return
+            self._last_refresh = now
+            dirty, dirty_all = self._dirty, self._dirty_all
+            self._dirty, self._dirty_all = set(), False
+
+            root_mtime = _mtime(self.root)
+            if root_mtime is None:
+                self._entries = {}
+                self._root_mtime = None
+                return
+            if root_mtime != self._root_mtime or dirty_all:
+                self._relist()
+                self._root_mtime = root_mtime
+
+            for name, entry in list(self._entries.items()):
+                try:
+                    signature = entry.signature()
+                    if dirty_all or name in dirty or signature != entry._signature:
+                        entry.scan(signature)
+                except FileNotFoundError:
+                    del self._entries[name]
+                except OSError as e:
+                    logging.warning(f"Cannot scan workspace entry {entry.path}: {e}")
+
+    def _relist(self):
+        names = {e.name for e in os.scandir(self.root) if not e.name.startswith(".") and e.is_dir()}
+        for name in set(self._entries) - names:
+            del self._entries[name]
+        for name in names - set(self._entries):
+            self._entries[name] = WorkspaceEntry(name, os.path.join(self.root, name))
@@ -0,0 +1,33 @@
+"""Every test session runs against a throwaway workspace (``DORA_WORKSPACE``)."""
+import os
+import shutil
+import sys
+import tempfile
+
+import pytest
+
+
+FRONTEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, FRONTEND_DIR)
+
+# ra.config reads the environment once, on import: set it up before any test module imports ra
+os.environ["DORA_WORKSPACE"] = tempfile.mkdtemp(prefix="dora-tests-")
+os.environ.setdefault("DORA_CLONE_MIRROR", "0")
+
+
+@pytest.fixture
+def workspace():
+    """The workspace directory, emptied after the test."""
+    from ra import config
+    os.makedirs(config.WORKSPACE_DIR, exist_ok=True)
+    yield config.WORKSPACE_DIR
+    for name in os.listdir(config.WORKSPACE_DIR):
+        path = os.path.join(config.WORKSPACE_DIR, name)
+        if os.path.isdir(path) and not os.path.islink(path):
+            shutil.rmtree(path, ignore_errors=True)
+        else:
+            os.remove(path)
+
+
+def pytest_sessionfinish(session, exitstatus):
+    shutil.rmtree(os.environ["DORA_WORKSPACE"], ignore_errors=True)
@@ -0,0 +1,147 @@
+import os
+import subprocess
+
+import pytest
+
+from ra import analysis
+from ra import checkpoint
+from ra import commands
+from ra import jobstore
+from ra import report_cache
+
+
+TEMPLATE = 'claude -p "Analyse $REPOSITORY and write report.md"'
+
+
+def _git(path, *args):
+    subprocess.run(["git", "-c", "user.name=test", "-c", "user.email=test@example.com", *args],
+                   cwd=path, check=True, capture_output=True)
+
+
+@pytest.fixture
+def repo(workspace):
+    path = os.path.join(workspace, "repo")
+    os.makedirs(path)
+    _git(path, "init", "-q")
+    with open(os.path.join(path, "main.py"), "w", encoding="utf-8") as f:
+        f.write("print('hello')\n")
+    _git(path, "add", ".")
+    _git(path, "commit", "-q", "-m", "initial")
+    return path
+
+
+@pytest.fixture
+def command():
+    return commands.Command("report", TEMPLATE, output_file="report.md")
+
+
+def _write_report(path, text="# Report\n"):
+    with open(os.path.join(path, "report.md"), "w", encoding="utf-8") as f:
+        f.write(text)
+
+
+def _generated(repo, command):
+    """Plan, then "run" the command: write the report and cache it as the scheduler's completion hook would."""
+    plan = analysis.plan_analysis(command, repo)
+    _write_report(repo)
+    report_cache.store(plan.key, plan.rev, command.template, repo, command.output_file)
+    return plan
+
+
+def test_missing_report_runs(repo, command):
+    plan = analysis.plan_analysis(command, repo)
+    assert plan.outcome == analysis.RUN and plan.needs_run
+    assert plan.rev == report_cache.revision(repo)
+    assert plan.delta is None and plan.resume_from is None
+
+
+def test_run_points_at_the_context_pack_without_building_it(repo, command):
+    plan = analysis.plan_analysis(command, repo)
+    assert plan.context_pack and f"CONTEXT PACK: {os.path.abspath(plan.context_pack)}" in plan.command
+    assert not os.path.exists(plan.context_pack)
+
+
+def test_fresh_report_is_reused(repo, command):
+    _generated(repo, command)
+    assert analysis.plan_analysis(command, repo).outcome == analysis.FRESH
+
+
+def test_deleted_report_is_restored_from_the_cache(repo, command):
+    _generated(repo, command)
+    os.remove(os.path.join(repo, "report.md"))
+    plan = analysis.plan_analysis(command, repo)
+    assert plan.outcome == analysis.RESTORED
+    assert os.path.exists(os.path.join(repo, "report.md"))
+
+
+def test_commit_without_changes_keeps_the_report(repo, command):
+    _generated(repo, command)
+    _git(repo, "commit", "-q", "--allow-empty", "-m", "empty")
+    plan = analysis.plan_analysis(command, repo)
+    assert plan.outcome == analysis.UNCHANGED
+    assert plan.delta.files == []
+    # Cached under the new commit's key, so the next plan finds it fresh
+    assert analysis.plan_analysis(command, repo).outcome == analysis.FRESH
+
+
+def test_changed_files_run_as_a_delta(repo, command):
+    _generated(repo, command)
+    with open(os.path.join(repo, "util.py"), "w", encoding="utf-8") as f:
+        f.write("x = 1\n")
+    _git(repo, "add", "util.py")
+    _git(repo, "commit", "-q", "-m", "add util")
+    plan = analysis.plan_analysis(command, repo)
+    assert plan.outcome == analysis.RUN
+    assert plan.delta.files == ["util.py"]
+    assert "DELTA MODE" in plan.command
+
+
+def test_other_template_does_not_reuse_the_report(repo, command):
+    _generated(repo, command)
+    other = commands.Command("report", TEMPLATE.replace("Analyse", "Review"), output_file="report.md")
+    assert analysis.plan_analysis(other, repo).outcome == analysis.RUN
+
+
+def test_report_without_revision_exists(workspace, command):
+    path = os.path.join(workspace, "not-a-repo")
+    os.makedirs(path)
+    assert analysis.plan_analysis(command, path).outcome == analysis.RUN
+    _write_report(path)
+    assert analysis.plan_analysis(command, path).outcome == analysis.EXISTS
+
+
+def test_in_flight_work_is_joined(repo, command):
+    running = object()
+
+    class Scheduler:
+        def inflight(self, flight_key):
+            return running if flight_key == analysis.flight_key(repo, plan_key, command.template) else None
+
+    plan_key = report_cache.report_key(report_cache.revision(repo), command.template)
+    plan = analysis.plan_analysis(command, repo, scheduler=Scheduler())
+    assert plan.outcome == analysis.IN_FLIGHT and plan.job is running
+    assert analysis.submit(Scheduler(), plan, "repo") is running
+
+
+def _interrupted_job(repo, command, job_id, failure_reason):
+    key = report_cache.report_key(report_cache.revision(repo), command.template)
+    jobstore.write_spec(job_id, {"id": job_id, "flight_key": analysis.flight_key(repo, key, command.template)})
+    path = checkpoint.checkpoint_path(job_id, command.output_file)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("# Report (partial)\n")
+    jobstore.update_status(job_id, status="failed", failure_reason=failure_reason, checkpoint=path)
+    return path
+
+
+def test_interrupted_run_is_resumed(repo, command):
+    path = _interrupted_job(repo, command, "resumable01", "idle timeout")
+    plan = analysis.plan_analysis(command, repo)
+    assert plan.outcome == analysis.RUN and plan.resume_from == path
+    assert "RESUME MODE" in plan.command
+
+
+def test_failed_run_is_not_resumed(repo, command):
+    _interrupted_job(repo, command, "errored0001", "error")
+    plan = analysis.plan_analysis(command, repo)
+    assert plan.outcome == analysis.RUN and plan.resume_from is None
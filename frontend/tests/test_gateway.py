@@ -0,0 +1,105 @@
+import http.client
+import os
+import threading
+from http.server import ThreadingHTTPServer
+
+import pytest
+
+from ra import gateway
+
+
+@pytest.fixture
+def server(workspace):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), gateway.DocsRequestHandler)
+    thread = threading.Thread(target=server.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def _site(workspace, repo, files):
+    root = gateway.site_path(os.path.join(workspace, repo))
+    for relative, content in files.items():
+        path = os.path.join(root, relative)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(content)
+    return root
+
+
+def _get(server, path, headers=None):
+    # http.client sends the path as given, without normalising dot segments
+    connection = http.client.HTTPConnection(*server.server_address, timeout=5)
+    try:
+        connection.request("GET", path, headers=headers or {})
+        response = connection.getresponse()
+        return response.status, dict(response.getheaders()), response.read()
+    finally:
+        connection.close()
+
+
+def test_serves_site_files(server, workspace):
+    _site(workspace, "repo", {"index.html": "<h1>repo</h1>", "guide/index.html": "guide"})
+    status, headers, body = _get(server, "/docs/repo/")
+    assert (status, body) == (200, b"<h1>repo</h1>")
+    assert headers["Cache-Control"] == "no-cache"
+    assert _get(server, "/docs/repo/guide/")[2] == b"guide"
+
+
+def test_redirects_to_trailing_slash(server, workspace):
+    _site(workspace, "repo", {"index.html": "x", "guide/index.html": "guide"})
+    status, headers, _ = _get(server, "/docs/repo")
+    assert (status, headers["Location"]) == (301, "/docs/repo/")
+    status, headers, _ = _get(server, "/docs/repo/guide")
+    assert (status, headers["Location"]) == (301, "/docs/repo/guide/")
+
+
+def test_revalidation_with_etag(server, workspace):
+    _site(workspace, "repo", {"index.html": "x"})
+    _, headers, _ = _get(server, "/docs/repo/index.html")
+    status, _, body = _get(server, "/docs/repo/index.html", {"If-None-Match": headers["ETag"]})
+    assert (status, body) == (304, b"")
+
+
+@pytest.mark.parametrize("path", [
+    "/docs/repo/../secret.txt",
+    "/docs/repo/../../secret.txt",
+    "/docs/repo/%2e%2e/%2e%2e/secret.txt",
+    "/docs/repo/..%2f..%2fsecret.txt",
+    "/docs/repo/%2fetc/passwd",
+])
+def test_paths_outside_the_site_are_refused(server, workspace, path):
+    _site(workspace, "repo", {"index.html": "x"})
+    with open(os.path.join(workspace, "secret.txt"), "w", encoding="utf-8") as f:
+        f.write("secret")
+    status, _, body = _get(server, path)
+    assert status in (403, 404)
+    assert b"secret" not in body.replace(b"secret.txt", b"")
+
+
+@pytest.mark.parametrize("path", ["/docs/../secret.txt", "/docs/%2e%2e/secret.txt", "/docs/.dora/governor.json"])
+def test_hidden_and_parent_repositories_are_refused(server, workspace, path):
+    os.makedirs(os.path.join(workspace, ".dora"), exist_ok=True)
+    with open(os.path.join(workspace, ".dora", "governor.json"), "w", encoding="utf-8") as f:
+        f.write("{}")
+    assert _get(server, path)[0] in (403, 404)
+
+
+def test_symlinks_out_of_the_site_are_refused(server, workspace):
+    root = _site(workspace, "repo", {"index.html": "x"})
+    with open(os.path.join(workspace, "secret.txt"), "w", encoding="utf-8") as f:
+        f.write("secret")
+    os.symlink(os.path.join(workspace, "secret.txt"), os.path.join(root, "leak.txt"))
+    assert _get(server, "/docs/repo/leak.txt")[0] == 403
+
+
+def test_index_escapes_repository_names(server, workspace):
+    _site(workspace, "<img src=x onerror=alert(1)>", {"index.html": "x"})
+    _site(workspace, "a&b", {"index.html": "x"})
+    status, _, body = _get(server, "/docs/")
+    assert status == 200
+    assert b"<img" not in body
+    assert b"&lt;img src=x onerror=alert(1)&gt;" in body
+    assert b'href="/docs/%3Cimg%20src%3Dx%20onerror%3Dalert%281%29%3E/"' in body
+    assert b">a&amp;b<" in body and b'href="/docs/a%26b/"' in body
@@ -0,0 +1,119 @@
+import os
+import subprocess
+import sys
+import textwrap
+
+import pytest
+
+from ra import governor
+from ra.jobs import BATCH, INTERACTIVE
+
+
+# Holds one slot of class "llm" (limit 2) from another process until its stdin closes
+HOLDER = textwrap.dedent("""
+    import sys
+    from ra import governor
+    slot = governor.Governor(2, store=governor.LimiterStore(sys.argv[1])).try_slot("llm")
+    print("held" if slot else "refused", flush=True)
+    sys.stdin.read()
+    if slot:
+        slot.release()
+""")
+
+
+@pytest.fixture
+def store(tmp_path):
+    return governor.LimiterStore(str(tmp_path / "governor.json"))
+
+
+@pytest.fixture
+def holder(store):
+    """Start a process holding a slot; returns (process, whether it got the slot)."""
+    processes = []
+
+    def start():
+        process = subprocess.Popen([sys.executable, "-c", HOLDER, store.path], stdin=subprocess.PIPE,
+                                   stdout=subprocess.PIPE, text=True,
+                                   env={**os.environ, "PYTHONPATH": os.path.dirname(os.path.dirname(governor.__file__))})
+        processes.append(process)
+        return process, process.stdout.readline().strip() == "held"
+
+    yield start
+    for process in processes:
+        process.kill()
+        process.wait()
+
+
+def test_slots_are_counted_across_processes(store, holder):
+    other, held = holder()
+    assert held
+    local = governor.Governor(2, store=store)
+    slot = local.try_slot("llm")
+    assert slot is not None
+    # The other process holds the second slot
+    assert local.try_slot("llm") is None
+    _, held = holder()
+    assert not held
+    assert local.stats()[0]["running"] == 2
+
+    # Released by the other process: free again
+    other.stdin.close()
+    other.wait()
+    second = local.try_slot("llm")
+    assert second is not None
+    slot.release()
+    second.release()
+    assert local.stats()[0]["running"] == 0
+
+
+def test_slots_of_dead_processes_are_dropped(store, holder):
+    other, held = holder()
+    assert held
+    local = governor.Governor(1, store=store)
+    assert local.try_slot("llm") is None
+    other.kill()
+    other.wait()
+    assert local.try_slot("llm") is not None
+
+
+def test_rate_limit_pauses_every_process(store):
+    first, second = governor.Governor(4, store=store), governor.Governor(4, store=store)
+    with first.try_slot("llm") as slot:
+        slot.observe("API Error: 429 rate_limit_error")
+    assert second.try_slot("llm") is None
+    stats = second.limiter("llm").stats()
+    assert stats["paused_for"] > 0 and stats["limit"] == 2 and stats["rate_limited"] == 1
+    # Other classes are not affected
+    assert second.try_slot("docs") is not None
+
+
+def test_clean_runs_raise_the_limit_again(store, monkeypatch):
+    monkeypatch.setattr(governor.config, "RATE_LIMIT_BACKOFF", 0)
+    limiter = governor.Governor(4, store=store).limiter("llm")
+    limiter.report_rate_limit()
+    assert limiter.stats()["limit"] == 2
+    # Additive increase: about one slot per `limit` clean runs
+    for _ in range(6):
+        limiter.release(limiter.try_acquire())
+    assert limiter.stats()["limit"] == 4
+
+
+def test_better_priority_waiting_elsewhere_goes_first(store):
+    interactive, batch = governor.Governor(4, store=store), governor.Governor(4, store=store)
+    interactive.set_waiting({"llm": INTERACTIVE})
+    assert batch.try_slot("llm", priority=BATCH) is None
+    # Jobs as urgent as the waiting ones are not held back
+    assert batch.try_slot("llm", priority=INTERACTIVE) is not None
+    interactive.set_waiting({})
+    assert batch.try_slot("llm", priority=BATCH) is not None
+
+
+def test_adopted_slot_counts_until_released(store):
+    local = governor.Governor(1, store=store)
+    adopted = local.adopt_slot("llm", f"{os.getpid()}-runner")
+    # Adopting again (another scheduler re-attaching the same runner) does not count twice
+    local.adopt_slot("llm", f"{os.getpid()}-runner")
+    assert local.stats()[0]["running"] == 1
+    assert local.try_slot("llm") is None
+    adopted.release()
+    assert local.try_slot("llm") is not None
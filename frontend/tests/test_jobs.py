@@ -0,0 +1,153 @@
+import os
+import signal
+import subprocess
+import sys
+import textwrap
+import time
+
+import pytest
+
+from ra import jobs
+from ra import jobstore
+from ra.jobs import BATCH, FAILED, INTERACTIVE, QUEUED, RUNNING, SUCCEEDED, Job, JobScheduler
+
+
+# A scheduler in another process that starts one job and then waits to be killed, leaving its runner behind
+ORPHANING_SCHEDULER = textwrap.dedent("""
+    import sys, time
+    from ra.jobs import JobScheduler, RUNNING
+    scheduler = JobScheduler(max_workers=1, recover=False)
+    job = scheduler.submit("slow", sys.argv[2], cwd=sys.argv[1], target="repo", target_path=sys.argv[1])
+    while job.status != RUNNING:
+        time.sleep(0.05)
+    print(job.id, flush=True)
+    time.sleep(60)
+""")
+
+
+def _wait(predicate, timeout=20):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.05)
+
+
+def _submit(scheduler, workspace, name, command, **kwargs):
+    return scheduler.submit(name, command, cwd=workspace, target="repo", target_path=workspace, **kwargs)
+
+
+def test_at_most_max_workers_run_at_once(workspace):
+    scheduler = JobScheduler(max_workers=2, recover=False)
+    submitted = [_submit(scheduler, workspace, f"job-{i}", "sleep 0.5; echo done") for i in range(5)]
+    peak = 0
+    while any(job.is_active for job in submitted):
+        peak = max(peak, sum(job.status == RUNNING for job in submitted))
+        time.sleep(0.02)
+    assert peak == 2
+    assert [job.status for job in submitted] == [SUCCEEDED] * 5
+    # Workers and slots are released just after a job's final status is set
+    _wait(lambda: scheduler._running == 0)
+    assert scheduler.governor.stats()[0]["running"] == 0
+
+
+def test_interactive_jobs_overtake_queued_batch_jobs(workspace):
+    scheduler = JobScheduler(max_workers=1, recover=False)
+    blocker = _submit(scheduler, workspace, "blocker", "sleep 0.5")
+    _wait(lambda: blocker.status == RUNNING)
+    batch = _submit(scheduler, workspace, "batch", "true", priority=BATCH)
+    interactive = _submit(scheduler, workspace, "interactive", "true", priority=INTERACTIVE)
+    _wait(lambda: not batch.is_active and not interactive.is_active)
+    assert interactive.started_at < batch.started_at
+
+
+def test_identical_work_runs_once(workspace):
+    scheduler = JobScheduler(max_workers=2, recover=False)
+    first = _submit(scheduler, workspace, "report", "sleep 0.3", flight_key="same")
+    assert _submit(scheduler, workspace, "report", "sleep 0.3", flight_key="same") is first
+    _wait(lambda: not first.is_active)
+    again = _submit(scheduler, workspace, "report", "true", flight_key="same")
+    assert again is not first
+    _wait(lambda: not again.is_active)
+
+
+def test_failure_is_recorded_and_not_retried(workspace):
+    scheduler = JobScheduler(max_workers=1, recover=False)
+    job = _submit(scheduler, workspace, "broken", "echo oops; exit 3")
+    _wait(lambda: not job.is_active)
+    status = jobstore.read_status(job.id)
+    assert (job.status, job.return_code, job.attempt) == (FAILED, 3, 1)
+    assert status["failure_reason"] == "error"
+    assert "oops" in "".join(job.log.tail(20))
+
+
+def _queued_on_disk(workspace, command, **status):
+    job = Job("queued", command, workspace, "repo", workspace)
+    job.save_spec()
+    jobstore.update_status(job.id, status=QUEUED, **status)
+    return job.id
+
+
+def test_recovery_runs_jobs_queued_by_a_previous_process(workspace):
+    job_id = _queued_on_disk(workspace, "echo recovered")
+    scheduler = JobScheduler(max_workers=1)
+    job = scheduler.get(job_id)
+    _wait(lambda: not job.is_active)
+    assert job.status == SUCCEEDED
+
+
+def test_recovery_keeps_the_rest_of_a_retry_back_off(workspace):
+    job_id = _queued_on_disk(workspace, "true", retry_at=time.time() + 1.5)
+    started = time.time()
+    scheduler = JobScheduler(max_workers=1)
+    job = scheduler.get(job_id)
+    time.sleep(0.5)
+    assert job.status == QUEUED
+    _wait(lambda: not job.is_active)
+    assert job.status == SUCCEEDED and job.started_at - started >= 1.4
+
+
+@pytest.fixture
+def orphaned_job(workspace):
+    """A job still running (for about 2s) whose scheduler process was killed."""
+    scheduler = subprocess.Popen(
+        [sys.executable, "-c", ORPHANING_SCHEDULER, workspace, "sleep 2; echo finished"], stdout=subprocess.PIPE,
+        text=True, env={**os.environ, "PYTHONPATH": os.path.dirname(os.path.dirname(jobs.__file__))})
+    job_id = scheduler.stdout.readline().strip()
+    scheduler.send_signal(signal.SIGKILL)
+    scheduler.wait()
+    assert job_id
+    yield job_id
+    # Never leave the runner behind
+    runner_pid = jobstore.read_status(job_id).get("runner_pid")
+    if jobstore.pid_alive(runner_pid):
+        os.killpg(runner_pid, signal.SIGKILL)
+
+
+def test_restarted_scheduler_adopts_orphaned_runners(workspace, orphaned_job):
+    scheduler = JobScheduler(max_workers=1)
+    adopted = scheduler.get(orphaned_job)
+    assert adopted.status == RUNNING
+    # The adopted runner holds the only worker and a governor slot of its class
+    assert scheduler._running == 1
+    assert scheduler.governor.stats()[0]["running"] == 1
+    assert jobstore.read_status(orphaned_job)["scheduler"] == scheduler.governor.owner
+
+    waiting = _submit(scheduler, workspace, "next", "true")
+    _wait(lambda: not waiting.is_active)
+    assert adopted.status == SUCCEEDED and "finished" in "".join(adopted.log.tail(20))
+    # Only started once the adopted runner's exit released its worker and slot
+    assert waiting.status == SUCCEEDED and waiting.started_at >= adopted.finished_at
+    _wait(lambda: scheduler._running == 0)
+    assert scheduler.governor.stats()[0]["running"] == 0
+
+
+def test_runners_of_a_live_scheduler_are_followed_not_adopted(workspace):
+    owner = JobScheduler(max_workers=1, recover=False)
+    job = _submit(owner, workspace, "slow", "sleep 1", flight_key="shared")
+    _wait(lambda: job.status == RUNNING)
+    follower = JobScheduler(max_workers=1, recover=False)
+    followed = _submit(follower, workspace, "slow", "sleep 1", flight_key="shared")
+    assert followed.id == job.id
+    assert follower._running == 0
+    _wait(lambda: not followed.is_active)
+    assert followed.status == SUCCEEDED
@@ -0,0 +1,113 @@
+import json
+import os
+import subprocess
+
+import pytest
+
+from ra import commands
+from ra import report_cache
+from ra import storage
+from ra.clone import CloneManager, SUCCEEDED
+from ra.workspace import EVICTED_FILE
+
+
+GENERATED = ["report.md", "_ra/mkdocs.yml", "_ra/docs/index.md", report_cache.PROVENANCE_FILE]
+
+
+class Registry:
+    def commands(self, target=None):
+        return [
+            commands.Command("report", 'claude -p "Report on $REPOSITORY"', output_file="report.md"),
+            commands.Command("docs", 'claude -p "Document $REPOSITORY"', output_file="_ra/mkdocs.yml"),
+        ]
+
+
+def _git(path, *args):
+    result = subprocess.run(["git", "-c", "user.name=test", "-c", "user.email=test@example.com", *args],
+                            cwd=path, check=True, capture_output=True, text=True)
+    return result.stdout.strip()
+
+
+def _write(path, relative, text="x\n"):
+    full = os.path.join(path, relative)
+    os.makedirs(os.path.dirname(full), exist_ok=True)
+    with open(full, "w", encoding="utf-8") as f:
+        f.write(text)
+
+
+@pytest.fixture
+def upstream(tmp_path):
+    path = str(tmp_path / "upstream")
+    os.makedirs(path)
+    _git(path, "init", "-q", "-b", "main")
+    _write(path, "main.py", "print('hello')\n")
+    # The generated files are ignored, as they often are: eviction must keep them all the same
+    _write(path, ".gitignore", "report.md\n_ra/\n.ra-reports.json\nbuild/\n")
+    _git(path, "add", ".")
+    _git(path, "commit", "-q", "-m", "initial")
+    return path
+
+
+@pytest.fixture
+def repo(workspace, upstream):
+    path = os.path.join(workspace, "repo")
+    _git(workspace, "clone", "-q", f"file://{upstream}", path)
+    for relative in GENERATED + ["_ra/site/index.html", "build/output.bin"]:
+        _write(path, relative)
+    return path
+
+
+def _manager(**kwargs):
+    return storage.StorageManager(budget=1, min_idle=0, registry=Registry(), **kwargs)
+
+
+def _files(path):
+    return sorted(os.path.relpath(os.path.join(directory, name), path)
+                  for directory, _, names in os.walk(path) for name in names)
+
+
+def test_evicts_site_then_checkout_keeping_generated_files(repo):
+    head = _git(repo, "rev-parse", "HEAD")
+    evicted = _manager().evict()
+    assert [(c.name, c.kind) for c in evicted] == [("repo", storage.SITE), ("repo", storage.CHECKOUT)]
+    assert _files(repo) == sorted(GENERATED + [EVICTED_FILE])
+    with open(os.path.join(repo, EVICTED_FILE), "r", encoding="utf-8") as f:
+        stub = json.load(f)
+    assert stub["branch"] == "main" and stub["head"] == head and stub["url"].startswith("file://")
+
+
+def test_dry_run_evicts_nothing(repo):
+    before = _files(repo)
+    assert len(_manager().evict(dry_run=True)) == 2
+    assert _files(repo) == before
+
+
+def test_no_budget_evicts_nothing(repo):
+    assert storage.StorageManager(budget=0, min_idle=0, registry=Registry()).evict() == []
+    assert os.path.isdir(os.path.join(repo, ".git"))
+
+
+def test_modified_checkout_is_kept(repo):
+    _write(repo, "main.py", "print('changed')\n")
+    evicted = _manager().evict()
+    assert [c.kind for c in evicted] == [storage.SITE]
+    assert os.path.isdir(os.path.join(repo, ".git"))
+
+
+def test_busy_and_recently_used_repositories_are_kept(repo):
+    assert _manager(is_busy=lambda name: name == "repo").evict() == []
+    storage.touch("repo")
+    assert storage.StorageManager(budget=1, min_idle=3600, registry=Registry()).evict() == []
+    assert os.path.isfile(os.path.join(repo, "_ra", "site", "index.html"))
+
+
+def test_restore_brings_the_checkout_back_with_its_reports(repo):
+    head = _git(repo, "rev-parse", "HEAD")
+    _manager().evict()
+    task = CloneManager(use_mirror=False).restore(repo)
+    task.wait()
+    assert task.status == SUCCEEDED, task.error
+    assert _git(repo, "rev-parse", "HEAD") == head
+    assert not os.path.exists(os.path.join(repo, EVICTED_FILE))
+    for relative in GENERATED + ["main.py"]:
+        assert os.path.isfile(os.path.join(repo, relative)), relative